@@ -0,0 +1,108 @@
+"""Бенчмарк истории коэффициентов: объём на диске и скорость записи и чтения.
+
+Симулирует обновления ленты раз в 5 минут за несколько дней: у части событий
+при каждом обновлении сдвигается цена. Сравнивает размер odds_history с
+полными JSON-снимками на каждое обновление.
+
+    python bench/bench_history.py --events 250 --days 3 --change 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db  # noqa: E402
+from models import Event  # noqa: E402
+from odds_history import OddsHistory  # noqa: E402
+
+REFRESH = 300
+
+
+def make_events(n, rng):
+    return [Event(
+        id=f"e{i}", title=f"Home {i} vs Away {i}", league="Премьер-Лига", sport_key="soccer_epl",
+        category="football", team_a=f"Home {i}", team_b=f"Away {i}",
+        odds_a=round(rng.uniform(1.5, 3), 2), odds_draw=round(rng.uniform(3, 4), 2),
+        odds_b=round(rng.uniform(1.5, 5), 2), commence_time="2030-01-01T00:00:00Z",
+    ) for i in range(n)]
+
+
+def move(event, rng):
+    field = rng.choice(("odds_a", "odds_draw", "odds_b"))
+    value = round(max(1.01, getattr(event, field) + rng.choice((-0.05, -0.02, 0.02, 0.05))), 2)
+    data = event.to_dict()
+    data[field] = value
+    return Event(**data)
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    events = make_events(args.events, rng)
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        await db.init_db()
+        history = OddsHistory()
+        start = int(time.time()) - args.days * 86400
+        refreshes = args.days * 86400 // REFRESH
+        snapshot_bytes = 0
+        record_times = []
+        written = 0
+        try:
+            for k in range(refreshes):
+                changed = []
+                for i, e in enumerate(events):
+                    if k == 0 or rng.random() < args.change:
+                        events[i] = e if k == 0 else move(e, rng)
+                        changed.append(events[i])
+                snapshot_bytes += len(json.dumps([e.to_dict() for e in events], ensure_ascii=False).encode())
+                t = time.perf_counter()
+                written += await history.record(changed, now=start + k * REFRESH)
+                record_times.append(time.perf_counter() - t)
+
+            async with db.get_pool().read() as conn:
+                cursor = await conn.execute(
+                    "SELECT COUNT(*), SUM(points), SUM(LENGTH(data)), SUM(step > 0) FROM odds_history")
+                chunks, points, blob_bytes, compacted = await cursor.fetchone()
+                cursor = await conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name LIKE '%odds_history%'")
+                table_bytes = (await cursor.fetchone())[0]
+
+            query_times = []
+            for _ in range(args.queries):
+                t = time.perf_counter()
+                await history.series(rng.choice(events).id)
+                query_times.append(time.perf_counter() - t)
+        finally:
+            await db.close_db()
+
+    print(json.dumps({
+        "bench": "odds_history",
+        "events": args.events,
+        "refreshes": refreshes,
+        "points_written": written,
+        "points_stored": points,
+        "chunks": chunks,
+        "compacted_chunks": compacted,
+        "blob_bytes_per_point": round(blob_bytes / points, 2),
+        "table_kb": round(table_bytes / 1024) if table_bytes else None,
+        "json_snapshots_kb": round(snapshot_bytes / 1024),
+        "record_ms_p50": round(statistics.median(record_times) * 1000, 3),
+        "query_ms_p50": round(statistics.median(query_times) * 1000, 3),
+        "query_ms_max": round(max(query_times) * 1000, 3),
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=250)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--change", type=float, default=0.2, help="доля событий с новой ценой за обновление")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
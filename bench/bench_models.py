@@ -0,0 +1,137 @@
+"""Бенчмарк модели Event против dict: память на 10k событий и скорость JSON.
+
+    python bench/bench_models.py --events 10000 --repeat 5
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_cache import EventCache, diff_events, encode_events  # noqa: E402
+from models import Event, EVENT_FIELDS  # noqa: E402
+
+TEAMS = ["Arsenal", "Chelsea", "Liverpool", "Real Madrid", "Barcelona", "Бавария", "Лейкерс", "Селтикс"]
+
+
+def fake_values(n, rng):
+    """Значения полей n событий — одни и те же для dict и Event"""
+    rows = []
+    for i in range(n):
+        a, b = rng.sample(TEAMS, 2)
+        rows.append((
+            f"{rng.getrandbits(64):016x}{i}", f"{a} vs {b}", "🏴 Премьер-Лига", "soccer_epl", "football",
+            a, b, round(rng.uniform(1.1, 6), 2), round(rng.uniform(2.5, 5), 2), round(rng.uniform(1.1, 6), 2),
+            f"2030-01-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00Z", "upcoming",
+        ))
+    return rows
+
+
+def encode_dicts(dicts):
+    """Прежний encode_events: json.dumps всего списка dict"""
+    body = json.dumps({"events": dicts, "total": len(dicts)}, ensure_ascii=False, separators=(",", ":")).encode()
+    return body, hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def refresh_dicts(dicts):
+    """Прежний путь обновления: строка БД и хэш на событие, каждый ответ кодируется заново"""
+    for d in dicts:
+        hashlib.blake2b(json.dumps(d, ensure_ascii=False).encode(), digest_size=8).hexdigest()
+    by_category = {}
+    for d in dicts:
+        by_category.setdefault(d["category"], []).append(d)
+    encoded = {cat: encode_dicts(evts) for cat, evts in by_category.items()}
+    encoded["all"] = encode_dicts(dicts)
+
+
+def refresh_events(events):
+    """Текущий путь: diff_events + EventCache._index"""
+    diff_events({}, events)
+    EventCache(None)._index(events)
+
+
+def measure_memory(build):
+    """Сколько байт занимают контейнеры (строки полей общие и не считаются)"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del objects
+    return size
+
+
+def timed_all(fns, repeat):
+    """Лучшее время каждой функции; прогоны чередуются, чтобы шум машины
+    одинаково задевал обе стороны сравнения"""
+    best = dict.fromkeys(fns, float("inf"))
+    for _ in range(repeat):
+        for name, fn in fns.items():
+            start = time.perf_counter()
+            fn()
+            best[name] = min(best[name], time.perf_counter() - start)
+    return best
+
+
+def main(args):
+    values = fake_values(args.events, random.Random(args.seed))
+    dicts = [dict(zip(EVENT_FIELDS, v)) for v in values]
+    events = [Event(*v) for v in values]
+    n = args.events
+
+    dict_mem = measure_memory(lambda: [dict(zip(EVENT_FIELDS, v)) for v in values])
+    event_mem = measure_memory(lambda: [Event(*v) for v in values])
+
+    dict_rows = [json.dumps(d, ensure_ascii=False) for d in dicts]
+    event_rows = [e.to_json() for e in events]
+    fns = {
+        # Обновление кэша целиком: строки для БД + хэши, ответ "all" и ответы по категориям
+        "refresh_dicts": lambda: refresh_dicts(dicts),
+        "refresh_events": lambda: refresh_events(events),
+        # Один ответ /api/events с ETag
+        "response_dicts": lambda: encode_dicts(dicts),
+        "response_events": lambda: encode_events(events),
+        # Строки cached_events
+        "store_dicts": lambda: [json.dumps(d, ensure_ascii=False) for d in dicts],
+        "store_events": lambda: [e.to_json() for e in events],
+        # Чтение медленнее dict: json.loads тот же, сверху __init__ frozen-датакласса
+        "load_dicts": lambda: [json.loads(r) for r in dict_rows],
+        "load_events": lambda: [Event.from_json(r) for r in event_rows],
+    }
+    try:
+        from fastapi.encoders import jsonable_encoder
+    except ImportError:
+        pass
+    else:
+        # Так FastAPI кодировал dict-ответ, пока /api/events не отдавал готовые байты
+        fns["response_fastapi"] = lambda: json.dumps(
+            jsonable_encoder({"events": dicts, "total": n}), ensure_ascii=False).encode()
+    timings = timed_all(fns, args.repeat)
+
+    report = {
+        "bench": "models",
+        "events": n,
+        "memory_bytes_per_event": {
+            "dict": round(dict_mem / n),
+            "event": round(event_mem / n),
+        },
+        "memory_mb_per_10k": {
+            "dict": round(dict_mem / n * 10000 / 2 ** 20, 2),
+            "event": round(event_mem / n * 10000 / 2 ** 20, 2),
+        },
+        "events_per_s": {k: round(n / v) for k, v in timings.items()},
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    main(parser.parse_args())
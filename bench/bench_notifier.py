@@ -0,0 +1,92 @@
+"""Нагрузочный тест рассылки уведомлений на FakeBot (лимит как у Telegram).
+
+    python bench/bench_notifier.py --users 300 --bets 3 --limit 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db  # noqa: E402
+from notifier import Notifier, FakeBot  # noqa: E402
+
+
+def fake_summaries(users, bets, rng):
+    """Итоги расчёта в формате settle_outcomes"""
+    summaries = []
+    for uid in range(1, users + 1):
+        details = []
+        for i in range(bets):
+            amount = rng.choice((10, 25, 50, 100))
+            win = rng.random() < 0.45
+            details.append({
+                "bet_id": uid * 100 + i,
+                "event_id": f"ev{i}",
+                "event_title": f"Team {i} vs Team {i + 1}",
+                "pick_label": "Team",
+                "result": "win" if win else "lose",
+                "amount": amount,
+                "payout": amount * 2 if win else 0,
+            })
+        payout = sum(d["payout"] for d in details)
+        summaries.append({
+            "user_id": uid,
+            "bets": bets,
+            "wins": sum(d["result"] == "win" for d in details),
+            "payout": payout,
+            "profit": payout - sum(d["amount"] for d in details),
+            "details": details,
+            "user": {"user_id": uid, "balance": 1000 + payout},
+        })
+    return summaries
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    bot = FakeBot(limit=args.limit, latency=args.latency, rng=rng)
+    notifier = Notifier(bot, rate=args.rate, burst=args.burst, workers=args.workers)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        await db.init_db()
+        try:
+            await notifier.start()
+            start = time.perf_counter()
+            await notifier.notify(fake_summaries(args.users, args.bets, rng))
+            await notifier.join()
+            elapsed = time.perf_counter() - start
+            await notifier.stop()
+            left = len(await db.get_notifications())
+        finally:
+            await db.close_db()
+
+    print(json.dumps({
+        "bench": "notifier",
+        "users": args.users,
+        "bets": args.users * args.bets,
+        "messages": len(bot.messages),
+        "elapsed_s": round(elapsed, 2),
+        "msg_per_s": round(len(bot.messages) / elapsed, 1),
+        "flood_errors": bot.flood_errors,
+        "failed": notifier.failed,
+        "outbox_left": left,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--bets", type=int, default=3, help="ставок на игрока в партии")
+    parser.add_argument("--rate", type=float, default=25, help="темп рассылки, сообщений/с")
+    parser.add_argument("--burst", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=30, help="лимит FakeBot, сообщений/с")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.03)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
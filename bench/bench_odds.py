@@ -0,0 +1,113 @@
+"""Бенчмарк таблицы коэффициентов: разбор ответа /odds и расчёт рынков.
+
+Сравнивает расчёт на numpy с запасным путём на чистом Python и проверяет,
+что они дают одинаковый результат.
+
+    python bench/bench_odds.py --events 500 --books 30 --repeat 5
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import odds_table  # noqa: E402
+from odds_table import OddsTable, MARKETS, ROW  # noqa: E402
+
+TEAMS = ["Arsenal", "Chelsea", "Liverpool", "Real Madrid", "Barcelona", "Бавария", "Лейкерс", "Селтикс"]
+
+
+def fake_games(n, books, rng):
+    """Ответ /odds с h2h, totals и spreads у каждого букмекера"""
+    games = []
+    for i in range(n):
+        home, away = rng.sample(TEAMS, 2)
+        total = rng.choice([2.5, 3.5, 210.5])
+        spread = rng.choice([-1.5, -0.5, 0.5, 1.5])
+        bookmakers = []
+        for b in range(books):
+            shift = rng.choice([0, 0, 0, 1])  # часть букмекеров держит другую линию
+            bookmakers.append({
+                "key": f"book{b}",
+                "markets": [
+                    {"key": "h2h", "outcomes": [
+                        {"name": home, "price": round(rng.uniform(1.5, 3), 2)},
+                        {"name": "Draw", "price": round(rng.uniform(3, 4), 2)},
+                        {"name": away, "price": round(rng.uniform(1.5, 5), 2)},
+                    ]},
+                    {"key": "totals", "outcomes": [
+                        {"name": "Over", "price": round(rng.uniform(1.8, 2.05), 2), "point": total + shift},
+                        {"name": "Under", "price": round(rng.uniform(1.8, 2.05), 2), "point": total + shift},
+                    ]},
+                    {"key": "spreads", "outcomes": [
+                        {"name": home, "price": round(rng.uniform(1.8, 2.05), 2), "point": spread + shift},
+                        {"name": away, "price": round(rng.uniform(1.8, 2.05), 2), "point": -spread - shift},
+                    ]},
+                ],
+            })
+        games.append({"id": f"g{i}", "home_team": home, "away_team": away,
+                      "commence_time": "2030-01-01T00:00:00Z", "bookmakers": bookmakers})
+    return games
+
+
+def build(games):
+    table = OddsTable()
+    table.add_games("soccer_epl", games)
+    return table
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def same(a, b):
+    return json.dumps(a, sort_keys=True) == json.dumps(b, sort_keys=True)
+
+
+def main(args):
+    games = fake_games(args.events, args.books, random.Random(args.seed))
+    table = build(games)
+    quotes = len(table._rows) // ROW
+    timings = {"parse": timed(lambda: build(games), args.repeat)}
+
+    numpy = odds_table.np
+    results = {}
+    for backend in ("numpy", "python"):
+        if backend == "numpy" and numpy is None:
+            print("⚠️ numpy не установлен — сравниваем только чистый Python", file=sys.stderr)
+            continue
+        odds_table.np = numpy if backend == "numpy" else None
+        timings[f"compute_{backend}"] = timed(table.compute, args.repeat)
+        results[backend] = table.compute().summaries()
+    odds_table.np = numpy
+
+    report = {
+        "bench": "odds_table",
+        "events": args.events,
+        "books": args.books,
+        "markets": list(MARKETS),
+        "quotes": quotes,
+        "ms": {k: round(v * 1000, 2) for k, v in timings.items()},
+        "quotes_per_s": {k: round(quotes / v) for k, v in timings.items()},
+    }
+    if len(results) == 2:
+        report["backends_match"] = same(results["numpy"], results["python"])
+    report["sample"] = next(iter(next(iter(results.values())).values()))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--books", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    main(parser.parse_args())
@@ -0,0 +1,129 @@
+"""Бенчмарк расчёта ставок: построчный цикл (старый settle_bet) против settle_outcomes.
+
+    python bench/bench_settlement.py --events 20 --bets 5000 --users 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db  # noqa: E402
+from settlement import settle_outcomes  # noqa: E402
+
+
+async def settle_bet_loop(event_id, result):
+    """Прежняя реализация: SELECT всех ставок и два UPDATE на каждую"""
+    async with db.get_pool().write() as conn:
+        cursor = await conn.execute(
+            "SELECT * FROM bets WHERE event_id = ? AND result = 'pending'",
+            (event_id,)
+        )
+        settled = []
+        for bet in await cursor.fetchall():
+            bet = dict(bet)
+            if bet["pick"] == result:
+                await conn.execute("UPDATE bets SET result = 'win' WHERE id = ?", (bet["id"],))
+                await conn.execute(
+                    "UPDATE users SET balance = balance + ?, total_wins = total_wins + 1, total_profit = total_profit + ? WHERE user_id = ?",
+                    (bet["potential_win"], bet["potential_win"] - bet["amount"], bet["user_id"])
+                )
+                settled.append({"bet_id": bet["id"], "result": "win", "user_id": bet["user_id"]})
+            else:
+                await conn.execute("UPDATE bets SET result = 'lose' WHERE id = ?", (bet["id"],))
+                await conn.execute(
+                    "UPDATE users SET total_profit = total_profit - ? WHERE user_id = ?",
+                    (bet["amount"], bet["user_id"])
+                )
+                settled.append({"bet_id": bet["id"], "result": "lose", "user_id": bet["user_id"]})
+        return settled
+
+
+async def seed(users, events, bets, rng):
+    """Пользователи и ставки 'pending' на events матчей"""
+    picks = ("team_a", "draw", "team_b")
+    async with db.get_pool().write() as conn:
+        await conn.execute("DELETE FROM bets")
+        await conn.execute("DELETE FROM users")
+        await conn.executemany(
+            "INSERT INTO users (user_id, username, balance) VALUES (?, ?, ?)",
+            [(uid, f"user{uid}", 1000) for uid in range(1, users + 1)]
+        )
+        rows = []
+        for _ in range(bets):
+            odds = round(rng.uniform(1.2, 5.0), 2)
+            amount = rng.choice((10, 25, 50, 100))
+            rows.append((
+                rng.randint(1, users), f"evt{rng.randrange(events)}", "A vs B",
+                rng.choice(picks), "A", odds, amount, round(amount * odds, 2),
+            ))
+        await conn.executemany(
+            """INSERT INTO bets
+            (user_id, event_id, event_title, pick, pick_label, odds, amount, potential_win)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            rows
+        )
+
+
+async def snapshot():
+    async with db.get_pool().read() as conn:
+        cursor = await conn.execute(
+            "SELECT user_id, round(balance, 2), total_wins, round(total_profit, 2) FROM users ORDER BY user_id"
+        )
+        return [tuple(r) for r in await cursor.fetchall()]
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    outcomes = [(f"evt{i}", rng.choice(("team_a", "draw", "team_b"))) for i in range(args.events)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        await db.init_db()
+        try:
+            await seed(args.users, args.events, args.bets, random.Random(args.seed))
+            start = time.perf_counter()
+            for event_id, result in outcomes:
+                await settle_bet_loop(event_id, result)
+            loop_time = time.perf_counter() - start
+            expected = await snapshot()
+
+            await seed(args.users, args.events, args.bets, random.Random(args.seed))
+            start = time.perf_counter()
+            summaries = await settle_outcomes(outcomes)
+            bulk_time = time.perf_counter() - start
+            same = await snapshot() == expected
+
+            start = time.perf_counter()
+            again = await settle_outcomes(outcomes)
+            noop_time = time.perf_counter() - start
+        finally:
+            await db.close_db()
+
+    print(json.dumps({
+        "bench": "settlement",
+        "events": args.events,
+        "bets": args.bets,
+        "users": args.users,
+        "loop_s": round(loop_time, 4),
+        "bulk_s": round(bulk_time, 4),
+        "speedup": round(loop_time / bulk_time, 1) if bulk_time else None,
+        "users_settled": len(summaries),
+        "same_balances": same,
+        "rerun_s": round(noop_time, 4),
+        "rerun_settled": len(again),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--bets", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,41 @@
+"""Проверка, что горячие запросы database.py идут по индексам.
+
+    python bench/check_query_plans.py [путь к БД]
+
+Без аргумента проверяет свежую временную базу после всех миграций.
+Код выхода 1, если хоть один запрос делает полный проход по таблице.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db  # noqa: E402
+
+
+async def main(path):
+    db.DB_PATH = path
+    await db.init_db()
+    try:
+        report = await db.check_query_plans()
+    finally:
+        await db.close_db()
+
+    ok = True
+    for name, (plan, uses_index) in report.items():
+        ok = ok and uses_index
+        print(f"{'✅' if uses_index else '❌'} {name}")
+        for detail in plan:
+            print(f"     {detail}")
+    return ok
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        ok = asyncio.run(main(sys.argv[1]))
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            ok = asyncio.run(main(os.path.join(tmp, "check.db")))
+    sys.exit(0 if ok else 1)
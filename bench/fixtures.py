@@ -0,0 +1,97 @@
+"""Сид-генератор SQLite-фикстуры для нагрузочных тестов: игроки и открытые ставки.
+
+    python bench/fixtures.py data/bench.db --users 1000 --bets 20000 --events 200 --seed 1
+
+Одинаковый seed даёт одинаковую базу. Балансы и журнал согласованы (как после
+place_bet), ставки — на прошедшие матчи, так что их сразу можно рассчитывать.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db  # noqa: E402
+from config import START_BALANCE, SPORTS  # noqa: E402
+
+PICKS = (("team_a", "П1"), ("draw", "Ничья"), ("team_b", "П2"))
+
+
+def fixture_events(events, seed, now):
+    """Прошедшие матчи: (event_id, sport_key, commence_time)"""
+    rng = random.Random(f"{seed}:events")
+    result = []
+    for i in range(events):
+        start = now - rng.randint(6, 72) * 3600
+        result.append((
+            hashlib.md5(f"{seed}:fixture:{i}".encode()).hexdigest(),
+            rng.choice(SPORTS),
+            time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(start)),
+        ))
+    return result
+
+
+async def generate(path, users=1000, bets=20000, events=200, seed=1):
+    """Создать базу по пути path; возвращает сводку"""
+    for name in (path, f"{path}-wal", f"{path}-shm"):
+        if os.path.exists(name):
+            os.remove(name)
+    rng = random.Random(seed)
+    now = time.time()
+    matches = fixture_events(events, seed, now)
+    balances = {uid: float(START_BALANCE) for uid in range(1, users + 1)}
+    counts = dict.fromkeys(balances, 0)
+
+    bet_rows = []
+    ledger = [(uid, "opening", START_BALANCE, None, now) for uid in balances]
+    for bet_id in range(1, bets + 1):
+        uid = rng.randint(1, users)
+        amount = rng.choice((10, 20, 50))
+        if balances[uid] < amount:
+            continue
+        event_id, sport_key, commence_time = rng.choice(matches)
+        pick, label = rng.choice(PICKS if sport_key.startswith("soccer") else (PICKS[0], PICKS[2]))
+        odds = round(rng.uniform(1.3, 4.5), 2)
+        balances[uid] -= amount
+        counts[uid] += 1
+        bet_rows.append((
+            bet_id, uid, event_id, "Home vs Away", pick, label, odds, amount,
+            round(amount * odds, 2), sport_key, commence_time,
+        ))
+        ledger.append((uid, "bet", -amount, bet_id, now))
+
+    db.DB_PATH = path
+    await db.init_db()
+    try:
+        async with db.get_pool().write() as conn:
+            await conn.executemany(
+                "INSERT INTO users (user_id, username, balance, total_bets) VALUES (?, ?, ?, ?)",
+                [(uid, f"user{uid}", balances[uid], counts[uid]) for uid in balances]
+            )
+            await conn.executemany(
+                """INSERT INTO bets
+                (id, user_id, event_id, event_title, pick, pick_label, odds, amount, potential_win,
+                 sport_key, commence_time)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                bet_rows
+            )
+            await conn.executemany(db.LEDGER_INSERT, ledger)
+    finally:
+        await db.close_db()
+    return {"path": path, "users": users, "bets": len(bet_rows), "events": events, "seed": seed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--bets", type=int, default=20000)
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(generate(args.path, args.users, args.bets, args.events, args.seed)), indent=2))
@@ -0,0 +1,283 @@
+"""Нагрузочные сценарии API на заглушке The Odds API и сид-фикстуре.
+
+    python bench/load.py --out results.json
+    python bench/load.py --url http://127.0.0.1:8080 --scenarios events,leaderboard
+
+Без --url поднимает всё сам: фикстуру во временной папке, заглушку
+(stub_odds_api.py) и сервер (uvicorn server:app) с ODDS_BASE_URL на неё.
+Сценарии: events, bet, quick-bet, leaderboard, затем расчёт ставок фикстуры
+(settle) в этом же процессе. Результат — JSON с запросами в секунду и
+p50/p95/p99 задержки по каждому сценарию; его удобно сравнивать между коммитами.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+BENCH = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH)
+sys.path.insert(0, ROOT)
+
+SCENARIOS = ("events", "bet", "quick-bet", "leaderboard", "settle")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def summarize(latencies, errors, seconds):
+    """Пропускная способность и перцентили задержки, мс"""
+    n = len(latencies)
+    result = {"requests": n, "errors": errors, "seconds": round(seconds, 3),
+              "rps": round(n / seconds, 1) if seconds else None}
+    if n >= 2:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+        result.update(p50_ms=round(cuts[49] * 1000, 2), p95_ms=round(cuts[94] * 1000, 2),
+                      p99_ms=round(cuts[98] * 1000, 2), max_ms=round(max(latencies) * 1000, 2))
+    return result
+
+
+async def run_scenario(session, make_request, requests, concurrency):
+    """requests запросов в concurrency потоков; make_request(i) -> (метод, путь, json)"""
+    latencies = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            method, path, body = make_request(i)
+            start = time.perf_counter()
+            try:
+                async with session.request(method, path, json=body) as resp:
+                    await resp.read()
+                    if resp.status >= 400:
+                        errors += 1
+            except aiohttp.ClientError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def http_scenarios(url, names, args):
+    rng = random.Random(args.seed)
+    report = {}
+    timeout = aiohttp.ClientTimeout(total=60)
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(url, timeout=timeout, connector=connector) as session:
+        async with session.get("/api/events") as resp:
+            events = (await resp.json())["events"]
+        picks = [(e, pick, odds) for e in events
+                 for pick, odds in (("team_a", e["odds_a"]), ("draw", e["odds_draw"]), ("team_b", e["odds_b"]))
+                 if odds > 0]
+        sports = ["all"] + sorted({e["category"] for e in events})
+
+        def bet(_):
+            event, pick, odds = rng.choice(picks)
+            return "POST", "/api/bet", {
+                "user_id": rng.randint(1, args.users), "event_id": event["id"], "event_title": event["title"],
+                "pick": pick, "pick_label": pick, "odds": odds, "amount": 10,
+            }
+
+        requests = {
+            "events": lambda _: ("GET", f"/api/events?sport={rng.choice(sports)}", None),
+            "bet": bet,
+            "quick-bet": lambda _: ("POST", "/api/quick-bet", {
+                "user_id": rng.randint(1, args.users), "game": "coinflip",
+                "pick": rng.choice(("heads", "tails")), "amount": 10,
+            }),
+            "leaderboard": lambda _: ("GET", "/api/leaderboard", None),
+        }
+        for name in names:
+            if name in requests:
+                if name == "bet" and not picks:
+                    # Без событий сценарий ничего не мерит — это ошибка запуска, а не пропуск
+                    sys.exit("Сценарий bet: сервер не отдал ни одного события")
+                report[name] = await run_scenario(session, requests[name], args.requests, args.concurrency)
+                print(f"📊 {name}: {report[name]}")
+    return report
+
+
+async def settle_scenario(db_path, stub_url):
+    """Расчёт всех ставок фикстуры: опрос счёта у заглушки и settle_outcomes"""
+    import database as db
+    import odds_api
+    from settle_scheduler import SettlementScheduler
+
+    db.DB_PATH = db_path
+    odds_api.client.base_url = stub_url
+    await db.init_db()
+    try:
+        scheduler = SettlementScheduler()
+        start = time.perf_counter()
+        summaries = await scheduler.poll_once()
+        seconds = time.perf_counter() - start
+    finally:
+        await odds_api.close()
+        await db.close_db()
+    return {
+        "seconds": round(seconds, 3),
+        "bets": sum(s["bets"] for s in summaries),
+        "users": len(summaries),
+        "bets_per_s": round(sum(s["bets"] for s in summaries) / seconds) if seconds else None,
+    }
+
+
+async def wait_http(url, timeout):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(url) as resp:
+                    if resp.status < 500:
+                        return True
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    return False
+
+
+async def wait_events(url, timeout, streak):
+    """Ждать, пока /api/events отдаёт события streak раз подряд.
+
+    При нескольких воркерах запросы попадают в разные процессы, а последователь
+    отдаёт пустую ленту, пока не прочитал снимок лидера.
+    """
+    deadline = time.monotonic() + timeout
+    ready = 0
+    # Новое соединение на каждый запрос — иначе все запросы уйдут в один воркер
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(force_close=True)) as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(url) as resp:
+                    events = (await resp.json())["events"] if resp.status == 200 else []
+            except (aiohttp.ClientError, ValueError, KeyError):
+                events = []
+            ready = ready + 1 if events else 0
+            if ready >= streak:
+                return True
+            await asyncio.sleep(0 if events else 0.2)
+    return False
+
+
+def spawn(cmd, env, log):
+    return subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def stop(proc):
+    if proc.poll() is None:
+        proc.terminate()
+        try:
+            proc.wait(15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+async def main(args):
+    # stdout — только итоговый JSON, печать модулей сервиса уходит в stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        report = await run(args)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+async def run(args):
+    names = [n for n in args.scenarios.split(",") if n]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"Неизвестные сценарии: {', '.join(sorted(unknown))}")
+    report = {"bench": "load", "config": {k: v for k, v in vars(args).items() if k != "out"}}
+    try:
+        report["commit"] = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                          capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        report["commit"] = None
+
+    if args.url:
+        report["scenarios"] = await http_scenarios(args.url, names, args)
+        if "settle" in names:
+            report["scenarios"]["settle"] = {"skipped": "расчёт меряется только на своей фикстуре (без --url)"}
+    else:
+        from fixtures import generate
+
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "bench.db")
+            report["fixture"] = await generate(db_path, args.users, args.bets, args.fixture_events, args.seed)
+            stub_port, api_port = free_port(), free_port()
+            stub_url = f"http://127.0.0.1:{stub_port}/v4"
+            api_url = f"http://127.0.0.1:{api_port}"
+            env = dict(
+                os.environ, DB_PATH=db_path, ODDS_BASE_URL=stub_url, ODDS_API_KEY="stub", BOT_TOKEN="",
+                SNAPSHOT_PATH=os.path.join(tmp, "events.snapshot"), WORKERS=str(args.workers),
+                # Расчёт меряем отдельно, фоновый не должен в него вмешиваться
+                SETTLE_TICK="86400",
+            )
+            with open(os.path.join(tmp, "stub.log"), "w") as stub_log, \
+                    open(os.path.join(tmp, "server.log"), "w") as server_log:
+                stub = spawn([sys.executable, os.path.join(BENCH, "stub_odds_api.py"), "--port", str(stub_port),
+                              "--events", str(args.stub_events), "--books", str(args.books),
+                              "--latency", str(args.latency), "--error-rate", str(args.error_rate),
+                              "--seed", str(args.seed)], env, stub_log)
+                server = None
+                try:
+                    if not await wait_http(f"http://127.0.0.1:{stub_port}/stats", 30):
+                        sys.exit("Заглушка не запустилась")
+                    server = spawn([sys.executable, "-m", "uvicorn", "server:app", "--port", str(api_port),
+                                    "--workers", str(args.workers), "--log-level", "warning"], env, server_log)
+                    if not await wait_http(f"{api_url}/api/events", args.startup_timeout):
+                        server_log.flush()
+                        sys.exit("Сервер не запустился:\n" + open(server_log.name).read()[-2000:])
+                    if not await wait_events(f"{api_url}/api/events", args.startup_timeout, 4 * args.workers):
+                        sys.exit("Воркеры не получили события за --startup-timeout")
+                    report["scenarios"] = await http_scenarios(api_url, names, args)
+                finally:
+                    if server is not None:
+                        stop(server)
+                    async with aiohttp.ClientSession() as session:
+                        try:
+                            async with session.get(f"http://127.0.0.1:{stub_port}/stats") as resp:
+                                report["upstream"] = await resp.json()
+                        except aiohttp.ClientError:
+                            pass
+                    if "settle" in names:
+                        report.setdefault("scenarios", {})["settle"] = await settle_scenario(db_path, stub_url)
+                    stop(stub)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="уже запущенный сервер; без него всё поднимается само")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=2000, help="запросов на сценарий")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--bets", type=int, default=20000, help="ставок в фикстуре")
+    parser.add_argument("--fixture-events", type=int, default=200)
+    parser.add_argument("--stub-events", type=int, default=50, help="событий на вид спорта в заглушке")
+    parser.add_argument("--books", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--startup-timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="записать JSON ещё и в файл")
+    asyncio.run(main(parser.parse_args()))
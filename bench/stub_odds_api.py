@@ -0,0 +1,171 @@
+"""Локальная заглушка The Odds API для нагрузочных тестов.
+
+    python bench/stub_odds_api.py --port 9100 --events 50 --books 20 --latency 0.05 --error-rate 0.05
+
+Сервер с ODDS_BASE_URL=http://127.0.0.1:9100/v4 ходит сюда вместо настоящего
+API. Отдаёт /v4/sports/{sport}/odds/ и /scores/ в формате The Odds API:
+N событий на вид спорта, M букмекеров, h2h/totals/spreads, заголовки квоты.
+Задержка ответа и доля 429 настраиваются; /stats — сколько запросов пришло.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+
+from aiohttp import web
+
+TEAMS = [
+    "Arsenal", "Chelsea", "Liverpool", "Tottenham", "Real Madrid", "Barcelona", "Atletico",
+    "Бавария", "Ювентус", "Лейкерс", "Селтикс", "Уорриорз", "Nadal", "Djokovic", "Alcaraz",
+]
+
+
+def make_games(sport, events, books, seed, now):
+    """События одного вида спорта: одинаковые при одном seed, начало — в ближайшую неделю"""
+    rng = random.Random(f"{seed}:{sport}")
+    games = []
+    for i in range(events):
+        home, away = rng.sample(TEAMS, 2)
+        start = now + rng.randint(1, 7 * 24) * 3600
+        total = rng.choice([2.5, 3.5, 210.5])
+        spread = rng.choice([-1.5, -0.5, 0.5, 1.5])
+        strength = rng.uniform(0.25, 0.65)  # вероятность победы хозяев
+        draw = 0.25 if sport.startswith("soccer") else 0
+        bookmakers = []
+        for b in range(books):
+            margin = rng.uniform(1.03, 1.08)
+            shift = rng.choice([0, 0, 0, 1])
+
+            def price(p):
+                return round(max(1.01, 1 / (p * margin) * rng.uniform(0.97, 1.03)), 2)
+
+            h2h = [{"name": home, "price": price(strength * (1 - draw))},
+                   {"name": away, "price": price((1 - strength) * (1 - draw))}]
+            if draw:
+                h2h.append({"name": "Draw", "price": price(draw)})
+            bookmakers.append({
+                "key": f"book{b}",
+                "title": f"Book {b}",
+                "markets": [
+                    {"key": "h2h", "outcomes": h2h},
+                    {"key": "totals", "outcomes": [
+                        {"name": "Over", "price": price(0.5), "point": total + shift},
+                        {"name": "Under", "price": price(0.5), "point": total + shift},
+                    ]},
+                    {"key": "spreads", "outcomes": [
+                        {"name": home, "price": price(0.5), "point": spread + shift},
+                        {"name": away, "price": price(0.5), "point": -spread - shift},
+                    ]},
+                ],
+            })
+        games.append({
+            "id": hashlib.md5(f"{seed}:{sport}:{i}".encode()).hexdigest(),
+            "sport_key": sport,
+            "commence_time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(start)),
+            "home_team": home,
+            "away_team": away,
+            "bookmakers": bookmakers,
+        })
+    return games
+
+
+def final_score(event_id):
+    """Счёт завершённого матча — детерминированно по id"""
+    digest = hashlib.md5(event_id.encode()).digest()
+    return digest[0] % 4, digest[1] % 4
+
+
+class StubOddsApi:
+    def __init__(self, events=50, books=20, latency=0.05, jitter=0.02, error_rate=0.0,
+                 quota=100000, seed=1):
+        self.events = events
+        self.books = books
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.quota = quota
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.now = time.time()
+        self.used = 0
+        self.requests = {"odds": 0, "scores": 0, "throttled": 0}
+        self._games = {}
+
+    def games(self, sport):
+        if sport not in self._games:
+            self._games[sport] = make_games(sport, self.events, self.books, self.seed, self.now)
+        return self._games[sport]
+
+    async def _reply(self, kind, payload, cost=1):
+        self.requests[kind] += 1
+        await asyncio.sleep(self.latency + self.rng.random() * self.jitter)
+        if self.rng.random() < self.error_rate:
+            self.requests["throttled"] += 1
+            return web.json_response({"message": "Too many requests"}, status=429, headers={"retry-after": "1"})
+        self.used += cost
+        headers = {
+            "x-requests-remaining": str(max(self.quota - self.used, 0)),
+            "x-requests-used": str(self.used),
+        }
+        return web.json_response(payload, headers=headers, dumps=lambda d: json.dumps(d, ensure_ascii=False))
+
+    async def odds(self, request):
+        markets = set(request.query.get("markets", "h2h").split(","))
+        ids = {i for i in request.query.get("eventIds", "").split(",") if i}
+        games = []
+        for game in self.games(request.match_info["sport"]):
+            if ids and game["id"] not in ids:
+                continue
+            books = [dict(b, markets=[m for m in b["markets"] if m["key"] in markets]) for b in game["bookmakers"]]
+            games.append(dict(game, bookmakers=books))
+        # Как у настоящего API: каждый рынок списывает квоту отдельно
+        return await self._reply("odds", games, cost=len(markets))
+
+    async def scores(self, request):
+        sport = request.match_info["sport"]
+        ids = [i for i in request.query.get("eventIds", "").split(",") if i]
+        games = []
+        for event_id in ids:
+            home, away = final_score(event_id)
+            games.append({
+                "id": event_id,
+                "sport_key": sport,
+                "completed": True,
+                "home_team": "Home",
+                "away_team": "Away",
+                "scores": [{"name": "Home", "score": str(home)}, {"name": "Away", "score": str(away)}],
+            })
+        return await self._reply("scores", games)
+
+    async def stats(self, request):
+        return web.json_response(dict(self.requests, quota_used=self.used))
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/v4/sports/{sport}/odds/", self.odds)
+        app.router.add_get("/v4/sports/{sport}/scores/", self.scores)
+        app.router.add_get("/stats", self.stats)
+        return app
+
+
+def main(args):
+    stub = StubOddsApi(events=args.events, books=args.books, latency=args.latency, jitter=args.jitter,
+                       error_rate=args.error_rate, quota=args.quota, seed=args.seed)
+    print(f"🧪 Заглушка The Odds API: http://{args.host}:{args.port}/v4")
+    web.run_app(stub.app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--events", type=int, default=50, help="событий на вид спорта")
+    parser.add_argument("--books", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="сек")
+    parser.add_argument("--jitter", type=float, default=0.02, help="сек")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--quota", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=1)
+    main(parser.parse_args())
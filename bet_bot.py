@@ -1,14 +1,15 @@
 import asyncio
+import contextlib
 import logging
-from threading import Thread
+import signal
 
 import uvicorn
 from aiogram import Bot, Dispatcher, types
 from aiogram.filters import Command
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo
 
-from config import BOT_TOKEN, WEBAPP_URL, SERVER_HOST, SERVER_PORT
-from server import app as fastapi_app
+from config import BOT_TOKEN, WEBAPP_URL, SERVER_HOST, SERVER_PORT, USE_UVLOOP
+import server
 import database as db
 
 logging.basicConfig(level=logging.INFO)
@@ -40,26 +41,73 @@ async def cmd_balance(message: types.Message):
     await message.answer(f"💰 Баланс: <b>{int(user['balance'])}</b> монет", parse_mode="HTML")
 
 
-def run_server():
-    uvicorn.run(fastapi_app, host=SERVER_HOST, port=SERVER_PORT, log_level="info")
+class ApiServer(uvicorn.Server):
+    """uvicorn без своих обработчиков сигналов — остановкой управляет main()"""
 
+    @contextlib.contextmanager
+    def capture_signals(self):
+        yield
 
-async def main():
-    await db.init_db()
 
+async def main():
     print("=" * 50)
     print(f"BOT_TOKEN: {'SET' if BOT_TOKEN else 'NOT SET!'}")
     print(f"WEBAPP_URL: {WEBAPP_URL}")
     print(f"SERVER_PORT: {SERVER_PORT}")
     print("=" * 50)
 
-    server_thread = Thread(target=run_server, daemon=True)
-    server_thread.start()
+    # API и бот в одном event loop: общие пул БД, кэши, фоновые задачи и сессия бота
+    server.notifier.bot = bot
+    api = ApiServer(uvicorn.Config(
+        server.app, host=SERVER_HOST, port=SERVER_PORT, log_level="info",
+        timeout_graceful_shutdown=10,
+    ))
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop.set)
+
+    serving = asyncio.create_task(api.serve())
+    # Апдейты принимаем только после startup: БД и кэши уже готовы
+    while not api.started:
+        if serving.done():
+            await serving
+            return
+        await asyncio.sleep(0.05)
     print(f"✅ Сервер запущен на порту {SERVER_PORT}")
-    print("✅ Бот запущен!")
 
-    await dp.start_polling(bot)
+    polling = asyncio.create_task(
+        dp.start_polling(bot, handle_signals=False, close_bot_session=False)
+    )
+    print("✅ Бот запущен!")
+    stopping = asyncio.create_task(stop.wait())
+    await asyncio.wait([serving, polling, stopping], return_when=asyncio.FIRST_COMPLETED)
+
+    # Порядок остановки: бот перестаёт брать апдейты, SSE-потоки закрываются,
+    # API дорабатывает запросы, lifespan доводит расчёт до конца и закрывает БД
+    print("🛑 Останавливаемся...")
+    if not polling.done():
+        await dp.stop_polling()
+    await asyncio.gather(polling, return_exceptions=True)
+    server.stopping.set()
+    server.push_hub.close()
+    api.should_exit = True
+    await serving
+    stopping.cancel()
+    await bot.session.close()
+
+
+def run():
+    if USE_UVLOOP:
+        try:
+            import uvloop
+        except ImportError:
+            pass
+        else:
+            return uvloop.run(main())
+    asyncio.run(main())
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run()
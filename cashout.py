@@ -0,0 +1,84 @@
+import math
+import time
+
+from config import CASHOUT_MARGIN, CASHOUT_QUOTE_TTL
+from odds_api import parse_time
+
+# Исход ставки -> исход рынка h2h в OddsTable.summary()
+PICK_OUTCOMES = {"team_a": "a", "draw": "draw", "team_b": "b"}
+
+
+def offered_odds(event, pick, now=None):
+    """Коэффициент ленты на исход; None — матча нет, он уже начался или исход не котируется"""
+    if event is None:
+        return None
+    start = parse_time(event.commence_time)
+    if start is None or start <= (now or time.time()):
+        return None
+    odds = {"team_a": event.odds_a, "draw": event.odds_draw, "team_b": event.odds_b}.get(pick, 0)
+    return odds if odds > 0 else None
+
+
+def pick_pricing(markets, event, pick, now=None):
+    """(вероятность исхода, текущий коэффициент ленты) для оценки ставки; None — оценить нельзя.
+
+    Берём консенсус всех букмекеров без маржи (markets из OddsTable), но не выше
+    вероятности по нашему текущему коэффициенту: лента предлагает лучшую цену
+    рынка, и без этого ограничения ставку можно было бы сразу продать дороже
+    суммы ставки. После начала матча предматчевые коэффициенты уже не годятся.
+    """
+    odds = offered_odds(event, pick, now)
+    if odds is None:
+        return None
+    offered = 1 / odds
+    h2h = (markets or {}).get("h2h")
+    outcome = PICK_OUTCOMES.get(pick)
+    if h2h and outcome in h2h["outcomes"]:
+        return min(h2h["outcomes"][outcome]["probability"], offered), odds
+    return offered, odds
+
+
+class CashoutPricer:
+    """Цена кэшаута: текущая справедливая стоимость ставки минус маржа.
+
+    Ставка с коэффициентом k на сумму s сейчас стоит s·k·p, где p — текущая
+    вероятность исхода (pick_pricing). k не больше текущего коэффициента ленты:
+    ставка, записанная по завышенному коэффициенту, не стоит дороже такой же по
+    рыночному. Цены считаются сразу по пачке ставок (всем открытым ставкам игрока
+    или всем открытым после обновления коэффициентов) и выдаются котировками со
+    сроком действия.
+    """
+
+    def __init__(self, pricing, margin=CASHOUT_MARGIN, ttl=CASHOUT_QUOTE_TTL):
+        self.pricing = pricing  # (event_id, pick) -> (p, коэффициент ленты) или None
+        self.margin = margin
+        self.ttl = ttl
+
+    def price(self, bets):
+        """Цены для ставок (строки bets: amount, odds, event_id, pick); None — кэшаута нет"""
+        # Ставок на один исход много — вероятность считаем один раз на исход
+        known = {}
+        prices = []
+        for b in bets:
+            key = (b["event_id"], b["pick"])
+            if key not in known:
+                known[key] = self.pricing(*key)
+            prices.append(known[key])
+        keep = 1 - self.margin
+        # Вниз до копейки — округление не в пользу игрока
+        return [
+            None if x is None else math.floor(b["amount"] * min(b["odds"], x[1]) * x[0] * keep * 100) / 100
+            for b, x in zip(bets, prices)
+        ]
+
+    def quotes(self, bets, now=None):
+        """Котировки [(bet_id, user_id, сумма, действует до)]; нулевые и неоценимые пропускаем"""
+        expires_at = (now or time.time()) + self.ttl
+        return [
+            (b["id"], b["user_id"], value, expires_at)
+            for b, value in zip(bets, self.price(bets))
+            if value
+        ]
+
+    def price_one(self, bet):
+        return self.price([bet])[0]
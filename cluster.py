@@ -0,0 +1,89 @@
+import mmap
+import os
+import socket
+import struct
+import uuid
+
+import database as db
+
+MAGIC = b"BETSNAP1"
+# magic, версия снимка, время обновления событий, длина тела
+HEADER = struct.Struct("<8sQdQ")
+
+
+class LeaderLease:
+    """Аренда лидерства в таблице leases: лидер продлевает её, пока жив.
+
+    Если лидер пропал, аренда истекает через ttl и её забирает другой процесс.
+    """
+
+    def __init__(self, name, ttl=15):
+        self.name = name
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+
+    async def acquire(self):
+        """Захватить или продлить аренду; True — мы лидер"""
+        self.is_leader = await db.acquire_lease(self.name, self.owner, self.ttl)
+        return self.is_leader
+
+    async def release(self):
+        if self.is_leader:
+            await db.release_lease(self.name, self.owner)
+            self.is_leader = False
+
+
+class SnapshotFile:
+    """Снимок событий в файле: пишет лидер, остальные процессы читают через mmap.
+
+    Файл заменяется атомарно (os.replace); читатель переоткрывает его при смене
+    inode. Версия в заголовке — дешёвая проверка, появилось ли что-то новое.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._map = None
+        self._inode = None
+
+    def write(self, updated, body):
+        """Записать новый снимок; версия растёт и при смене лидера"""
+        version = (self.version() or 0) + 1
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, version, updated, len(body)))
+            f.write(body)
+        os.replace(tmp, self.path)
+        return version
+
+    def _open(self):
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return False
+        if inode != self._inode:
+            self.close()
+            with open(self.path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._inode = inode
+        return len(self._map) >= HEADER.size
+
+    def version(self):
+        if not self._open():
+            return None
+        magic, version, _, _ = HEADER.unpack_from(self._map)
+        return version if magic == MAGIC else None
+
+    def read(self):
+        """(версия, время обновления, тело) или None, если снимка ещё нет"""
+        if self.version() is None:
+            return None
+        _, version, updated, length = HEADER.unpack_from(self._map)
+        return version, updated, self._map[HEADER.size:HEADER.size + length]
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._map = None
+        self._inode = None
@@ -6,6 +6,9 @@ ODDS_API_KEY = os.getenv("ODDS_API_KEY", "")
 
 SERVER_HOST = "0.0.0.0"
 SERVER_PORT = int(os.getenv("PORT", 8080))
+USE_UVLOOP = os.getenv("UVLOOP", "1") == "1"  # если uvloop установлен
+# Процессов API (uvicorn --workers N). Больше одного — выбор лидера и общий снимок событий
+WORKERS = int(os.getenv("WORKERS", 1))
 START_BALANCE = 1000
 
 SPORTS = [
@@ -23,3 +26,66 @@ SPORT_NAMES = {
     "basketball_nba": "🏀 NBA",
     "tennis_atp_french_open": "🎾 ATP",
 }
+
+# SQLite
+DB_PATH = os.getenv("DB_PATH", os.path.join("data", "betting.db"))
+DB_READERS = int(os.getenv("DB_READERS", 4))
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+DB_CACHE_SIZE = int(os.getenv("DB_CACHE_SIZE", -16000))  # отрицательное — в КиБ
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", 256 * 1024 * 1024))
+
+# The Odds API
+ODDS_BASE_URL = os.getenv("ODDS_BASE_URL", "https://api.the-odds-api.com/v4")  # для тестов — bench/stub_odds_api.py
+ODDS_CONCURRENCY = int(os.getenv("ODDS_CONCURRENCY", 5))
+ODDS_RATE = float(os.getenv("ODDS_RATE", 5))  # запросов в секунду в среднем
+ODDS_BURST = int(os.getenv("ODDS_BURST", 10))
+ODDS_QUOTA_RESERVE = int(os.getenv("ODDS_QUOTA_RESERVE", 50))  # неприкосновенный запас квоты
+# h2h, totals, spreads; каждый рынок в запросе списывает из квоты отдельно
+ODDS_MARKETS = os.getenv("ODDS_MARKETS", "h2h").split(",")
+# Кредитов квоты в час на обновление коэффициентов; план растягивается, чтобы уложиться
+ODDS_HOURLY_BUDGET = float(os.getenv("ODDS_HOURLY_BUDGET", 120))
+ODDS_REFRESH_TICK = float(os.getenv("ODDS_REFRESH_TICK", 30))  # как часто сверяться с планом, сек
+
+# Расчёт ставок
+SETTLE_TICK = int(os.getenv("SETTLE_TICK", 60))  # как часто проверять, чей опрос подошёл
+SETTLE_GRACE = int(os.getenv("SETTLE_GRACE", 600))  # запас после ожидаемого конца матча
+SETTLE_BACKOFF = int(os.getenv("SETTLE_BACKOFF", 300))
+SETTLE_MAX_BACKOFF = int(os.getenv("SETTLE_MAX_BACKOFF", 3600))
+
+# Журнал баланса (write-behind для быстрых игр)
+LEDGER_FLUSH_INTERVAL = float(os.getenv("LEDGER_FLUSH_INTERVAL", 0.005))  # окно групповой записи, сек
+LEDGER_MAX_BATCH = int(os.getenv("LEDGER_MAX_BATCH", 5000))
+LEDGER_MAX_ACTIVE = int(os.getenv("LEDGER_MAX_ACTIVE", 10000))  # игроков с балансом в памяти
+LEDGER_STOP_TIMEOUT = float(os.getenv("LEDGER_STOP_TIMEOUT", 10))  # сколько ждать дозаписи при остановке, сек
+
+# Кэш профилей игроков
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+# сек; страховка от записей мимо этого процесса — при нескольких воркерах их много
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 60 if WORKERS == 1 else 2))
+
+# Push-поток изменений (SSE)
+PUSH_QUEUE_SIZE = int(os.getenv("PUSH_QUEUE_SIZE", 100))  # кадров на подписчика, дальше — resync
+PUSH_HEARTBEAT = float(os.getenv("PUSH_HEARTBEAT", 15))  # сек
+
+# Кэшаут
+CASHOUT_MARGIN = float(os.getenv("CASHOUT_MARGIN", 0.05))  # доля от справедливой стоимости ставки
+CASHOUT_QUOTE_TTL = float(os.getenv("CASHOUT_QUOTE_TTL", 30))  # сек, сколько держится цена
+
+# История коэффициентов
+HISTORY_CHUNK_POINTS = int(os.getenv("HISTORY_CHUNK_POINTS", 256))  # точек в одном куске ряда
+HISTORY_CHUNK_SPAN = int(os.getenv("HISTORY_CHUNK_SPAN", 6 * 3600))  # сек, которые покрывает кусок
+HISTORY_RAW_AGE = int(os.getenv("HISTORY_RAW_AGE", 2 * 86400))  # сек; старше — прореживаем
+HISTORY_STEP = int(os.getenv("HISTORY_STEP", 3600))  # шаг прореженного ряда, сек
+HISTORY_RETENTION = int(os.getenv("HISTORY_RETENTION", 30 * 86400))  # сек; старше — удаляем
+
+# Уведомления в Telegram (глобальный лимит ~30 сообщений/с)
+NOTIFY_RATE = float(os.getenv("NOTIFY_RATE", 25))  # сообщений в секунду
+NOTIFY_BURST = int(os.getenv("NOTIFY_BURST", 5))  # rate + burst — не больше лимита за секунду
+NOTIFY_WORKERS = int(os.getenv("NOTIFY_WORKERS", 8))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", 5))
+
+# Несколько воркеров
+LEASE_TTL = float(os.getenv("LEASE_TTL", 15))  # сек; лидер продлевает аренду каждые LEASE_TTL / 3
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", os.path.join("data", "events.snapshot"))
+SNAPSHOT_POLL = float(os.getenv("SNAPSHOT_POLL", 1))  # как часто воркеры проверяют версию снимка, сек
+LEADERBOARD_MAX_AGE = float(os.getenv("LEADERBOARD_MAX_AGE", 2))  # перечитывать топ из БД, сек
@@ -1,114 +1,542 @@
-import aiosqlite
 import os
 import time
-from config import START_BALANCE
+from config import (DB_PATH, START_BALANCE, DB_READERS, DB_SYNCHRONOUS, DB_CACHE_SIZE, DB_MMAP_SIZE,
+                    USER_CACHE_SIZE, USER_CACHE_TTL)
+from db_pool import ConnectionPool
+from user_cache import UserCache
+from models import Event, BetItem, BET_ITEM_FIELDS
+from metrics import Histogram, timed
 
-DB_PATH = os.path.join("data", "betting.db")
+# Время вызова функций этого модуля — с ожиданием соединения из пула
+DB_TIME = Histogram("db_query_duration_seconds", "Время запросов к SQLite по функциям database.py",
+                    labels=("function",))
+db_timed = timed(DB_TIME)
+
+# Один пул на процесс: бот и API работают в одном event loop
+_pool = None
+
+
+def get_pool():
+    if _pool is None:
+        raise RuntimeError("База не открыта: сначала вызовите init_db()")
+    return _pool
 
 
 async def init_db():
-    os.makedirs("data", exist_ok=True)
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY,
-                username TEXT,
-                balance REAL DEFAULT 1000,
-                total_bets INTEGER DEFAULT 0,
-                total_wins INTEGER DEFAULT 0,
-                total_profit REAL DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS bets (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                event_id TEXT,
-                event_title TEXT,
-                pick TEXT,
-                pick_label TEXT,
-                odds REAL,
-                amount REAL,
-                potential_win REAL,
-                result TEXT DEFAULT 'pending',
-                cashout_available INTEGER DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS cached_events (
-                id TEXT PRIMARY KEY,
-                data TEXT,
-                updated_at REAL
+    os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
+    global _pool
+    if _pool is None:
+        pool = ConnectionPool(
+            DB_PATH,
+            readers=DB_READERS,
+            synchronous=DB_SYNCHRONOUS,
+            cache_size=DB_CACHE_SIZE,
+            mmap_size=DB_MMAP_SIZE,
+        )
+        await pool.open()
+        _pool = pool
+
+    async with get_pool().write() as db:
+        version, latest = await migrate(db)
+        if await _crashed_workers(db):
+            # Какой-то процесс не закрыл базу — сверяем балансы с журналом
+            fixed = await rebuild_balances(db)
+            user_cache.clear()
+            if fixed:
+                print(f"🧾 Восстановление после сбоя: балансы пересчитаны по журналу ({fixed} исправлено)")
+        await db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                         (_running_key(os.getpid()), str(time.time())))
+    if version != latest:
+        print(f"🗄 Схема БД обновлена: v{version} → v{latest}")
+
+
+# --- Чистое завершение ---
+# Каждый процесс держит в meta строку running:<pid>, пока база открыта, и удаляет
+# её в close_db. Строка процесса, которого уже нет, значит, что он упал.
+
+def _running_key(pid):
+    return f"running:{pid}"
+
+
+def _pid_alive(pid):
+    if pid == os.getpid():
+        # Наша строка до регистрации осталась от упавшего процесса с тем же pid
+        # (в контейнере это всегда 1)
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+async def _crashed_workers(db):
+    """Убрать строки упавших процессов; True, если такие были"""
+    cursor = await db.execute("SELECT key, value FROM meta WHERE key LIKE 'running:%' OR key = 'clean_shutdown'")
+    crashed = False
+    for key, value in await cursor.fetchall():
+        if key == "clean_shutdown":
+            # Общий флаг из прошлых версий: '0' — базу не закрыли
+            dead = value == "0"
+        else:
+            dead = not _pid_alive(int(key.split(":", 1)[1]))
+        if key == "clean_shutdown" or dead:
+            await db.execute("DELETE FROM meta WHERE key = ?", (key,))
+        crashed = crashed or dead
+    return crashed
+
+
+# --- Миграции ---
+# Версия схемы хранится в PRAGMA user_version; миграция N переводит базу из N-1 в N.
+
+async def _migration_1(db):
+    """Исходная схема"""
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            balance REAL DEFAULT 1000,
+            total_bets INTEGER DEFAULT 0,
+            total_wins INTEGER DEFAULT 0,
+            total_profit REAL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS bets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            event_id TEXT,
+            event_title TEXT,
+            pick TEXT,
+            pick_label TEXT,
+            odds REAL,
+            amount REAL,
+            potential_win REAL,
+            result TEXT DEFAULT 'pending',
+            cashout_available INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS cached_events (
+            id TEXT PRIMARY KEY,
+            data TEXT,
+            updated_at REAL
+        )
+    """)
+
+
+async def _migration_2(db):
+    """Хэш события в кэше; вид спорта и время начала у ставки"""
+    # Базы, созданные до миграций, могли уже получить эти колонки
+    await _add_column(db, "cached_events", "hash", "TEXT")
+    await _add_column(db, "bets", "sport_key", "TEXT")
+    await _add_column(db, "bets", "commence_time", "TEXT")
+
+
+async def _migration_3(db):
+    """Индексы под горячие запросы"""
+    # История ставок игрока: WHERE user_id = ? ORDER BY created_at DESC
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_bets_user_created ON bets (user_id, created_at, id)"
+    )
+    # Открытые ставки по матчу: только 'pending', покрывает выборку для планировщика расчёта
+    await db.execute(
+        """CREATE INDEX IF NOT EXISTS idx_bets_pending_event
+        ON bets (event_id, sport_key, commence_time) WHERE result = 'pending'"""
+    )
+    # Лидерборд: ORDER BY balance DESC, user_id LIMIT ?
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_users_balance ON users (balance DESC)")
+
+
+async def _migration_4(db):
+    """Журнал движений баланса и служебные флаги"""
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            amount REAL NOT NULL,
+            ref TEXT,
+            created_at REAL
+        )
+    """)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_ledger_user ON ledger (user_id, id)")
+    # Текущие балансы — входящие остатки, чтобы сумма журнала давала баланс
+    await db.execute(
+        "INSERT INTO ledger (user_id, kind, amount, created_at) SELECT user_id, 'opening', balance, ? FROM users",
+        (time.time(),)
+    )
+    await db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+
+async def _migration_5(db):
+    """Очередь исходящих уведомлений: переживает перезапуск"""
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            attempts INTEGER DEFAULT 0,
+            created_at REAL
+        )
+    """)
+
+
+async def _migration_6(db):
+    """Аренды лидерства для нескольких воркеров"""
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    """)
+
+
+async def _migration_7(db):
+    """Котировки кэшаута: цена, которую игрок видел, действует до expires_at"""
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS cashout_quotes (
+            bet_id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    """)
+
+
+async def _migration_8(db):
+    """История коэффициентов: куски рядов цен по (событие, исход), см. odds_history.py"""
+    # step = 0 — все изменения, иначе ряд прорежен до шага step секунд
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS odds_history (
+            event_id TEXT NOT NULL,
+            outcome TEXT NOT NULL,
+            step INTEGER NOT NULL,
+            start INTEGER NOT NULL,
+            last_time INTEGER NOT NULL,
+            last_price INTEGER NOT NULL,
+            points INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            PRIMARY KEY (event_id, outcome, step, start)
+        ) WITHOUT ROWID
+    """)
+    # Прореживание и удаление старых кусков
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_odds_history_last ON odds_history (last_time)")
+
+
+async def _migration_9(db):
+    """Индекс истории ставок по результату"""
+    # История с фильтром: WHERE user_id = ? AND result = ? ORDER BY created_at DESC, id DESC.
+    # amount и potential_win в хвосте — сводка по открытым ставкам считается из индекса без чтения строк
+    await db.execute(
+        """CREATE INDEX IF NOT EXISTS idx_bets_user_result_created
+        ON bets (user_id, result, created_at, id, amount, potential_win)"""
+    )
+
+
+MIGRATIONS = [
+    _migration_1, _migration_2, _migration_3, _migration_4, _migration_5, _migration_6, _migration_7,
+    _migration_8, _migration_9,
+]
+
+
+async def migrate(db):
+    """Применить недостающие миграции. Возвращает (было, стало)"""
+    cursor = await db.execute("PRAGMA user_version")
+    version = (await cursor.fetchone())[0]
+    for target in range(version + 1, len(MIGRATIONS) + 1):
+        await MIGRATIONS[target - 1](db)
+        # user_version пишется в заголовок БД в той же транзакции
+        await db.execute(f"PRAGMA user_version = {target}")
+    return version, max(version, len(MIGRATIONS))
+
+
+async def _add_column(db, table, column, decl):
+    cursor = await db.execute(f"PRAGMA table_info({table})")
+    if column not in {r["name"] for r in await cursor.fetchall()}:
+        await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+BET_ITEM_COLUMNS = ", ".join(BET_ITEM_FIELDS)
+BET_RESULTS = ("pending", "win", "lose", "cashout")
+
+# Горячие запросы и параметры для EXPLAIN QUERY PLAN
+HOT_QUERIES = {
+    "get_user_bets": (
+        f"""SELECT {BET_ITEM_COLUMNS} FROM bets WHERE user_id = ? AND (created_at, id) < (?, ?)
+        ORDER BY created_at DESC, id DESC LIMIT ?""", (1, "9999", 0, 31)
+    ),
+    "get_user_bets_by_result": (
+        f"""SELECT {BET_ITEM_COLUMNS} FROM bets WHERE user_id = ? AND result = ? AND created_at >= ?
+        ORDER BY created_at DESC, id DESC LIMIT ?""", (1, "win", "2000-01-01", 31)
+    ),
+    "get_bets_summary": (
+        """SELECT COUNT(*), SUM(amount), SUM(potential_win) FROM bets
+        WHERE user_id = ? AND result = 'pending'""", (1,)
+    ),
+    "pending_by_event": (
+        "SELECT * FROM bets WHERE event_id = ? AND result = 'pending'", ("x",)
+    ),
+    "get_pending_bets": (
+        "SELECT DISTINCT event_id FROM bets WHERE result = 'pending'", ()
+    ),
+    "count_pending_bets": (
+        "SELECT COUNT(*) FROM bets WHERE result = 'pending'", ()
+    ),
+    "get_pending_events": (
+        """SELECT event_id, MAX(sport_key), MIN(commence_time)
+        FROM bets WHERE result = 'pending' GROUP BY event_id""", ()
+    ),
+    "get_leaderboard": (
+        "SELECT user_id, username, balance, total_bets, total_wins FROM users ORDER BY balance DESC, user_id LIMIT ?", (20,)
+    ),
+    "get_odds_history": (
+        "SELECT outcome, start, data FROM odds_history WHERE event_id = ?", ("x",)
+    ),
+    "get_raw_history": (
+        "SELECT * FROM odds_history WHERE last_time < ? AND step = 0", (0,)
+    ),
+}
+
+
+async def check_query_plans():
+    """EXPLAIN QUERY PLAN для горячих запросов: {имя: (план, использует_индекс)}"""
+    report = {}
+    async with get_pool().read() as db:
+        # EXPLAIN не перечитывает схему: читатель, открытый до миграций, показал бы
+        # план без новых индексов. Обычный запрос перечитывает её по schema cookie
+        await db.execute("SELECT COUNT(*) FROM sqlite_master")
+        for name, (sql, params) in HOT_QUERIES.items():
+            cursor = await db.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plan = [r["detail"] for r in await cursor.fetchall()]
+            full_scan = any(d.startswith("SCAN") and "INDEX" not in d for d in plan)
+            report[name] = (plan, not full_scan)
+    return report
+
+
+async def close_db():
+    """Закрыть пул соединений"""
+    global _pool
+    pool, _pool = _pool, None
+    if pool:
+        async with pool.write() as db:
+            await db.execute("DELETE FROM meta WHERE key = ?", (_running_key(os.getpid()),))
+        await pool.close()
+
+
+# --- Журнал баланса ---
+# Каждое движение баланса — строка ledger в той же транзакции, что и UPDATE users.
+# Сумма журнала по игроку равна его балансу.
+
+LEDGER_INSERT = "INSERT INTO ledger (user_id, kind, amount, ref, created_at) VALUES (?, ?, ?, ?, ?)"
+
+
+async def rebuild_balances(db):
+    """Пересчитать users.balance по журналу; возвращает число исправленных строк"""
+    cursor = await db.execute("""
+        UPDATE users SET balance = j.total
+        FROM (SELECT user_id, SUM(amount) AS total FROM ledger GROUP BY user_id) AS j
+        WHERE users.user_id = j.user_id AND abs(users.balance - j.total) > 0.005
+        RETURNING user_id
+    """)
+    return len(await cursor.fetchall())
+
+
+@db_timed
+async def append_ledger(entries):
+    """Групповая запись: все записи журнала и изменения балансов одной транзакцией.
+
+    entries — [(user_id, kind, amount, ref, created_at), ...].
+    """
+    deltas = {}
+    for user_id, _, amount, _, _ in entries:
+        deltas[user_id] = deltas.get(user_id, 0) + amount
+    users = []
+    async with get_pool().write() as db:
+        await db.executemany(LEDGER_INSERT, entries)
+        for user_id, delta in deltas.items():
+            cursor = await db.execute(
+                "UPDATE users SET balance = balance + ? WHERE user_id = ? RETURNING *",
+                (delta, user_id)
             )
-        """)
-        await db.commit()
+            users.extend(await cursor.fetchall())
+    notify_user_change(users)
 
 
-async def get_or_create_user(user_id, username=None):
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+# --- Подписчики на изменения пользователей ---
+# fn(user) получает полную строку users после каждого изменения баланса/статистики,
+# уже после COMMIT. Используется для кэшей в памяти (лидерборд и т.п.)
+
+_user_listeners = []
+
+
+def on_user_change(fn):
+    _user_listeners.append(fn)
+    return fn
+
+
+def notify_user_change(users):
+    for user in users:
+        user = dict(user)
+        for fn in _user_listeners:
+            try:
+                fn(user)
+            except Exception as e:
+                print(f"⚠️ Ошибка подписчика {fn.__name__}: {e}")
+
+
+# Write-through кэш профилей: каждая изменённая строка users попадает сюда после COMMIT
+user_cache = UserCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+on_user_change(user_cache.put)
+
+
+# Функции ниже обычно отвечают из user_cache — db_timed только на тех, что идут в БД,
+# иначе попадания в кэш тянули бы гистограмму времени SQLite к нулю
+
+@db_timed
+async def fetch_user(user_id):
+    """Строка users из БД мимо кэша; None — игрока нет"""
+    async with get_pool().read() as db:
         cursor = await db.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
         user = await cursor.fetchone()
-        if not user:
-            await db.execute(
-                "INSERT INTO users (user_id, username, balance) VALUES (?, ?, ?)",
-                (user_id, username, START_BALANCE)
-            )
-            await db.commit()
-            cursor = await db.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
-            user = await cursor.fetchone()
-        return dict(user)
+    return dict(user) if user else None
 
 
-async def get_balance(user_id):
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute("SELECT balance FROM users WHERE user_id = ?", (user_id,))
-        row = await cursor.fetchone()
-        return row[0] if row else 0
+@db_timed
+async def create_user(user_id, username=None):
+    """Новый игрок и входящий остаток в журнале; None — игрок уже есть"""
+    async with get_pool().write() as db:
+        cursor = await db.execute(
+            "INSERT OR IGNORE INTO users (user_id, username, balance) VALUES (?, ?, ?) RETURNING *",
+            (user_id, username, START_BALANCE)
+        )
+        created = await cursor.fetchone()
+        if created:
+            await db.execute(LEDGER_INSERT, (user_id, "opening", START_BALANCE, None, time.time()))
+    if created is None:
+        return None
+    notify_user_change([created])
+    return dict(created)
 
 
-async def update_balance(user_id, amount):
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "UPDATE users SET balance = balance + ? WHERE user_id = ?",
+async def _read_user(user_id, cached=True):
+    """Профиль из кэша; при промахе — из БД с заполнением кэша"""
+    user = user_cache.get(user_id) if cached else None
+    if user is not None:
+        return user
+    user = await fetch_user(user_id)
+    if user is not None:
+        user_cache.fill(user)
+    return user
+
+
+async def get_or_create_user(user_id, username=None):
+    user = await _read_user(user_id)
+    if user:
+        return user
+    created = await create_user(user_id, username)
+    if created:
+        return created
+    # Параллельный запрос успел создать игрока раньше нас
+    return await _read_user(user_id)
+
+
+async def get_balance(user_id, default=0, cached=True):
+    user = await _read_user(user_id, cached)
+    return user["balance"] if user else default
+
+
+@db_timed
+async def play_quick_game(user_id, stake, winnings, ref=None):
+    """Быстрая игра сразу в БД: условное списание ставки и выигрыш одной транзакцией.
+
+    Для нескольких воркеров, где баланс в памяти одного процесса не авторитетен.
+    Возвращает новый баланс или None, если не хватает средств.
+    """
+    now = time.time()
+    entries = [(user_id, "quick_bet", -stake, ref, now)]
+    if winnings:
+        entries.append((user_id, "quick_win", winnings, ref, now))
+    async with get_pool().write() as db:
+        cursor = await db.execute(
+            "UPDATE users SET balance = balance - ? + ? WHERE user_id = ? AND balance >= ? RETURNING *",
+            (stake, winnings, user_id, stake)
+        )
+        user = await cursor.fetchone()
+        if user:
+            await db.executemany(LEDGER_INSERT, entries)
+    if not user:
+        return None
+    notify_user_change([user])
+    return user["balance"]
+
+
+@db_timed
+async def update_balance(user_id, amount, kind="adjust", ref=None):
+    async with get_pool().write() as db:
+        cursor = await db.execute(
+            "UPDATE users SET balance = balance + ? WHERE user_id = ? RETURNING *",
             (amount, user_id)
         )
-        await db.commit()
+        user = await cursor.fetchone()
+        if user:
+            await db.execute(LEDGER_INSERT, (user_id, kind, amount, ref, time.time()))
+    if user:
+        notify_user_change([user])
+
 
+@db_timed
+async def place_bet(user_id, event_id, event_title, pick, pick_label, odds, amount,
+                    sport_key=None, commence_time=None, check_funds=True):
+    """Ставка одной транзакцией: условное списание, запись ставки и журнала.
 
-async def place_bet(user_id, event_id, event_title, pick, pick_label, odds, amount):
-    async with aiosqlite.connect(DB_PATH) as db:
-        balance = await get_balance(user_id)
-        if balance < amount:
+    check_funds=False — средства уже зарезервированы в памяти (BalanceLedger).
+    """
+    async with get_pool().write() as db:
+        cursor = await db.execute(
+            """UPDATE users SET balance = balance - ?, total_bets = total_bets + 1
+            WHERE user_id = ? AND (? OR balance >= ?) RETURNING *""",
+            (amount, user_id, not check_funds, amount)
+        )
+        user = await cursor.fetchone()
+        if not user:
             return None, "Недостаточно средств"
 
         potential_win = round(amount * odds, 2)
-        await db.execute(
-            """INSERT INTO bets 
-            (user_id, event_id, event_title, pick, pick_label, odds, amount, potential_win)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-            (user_id, event_id, event_title, pick, pick_label, odds, amount, potential_win)
-        )
-        await db.execute(
-            "UPDATE users SET balance = balance - ?, total_bets = total_bets + 1 WHERE user_id = ?",
-            (amount, user_id)
+        cursor = await db.execute(
+            """INSERT INTO bets
+            (user_id, event_id, event_title, pick, pick_label, odds, amount, potential_win, sport_key, commence_time)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (user_id, event_id, event_title, pick, pick_label, odds, amount, potential_win, sport_key, commence_time)
         )
-        await db.commit()
-        return {
+        await db.execute(LEDGER_INSERT, (user_id, "bet", -amount, cursor.lastrowid, time.time()))
+    notify_user_change([user])
+    return {
+        "bet": {
             "event": event_title,
             "pick": pick_label,
             "odds": odds,
             "amount": amount,
             "potential_win": potential_win
-        }, "OK"
+        },
+        "new_balance": user["balance"],
+    }, "OK"
 
 
-async def cashout_bet(bet_id, user_id):
-    """Кэшаут — забрать часть выигрыша досрочно"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+@db_timed
+async def cashout_bet(bet_id, user_id, price):
+    """Кэшаут — забрать стоимость ставки досрочно.
+
+    Действующая котировка из cashout_quotes выполняется по своей цене, иначе
+    ставка оценивается сейчас: price(строка bets) -> сумма или None.
+    """
+    now = time.time()
+    async with get_pool().write() as db:
         cursor = await db.execute(
             "SELECT * FROM bets WHERE id = ? AND user_id = ? AND result = 'pending'",
             (bet_id, user_id)
@@ -116,99 +544,378 @@ async def cashout_bet(bet_id, user_id):
         bet = await cursor.fetchone()
         if not bet:
             return None, "Ставка не найдена"
-
-        bet = dict(bet)
         if not bet["cashout_available"]:
             return None, "Кэшаут недоступен"
 
-        # Кэшаут = 70-85% от суммы ставки
-        import random
-        cashout_percent = random.uniform(0.70, 0.85)
-        cashout_amount = round(bet["amount"] * cashout_percent, 2)
+        cursor = await db.execute(
+            "DELETE FROM cashout_quotes WHERE bet_id = ? RETURNING amount, expires_at", (bet_id,)
+        )
+        quote = await cursor.fetchone()
+        quoted = quote is not None and quote["expires_at"] >= now
+        cashout_amount = quote["amount"] if quoted else price(bet)
+        if not cashout_amount:
+            return None, "Кэшаут недоступен: нет актуальных коэффициентов"
 
         await db.execute(
-            "UPDATE bets SET result = 'cashout', cashout_available = 0 WHERE id = ?",
-            (bet_id,)
+            "UPDATE bets SET result = 'cashout', cashout_available = 0 WHERE id = ?", (bet_id,)
         )
-        await db.execute(
-            "UPDATE users SET balance = balance + ? WHERE user_id = ?",
+        cursor = await db.execute(
+            "UPDATE users SET balance = balance + ? WHERE user_id = ? RETURNING *",
             (cashout_amount, user_id)
         )
-        await db.commit()
-        return {"cashout_amount": cashout_amount, "bet_id": bet_id}, "OK"
+        user = await cursor.fetchone()
+        await db.execute(LEDGER_INSERT, (user_id, "cashout", cashout_amount, bet_id, time.time()))
+    if user:
+        notify_user_change([user])
+    return {
+        "cashout": {"cashout_amount": cashout_amount, "bet_id": bet_id, "quoted": quoted},
+        "new_balance": user["balance"] if user else 0,
+    }, "OK"
 
 
-async def settle_bet(event_id, result):
-    """Рассчитать ставки после завершения матча"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute(
-            "SELECT * FROM bets WHERE event_id = ? AND result = 'pending'",
-            (event_id,)
+@db_timed
+async def get_cashout_bets(user_id=None, now=None):
+    """Открытые ставки, доступные для кэшаута, с действующей котировкой (quote — NULL, если нет)"""
+    now = now or time.time()
+    query = """SELECT b.id, b.user_id, b.event_id, b.pick, b.odds, b.amount,
+            q.amount AS quote, q.expires_at
+        FROM bets b LEFT JOIN cashout_quotes q ON q.bet_id = b.id AND q.expires_at >= ?
+        WHERE b.result = 'pending' AND b.cashout_available = 1"""
+    params = [now]
+    if user_id is not None:
+        query += " AND b.user_id = ?"
+        params.append(user_id)
+    async with get_pool().read() as db:
+        cursor = await db.execute(query, params)
+        return [dict(r) for r in await cursor.fetchall()]
+
+
+@db_timed
+async def save_cashout_quotes(quotes, now=None):
+    """Записать котировки [(bet_id, user_id, amount, expires_at)].
+
+    Действующую котировку не перезаписываем: игрок получит ту цену, которую видел.
+    """
+    now = now or time.time()
+    async with get_pool().write() as db:
+        await db.executemany(
+            """INSERT INTO cashout_quotes (bet_id, user_id, amount, expires_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT (bet_id) DO UPDATE SET amount = excluded.amount, expires_at = excluded.expires_at
+            WHERE cashout_quotes.expires_at < ?""",
+            [q + (now,) for q in quotes]
         )
-        bets = await cursor.fetchall()
-        settled = []
+        # Котировки рассчитанных и проданных ставок больше не нужны
+        await db.execute(
+            """DELETE FROM cashout_quotes WHERE expires_at < ?
+            OR bet_id NOT IN (SELECT id FROM bets WHERE result = 'pending')""",
+            (now,)
+        )
+
 
-        for bet in bets:
-            bet = dict(bet)
-            if bet["pick"] == result:
-                # Выигрыш
-                await db.execute("UPDATE bets SET result = 'win' WHERE id = ?", (bet["id"],))
-                await db.execute(
-                    "UPDATE users SET balance = balance + ?, total_wins = total_wins + 1, total_profit = total_profit + ? WHERE user_id = ?",
-                    (bet["potential_win"], bet["potential_win"] - bet["amount"], bet["user_id"])
-                )
-                settled.append({"bet_id": bet["id"], "result": "win", "user_id": bet["user_id"]})
-            else:
-                await db.execute("UPDATE bets SET result = 'lose' WHERE id = ?", (bet["id"],))
-                await db.execute(
-                    "UPDATE users SET total_profit = total_profit - ? WHERE user_id = ?",
-                    (bet["amount"], bet["user_id"])
-                )
-                settled.append({"bet_id": bet["id"], "result": "lose", "user_id": bet["user_id"]})
+@db_timed
+async def get_user_bets(user_id, limit=30, result=None, since=None, until=None, after=None):
+    """Страница истории ставок игрока, новые сверху: (ставки BetItem, ключ следующей страницы).
 
-        await db.commit()
-        return settled
+    Курсор по ключу (created_at, id): after — ключ последней ставки прошлой
+    страницы, следующая продолжается с него по индексу, без OFFSET. Фильтры:
+    result и created_at в [since, until). Ключ следующей страницы None — это последняя.
+    """
+    query = f"SELECT {BET_ITEM_COLUMNS} FROM bets WHERE user_id = ?"
+    params = [user_id]
+    if result is not None:
+        query += " AND result = ?"
+        params.append(result)
+    if since is not None:
+        query += " AND created_at >= ?"
+        params.append(since)
+    if until is not None:
+        query += " AND created_at < ?"
+        params.append(until)
+    if after is not None:
+        query += " AND (created_at, id) < (?, ?)"
+        params.extend(after)
+    # Лишняя строка — признак, что есть следующая страница
+    query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+    params.append(limit + 1)
+    async with get_pool().read() as db:
+        cursor = await db.execute(query, params)
+        bets = [BetItem.from_row(r) for r in await cursor.fetchall()]
+    if len(bets) <= limit:
+        return bets, None
+    bets = bets[:limit]
+    return bets, (bets[-1].created_at, bets[-1].id)
 
 
-async def get_user_bets(user_id, limit=30):
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+@db_timed
+async def get_bets_summary(user_id):
+    """Открытые ставки игрока: число, сумма в игре и возможный выигрыш — только из индекса"""
+    async with get_pool().read() as db:
         cursor = await db.execute(
-            "SELECT * FROM bets WHERE user_id = ? ORDER BY created_at DESC LIMIT ?",
-            (user_id, limit)
+            """SELECT COUNT(*), SUM(amount), SUM(potential_win) FROM bets
+            WHERE user_id = ? AND result = 'pending'""",
+            (user_id,)
         )
-        return [dict(r) for r in await cursor.fetchall()]
+        count, exposure, potential_win = await cursor.fetchone()
+    return {
+        "pending": count,
+        "exposure": round(exposure or 0, 2),
+        "potential_win": round(potential_win or 0, 2),
+    }
 
 
+@db_timed
 async def get_pending_bets():
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with get_pool().read() as db:
         cursor = await db.execute("SELECT DISTINCT event_id FROM bets WHERE result = 'pending'")
         return [dict(r) for r in await cursor.fetchall()]
 
 
+@db_timed
+async def count_pending_bets():
+    async with get_pool().read() as db:
+        cursor = await db.execute("SELECT COUNT(*) FROM bets WHERE result = 'pending'")
+        return (await cursor.fetchone())[0]
+
+
+@db_timed
+async def get_pending_events():
+    """Матчи с нерассчитанными ставками: вид спорта и время начала"""
+    async with get_pool().read() as db:
+        cursor = await db.execute(
+            """SELECT event_id, MAX(sport_key) AS sport_key, MIN(commence_time) AS commence_time
+            FROM bets WHERE result = 'pending' GROUP BY event_id"""
+        )
+        return [dict(r) for r in await cursor.fetchall()]
+
+
+@db_timed
+async def get_user_rank(user_id):
+    """Место игрока по балансу (при равенстве — по user_id); идёт по idx_users_balance"""
+    async with get_pool().read() as db:
+        cursor = await db.execute(
+            """SELECT u.balance,
+                (SELECT COUNT(*) FROM users WHERE balance > u.balance)
+                + (SELECT COUNT(*) FROM users WHERE balance = u.balance AND user_id < u.user_id)
+                + 1
+            FROM users u WHERE u.user_id = ?""",
+            (user_id,)
+        )
+        row = await cursor.fetchone()
+        return (row[1], row[0]) if row else (None, None)
+
+
+@db_timed
+async def get_leaderboard(limit=20):
+    async with get_pool().read() as db:
+        cursor = await db.execute(
+            "SELECT user_id, username, balance, total_bets, total_wins FROM users ORDER BY balance DESC, user_id LIMIT ?",
+            (limit,)
+        )
+        return [dict(r) for r in await cursor.fetchall()]
+
+
 # --- Кэш событий ---
 
-async def cache_events(events):
-    import json
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("DELETE FROM cached_events")
-        for evt in events:
-            await db.execute(
-                "INSERT OR REPLACE INTO cached_events (id, data, updated_at) VALUES (?, ?, ?)",
-                (evt["id"], json.dumps(evt, ensure_ascii=False), time.time())
+@db_timed
+async def save_event_changes(changes):
+    """Записать только изменения снимка событий одной транзакцией"""
+    now = time.time()
+    async with get_pool().write() as db:
+        if changes["rows"]:
+            await db.executemany(
+                """INSERT INTO cached_events (id, data, hash, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET data = excluded.data, hash = excluded.hash, updated_at = excluded.updated_at""",
+                [(eid, data, h, now) for eid, data, h in changes["rows"]]
+            )
+        if changes["removed"]:
+            await db.executemany(
+                "DELETE FROM cached_events WHERE id = ?",
+                [(eid,) for eid in changes["removed"]]
             )
-        await db.commit()
+    return {
+        "added": len(changes["added"]),
+        "changed": len(changes["changed"]),
+        "removed": len(changes["removed"]),
+    }
+
 
+@db_timed
+async def get_cached_hashes():
+    async with get_pool().read() as db:
+        cursor = await db.execute("SELECT id, hash FROM cached_events")
+        return {r[0]: r[1] for r in await cursor.fetchall()}
 
+
+@db_timed
 async def get_cached_events():
-    import json
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with get_pool().read() as db:
         cursor = await db.execute("SELECT data, updated_at FROM cached_events")
         rows = await cursor.fetchall()
         if not rows:
             return None, 0
-        events = [json.loads(r[0]) for r in rows]
-        updated = rows[0][1] if rows else 0
+        events = [Event.from_json(r[0]) for r in rows]
+        events.sort(key=lambda x: x.commence_time)
+        updated = max(r[1] for r in rows)
         return events, updated
+
+
+# --- История коэффициентов ---
+
+@db_timed
+async def get_open_history():
+    """Последний кусок каждого ряда: {(event_id, outcome): [start, last_time, last_price, points, step]}"""
+    async with get_pool().read() as db:
+        # Голые колонки при MAX() в SQLite берутся из строки с максимумом
+        cursor = await db.execute(
+            """SELECT event_id, outcome, start, MAX(last_time), last_price, points, step
+            FROM odds_history GROUP BY event_id, outcome"""
+        )
+        return {(r[0], r[1]): [r[2], r[3], r[4], r[5], r[6]] for r in await cursor.fetchall()}
+
+
+@db_timed
+async def append_odds_history(appends, created):
+    """Дописать точки в открытые куски и создать новые куски одной транзакцией.
+
+    appends — [(байты точки, last_time, last_price, event_id, outcome, start)],
+    created — [(event_id, outcome, start, last_time, last_price, data)].
+    """
+    async with get_pool().write() as db:
+        if appends:
+            await db.executemany(
+                """UPDATE odds_history SET data = CAST(data || ? AS BLOB), last_time = ?, last_price = ?, points = points + 1
+                WHERE event_id = ? AND outcome = ? AND step = 0 AND start = ?""",
+                appends
+            )
+        if created:
+            await db.executemany(
+                """INSERT OR REPLACE INTO odds_history
+                (event_id, outcome, step, start, last_time, last_price, points, data)
+                VALUES (?, ?, 0, ?, ?, ?, 1, ?)""",
+                created
+            )
+
+
+@db_timed
+async def get_raw_history(before):
+    """Сырые куски, последняя точка которых раньше before (в любом порядке)"""
+    async with get_pool().read() as db:
+        # Без ORDER BY: с ним SQLite обходит всю таблицу по первичному ключу вместо индекса
+        cursor = await db.execute(
+            "SELECT * FROM odds_history WHERE last_time < ? AND step = 0", (before,)
+        )
+        return [dict(r) for r in await cursor.fetchall()]
+
+
+@db_timed
+async def get_history_tails(keys, step):
+    """Последний прореженный кусок рядов [(event_id, outcome)] -> {ключ: строка}"""
+    tails = {}
+    async with get_pool().read() as db:
+        for event_id, outcome in keys:
+            cursor = await db.execute(
+                """SELECT * FROM odds_history WHERE event_id = ? AND outcome = ? AND step = ?
+                ORDER BY start DESC LIMIT 1""",
+                (event_id, outcome, step)
+            )
+            row = await cursor.fetchone()
+            if row is not None:
+                tails[(event_id, outcome)] = dict(row)
+    return tails
+
+
+@db_timed
+async def compact_odds_history(replaced, expire_before):
+    """Заменить сырые куски прореженными и удалить куски старше expire_before.
+
+    replaced — [(event_id, outcome, [start сырых кусков], строка прореженного куска)].
+    Возвращает число удалённых по сроку кусков.
+    """
+    async with get_pool().write() as db:
+        for event_id, outcome, starts, row in replaced:
+            await db.executemany(
+                "DELETE FROM odds_history WHERE event_id = ? AND outcome = ? AND step = 0 AND start = ?",
+                [(event_id, outcome, s) for s in starts]
+            )
+            await db.execute(
+                """INSERT OR REPLACE INTO odds_history
+                (event_id, outcome, step, start, last_time, last_price, points, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                row
+            )
+        cursor = await db.execute("DELETE FROM odds_history WHERE last_time < ?", (expire_before,))
+        return cursor.rowcount
+
+
+@db_timed
+async def get_odds_history(event_id):
+    """Все куски истории события — по первичному ключу, без обхода таблицы"""
+    async with get_pool().read() as db:
+        cursor = await db.execute(
+            "SELECT outcome, start, data FROM odds_history WHERE event_id = ?", (event_id,)
+        )
+        return await cursor.fetchall()
+
+
+# --- Очередь уведомлений ---
+
+async def insert_notifications(db, messages):
+    """Записать сообщения [(user_id, text), ...] в outbox в транзакции вызывающего; возвращает их id"""
+    now = time.time()
+    ids = []
+    for user_id, text in messages:
+        cursor = await db.execute(
+            "INSERT INTO outbox (user_id, text, created_at) VALUES (?, ?, ?) RETURNING id",
+            (user_id, text, now)
+        )
+        ids.append((await cursor.fetchone())[0])
+    return ids
+
+
+@db_timed
+async def save_notifications(messages):
+    """Записать сообщения [(user_id, text), ...] в outbox; возвращает их id"""
+    async with get_pool().write() as db:
+        return await insert_notifications(db, messages)
+
+
+@db_timed
+async def get_notifications():
+    async with get_pool().read() as db:
+        cursor = await db.execute("SELECT id, user_id, text, attempts FROM outbox ORDER BY id")
+        return [tuple(r) for r in await cursor.fetchall()]
+
+
+@db_timed
+async def delete_notification(notification_id):
+    async with get_pool().write() as db:
+        await db.execute("DELETE FROM outbox WHERE id = ?", (notification_id,))
+
+
+@db_timed
+async def retry_notification(notification_id):
+    async with get_pool().write() as db:
+        await db.execute("UPDATE outbox SET attempts = attempts + 1 WHERE id = ?", (notification_id,))
+
+
+# --- Аренды лидерства ---
+
+@db_timed
+async def acquire_lease(name, owner, ttl):
+    """Захватить аренду, если она свободна или истекла, либо продлить свою"""
+    now = time.time()
+    async with get_pool().write() as db:
+        cursor = await db.execute(
+            """INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+            WHERE leases.owner = excluded.owner OR leases.expires_at < ?
+            RETURNING owner""",
+            (name, owner, now + ttl, now)
+        )
+        return await cursor.fetchone() is not None
+
+
+@db_timed
+async def release_lease(name, owner):
+    async with get_pool().write() as db:
+        await db.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
@@ -0,0 +1,104 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import aiosqlite
+
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+class ConnectionPool:
+    """Долгоживущие соединения SQLite: один писатель и несколько читателей в режиме WAL"""
+
+    def __init__(self, path, readers=4, synchronous="NORMAL", cache_size=-16000,
+                 mmap_size=256 * 1024 * 1024, busy_timeout=5000):
+        synchronous = synchronous.upper()
+        if synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f"Неизвестный режим synchronous: {synchronous}")
+        if readers < 1:
+            raise ValueError("Нужен хотя бы один читатель")
+        self.path = path
+        self.readers = readers
+        self.synchronous = synchronous
+        self.cache_size = int(cache_size)
+        self.mmap_size = int(mmap_size)
+        self.busy_timeout = int(busy_timeout)
+        self._writer = None
+        self._write_lock = None
+        self._idle = None
+        self._all_readers = []
+
+    async def _connect(self, readonly=False):
+        # isolation_level=None: транзакции открываем явно, читатели не держат снапшот
+        conn = await aiosqlite.connect(self.path, isolation_level=None)
+        conn.row_factory = aiosqlite.Row
+        # executescript дочитывает результаты PRAGMA и не оставляет открытых курсоров
+        await conn.executescript(f"""
+            PRAGMA busy_timeout = {self.busy_timeout};
+            PRAGMA synchronous = {self.synchronous};
+            PRAGMA cache_size = {self.cache_size};
+            PRAGMA mmap_size = {self.mmap_size};
+            PRAGMA temp_store = MEMORY;
+            PRAGMA query_only = {1 if readonly else 0};
+        """)
+        return conn
+
+    async def open(self):
+        self._write_lock = asyncio.Lock()
+        self._idle = asyncio.Queue()
+        try:
+            self._writer = await self._connect()
+            # WAL включаем до открытия читателей — режим сохраняется в файле БД
+            await self._writer.executescript("PRAGMA journal_mode = WAL;")
+            for _ in range(self.readers):
+                conn = await self._connect(readonly=True)
+                self._all_readers.append(conn)
+                self._idle.put_nowait(conn)
+        except BaseException:
+            for conn in self._all_readers:
+                await conn.close()
+            self._all_readers = []
+            if self._writer is not None:
+                await self._writer.close()
+                self._writer = None
+            raise
+
+    @property
+    def is_open(self):
+        return self._writer is not None
+
+    @asynccontextmanager
+    async def read(self):
+        """Взять соединение-читатель; вернуть его в пул по выходу"""
+        conn = await self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put_nowait(conn)
+
+    @asynccontextmanager
+    async def write(self):
+        """Транзакция на единственном соединении-писателе: COMMIT или ROLLBACK по выходу"""
+        async with self._write_lock:
+            try:
+                # BEGIN внутри try: отмена задачи во время BEGIN не оставит транзакцию открытой
+                await self._writer.execute("BEGIN IMMEDIATE")
+                yield self._writer
+            except BaseException:
+                await self._writer.rollback()
+                raise
+            else:
+                await self._writer.commit()
+
+    async def close(self):
+        """Дождаться текущих запросов и закрыть все соединения"""
+        if self._writer is None:
+            return
+        async with self._write_lock:
+            for _ in range(len(self._all_readers)):
+                await self._idle.get()
+            for conn in self._all_readers:
+                await conn.close()
+            self._all_readers = []
+            await self._writer.execute("PRAGMA optimize")
+            await self._writer.close()
+            self._writer = None
@@ -0,0 +1,173 @@
+import asyncio
+import hashlib
+import time
+
+
+def encode_events(events, fragments=None):
+    """JSON-ответ списка событий и его ETag (хэш содержимого).
+
+    fragments — уже готовый JSON событий {id: str}, чтобы не кодировать их повторно.
+    """
+    if fragments is None:
+        fragments = {e.id: e.to_json() for e in events}
+    items = ",".join(fragments[e.id] for e in events)
+    body = f'{{"events":[{items}],"total":{len(events)}}}'.encode()
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    return body, etag
+
+
+def event_row(event):
+    """Сериализация события для cached_events и хэш его содержимого"""
+    data = event.to_json()
+    return data, hashlib.blake2b(data.encode(), digest_size=8).hexdigest()
+
+
+def diff_events(prev_hashes, events):
+    """Сравнить новый снимок с предыдущим по id и хэшу события.
+
+    Возвращает (changes, hashes): changes — добавленные/изменённые события,
+    id удалённых и готовые строки (id, data, hash) для записи в БД.
+    """
+    hashes = {}
+    changes = {"added": [], "changed": [], "removed": [], "rows": []}
+    for e in events:
+        data, h = event_row(e)
+        hashes[e.id] = h
+        old = prev_hashes.get(e.id)
+        if old == h:
+            continue
+        changes["added" if old is None else "changed"].append(e)
+        changes["rows"].append((e.id, data, h))
+    changes["removed"] = [eid for eid in prev_hashes if eid not in hashes]
+    return changes, hashes
+
+
+def has_changes(changes):
+    return bool(changes["added"] or changes["changed"] or changes["removed"])
+
+
+def etag_matches(if_none_match, etag):
+    """Проверка заголовка If-None-Match (список тегов, W/-префикс, *)"""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+EMPTY_RESPONSE = encode_events([])
+
+
+class EventCache:
+    """Кэш событий: отдаёт устаревшие данные сразу и обновляет их одной фоновой задачей"""
+
+    def __init__(self, loader, ttl=300, retry_interval=30, on_change=None):
+        # loader() -> (events, updated) или None, если загрузить не удалось
+        self.loader = loader
+        # on_change(changes) вызывается после каждого обновления, где что-то изменилось
+        self.on_change = on_change
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self.events = []
+        self.updated = 0
+        # Индекс по категориям и готовые ответы: {category: (body, etag)}
+        self.by_category = {}
+        self.by_id = {}
+        self.encoded = {"all": EMPTY_RESPONSE}
+        # Хэши последнего снимка {id: hash} и последний набор изменений
+        self.hashes = {}
+        self.changes = None
+        self.version = 0
+        self.last_attempt = 0
+        self._task = None
+
+    @property
+    def age(self):
+        return time.time() - self.updated if self.updated else None
+
+    @property
+    def is_fresh(self):
+        return bool(self.updated) and self.age <= self.ttl
+
+    @property
+    def is_refreshing(self):
+        return self._task is not None and not self._task.done()
+
+    def meta(self):
+        age = self.age
+        return {
+            "updated": self.updated,
+            "age": round(age, 1) if age is not None else None,
+            "fresh": self.is_fresh,
+            "refreshing": self.is_refreshing,
+        }
+
+    def _start(self):
+        """Запустить обновление или вернуть уже идущее"""
+        if not self.is_refreshing:
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def _run(self):
+        self.last_attempt = time.time()
+        try:
+            print("🔄 Загружаем события...")
+            loaded = await self.loader()
+            if loaded:
+                events, updated = loaded
+                changes, hashes = diff_events(self.hashes, events)
+                if has_changes(changes) or not self.updated:
+                    self._index(events)
+                    self.events, self.hashes = events, hashes
+                self.updated = updated
+                if has_changes(changes):
+                    self.version += 1
+                    changes["version"] = self.version
+                    self.changes = changes
+                    if self.on_change:
+                        await self.on_change(changes)
+        except Exception as e:
+            print(f"❌ Ошибка загрузки событий: {e}")
+
+    def seed(self, hashes):
+        """Задать базовый снимок (например, хэши из cached_events) до первой загрузки"""
+        self.hashes = dict(hashes)
+
+    def _index(self, events):
+        """Сгруппировать по категориям и заранее сериализовать ответы"""
+        by_category = {}
+        for e in events:
+            by_category.setdefault(e.category, []).append(e)
+        # Каждое событие кодируем один раз — для общего ответа и для категории
+        fragments = {e.id: e.to_json() for e in events}
+        encoded = {cat: encode_events(evts, fragments) for cat, evts in by_category.items()}
+        encoded["all"] = encode_events(events, fragments)
+        self.by_category, self.encoded = by_category, encoded
+        self.by_id = {e.id: e for e in events}
+
+    def response(self, category="all"):
+        """Готовые байты ответа и ETag для категории"""
+        return self.encoded.get(category, EMPTY_RESPONSE)
+
+    async def cancel(self):
+        """Прервать идущее обновление (при остановке сервера)"""
+        if self.is_refreshing:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def refresh(self):
+        """Дождаться обновления; параллельные вызовы ждут одну и ту же задачу"""
+        await asyncio.shield(self._start())
+
+    async def get(self):
+        """Текущие события. Ждём только самую первую загрузку, дальше — stale-while-revalidate"""
+        if not self.is_fresh and time.time() - self.last_attempt > self.retry_interval:
+            task = self._start()
+            if not self.updated:
+                # Отдавать пока нечего — ждём первую загрузку
+                await asyncio.shield(task)
+        elif not self.updated and self.is_refreshing:
+            await asyncio.shield(self._task)
+        return self.events
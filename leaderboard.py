@@ -0,0 +1,98 @@
+import json
+import time
+
+import database as db
+
+FIELDS = ("user_id", "username", "balance", "total_bets", "total_wins")
+# Порядок мест: баланс по убыванию, при равенстве — меньший user_id выше
+BOTTOM = (float("inf"), 0)
+
+
+def sort_key(row):
+    return (-row["balance"], row["user_id"])
+
+
+class Leaderboard:
+    """Топ игроков по балансу в памяти, обновляется по каждому изменению баланса.
+
+    Держим size + spare лучших. Инвариант: все, кого нет в таблице, стоят
+    ниже floor (по sort_key) — поэтому первые size строк всегда точные.
+
+    max_age — при нескольких воркерах: изменения из других процессов сюда не
+    приходят, поэтому таблица перечитывается из БД не реже раза в max_age секунд.
+    """
+
+    def __init__(self, size=20, spare=80, max_age=None):
+        self.size = size
+        self.capacity = size + spare
+        self.max_age = max_age
+        self.loaded_at = 0
+        self.rows = {}
+        self.floor = BOTTOM
+        self._sorted = None
+        self._encoded = None
+
+    async def load(self):
+        rows = await db.get_leaderboard(self.capacity)
+        self.rows = {r["user_id"]: {k: r[k] for k in FIELDS} for r in rows}
+        # Если загрузили меньше capacity — в таблице все игроки
+        self.floor = sort_key(rows[-1]) if len(rows) == self.capacity else BOTTOM
+        self.loaded_at = time.monotonic()
+        self._invalidate()
+
+    def _invalidate(self):
+        self._sorted = None
+        self._encoded = None
+
+    def update(self, user):
+        """Подписчик db.on_user_change"""
+        uid = user["user_id"]
+        key = sort_key(user)
+        if uid in self.rows:
+            if key > self.floor:
+                # Ниже floor могут быть неизвестные нам игроки — выбываем из таблицы
+                del self.rows[uid]
+            else:
+                self.rows[uid] = {k: user[k] for k in FIELDS}
+        elif key < self.floor:
+            self.rows[uid] = {k: user[k] for k in FIELDS}
+            self._invalidate()
+            if len(self.rows) > self.capacity:
+                evicted = self.top(len(self.rows))[self.capacity:]
+                for row in evicted:
+                    del self.rows[row["user_id"]]
+                self.floor = min(self.floor, sort_key(evicted[0]))
+        else:
+            return
+        self._invalidate()
+
+    def top(self, limit=None):
+        if self._sorted is None:
+            self._sorted = sorted(self.rows.values(), key=sort_key)
+        return self._sorted[:limit or self.size]
+
+    @property
+    def needs_reload(self):
+        if self.max_age is not None and time.monotonic() - self.loaded_at > self.max_age:
+            return True
+        # Слишком многие выбыли вниз — точных строк меньше size
+        return len(self.rows) < self.size and self.floor != BOTTOM
+
+    async def response(self):
+        """Готовый JSON для /api/leaderboard"""
+        if self.needs_reload:
+            await self.load()
+        if self._encoded is None:
+            self._encoded = json.dumps(
+                {"leaderboard": self.top()}, ensure_ascii=False, separators=(",", ":")
+            ).encode()
+        return self._encoded
+
+    async def rank(self, user_id):
+        """Место игрока: из памяти, если он в топе, иначе по индексу в БД"""
+        if user_id in self.rows and not self.needs_reload:
+            for i, row in enumerate(self.top(len(self.rows)), start=1):
+                if row["user_id"] == user_id:
+                    return {"user_id": user_id, "rank": i, "balance": row["balance"]}
+        rank, balance = await db.get_user_rank(user_id)
+        return {"user_id": user_id, "rank": rank, "balance": balance}
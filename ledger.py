@@ -0,0 +1,220 @@
+import asyncio
+import math
+import sqlite3
+import time
+from collections import deque
+
+import database as db
+from config import LEDGER_FLUSH_INTERVAL, LEDGER_MAX_BATCH, LEDGER_MAX_ACTIVE, LEDGER_STOP_TIMEOUT
+
+
+def check_amount(amount):
+    """Сумма для журнала: конечное неотрицательное число"""
+    if not math.isfinite(amount) or amount < 0:
+        raise ValueError(f"Некорректная сумма: {amount}")
+
+
+class BalanceLedger:
+    """Балансы активных игроков в памяти + отложенная групповая запись в ledger.
+
+    Баланс в памяти — главный для проверки средств. Изменения применяются к нему
+    сразу, а в БД уходят пачкой (одна транзакция, один fsync) раз в flush_interval.
+    Пути, которые пишут в БД сами (ставка, кэшаут, расчёт), сообщают дельту через adjust().
+
+    shared=True — несколько процессов работают с одной БД: память одного из них
+    не знает о тратах в других, поэтому средства проверяет и списывает БД.
+
+    Если БД отвергает пачку (не сбой доступа, а сами данные), записи пишутся по
+    одной: плохие откладываются в rejected и откатываются в памяти, остальные
+    записываются — одна запись не держит всю очередь.
+    """
+
+    def __init__(self, flush_interval=LEDGER_FLUSH_INTERVAL, max_batch=LEDGER_MAX_BATCH,
+                 max_active=LEDGER_MAX_ACTIVE, shared=False, stop_timeout=LEDGER_STOP_TIMEOUT):
+        self.shared = shared
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_active = max_active
+        self.stop_timeout = stop_timeout
+        self.rejected = deque(maxlen=100)  # (запись, ошибка) — отвергнутые БД записи
+        self.balances = {}
+        self._pending = {}  # user_id -> незаписанные записи и резервы
+        self._loading = {}  # user_id -> число идущих загрузок баланса из БД
+        self._stale = set()  # баланс изменился в БД, пока шла загрузка
+        self._queue = []
+        self._enqueued = 0
+        self._committed = 0
+        self._wake = None
+        self._done = None
+        self._task = None
+
+    async def start(self):
+        self._wake = asyncio.Event()
+        self._done = asyncio.Condition()
+        self._task = asyncio.create_task(self._writer())
+
+    async def stop(self):
+        """Дописать всё из очереди (не дольше stop_timeout) и остановить writer"""
+        if self._task is None:
+            return
+        if not await self.flush(self.stop_timeout):
+            print(f"⚠️ Журнал: при остановке не записано {len(self._queue)} записей")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def balance(self, user_id):
+        """Баланс из памяти; при первом обращении — из БД"""
+        if self.shared:
+            return await db.get_balance(user_id, default=None, cached=False)
+        while user_id not in self.balances:
+            self._stale.discard(user_id)
+            self._loading[user_id] = self._loading.get(user_id, 0) + 1
+            try:
+                loaded = await db.get_balance(user_id, default=None)
+            finally:
+                self._loading[user_id] -= 1
+                if not self._loading[user_id]:
+                    del self._loading[user_id]
+            if loaded is None:
+                return None
+            if user_id in self._stale:
+                # Пока читали, баланс изменился в БД — перечитываем
+                continue
+            # Пока ждали БД, баланс мог загрузить параллельный запрос
+            self.balances.setdefault(user_id, loaded)
+        return self.balances[user_id]
+
+    def _hold(self, user_id):
+        self._pending[user_id] = self._pending.get(user_id, 0) + 1
+
+    def _unhold(self, user_id):
+        self._pending[user_id] -= 1
+        if not self._pending[user_id]:
+            del self._pending[user_id]
+
+    def _enqueue(self, user_id, kind, amount, ref):
+        self._queue.append((user_id, kind, amount, ref, time.time()))
+        self._hold(user_id)
+        self._enqueued += 1
+        self._wake.set()
+
+    async def play(self, user_id, stake, winnings, ref=None):
+        """Быстрая игра: списать ставку и зачислить выигрыш. None — не хватает средств"""
+        check_amount(stake)
+        check_amount(winnings)
+        if self.shared:
+            return await db.play_quick_game(user_id, stake, winnings, ref)
+        balance = await self.balance(user_id)
+        # Дальше без await: проверка и изменение атомарны для event loop
+        if balance is None or balance < stake:
+            return None
+        balance = balance - stake + winnings
+        self.balances[user_id] = balance
+        self._enqueue(user_id, "quick_bet", -stake, ref)
+        if winnings:
+            self._enqueue(user_id, "quick_win", winnings, ref)
+        return balance
+
+    async def reserve(self, user_id, amount):
+        """Зарезервировать средства под ставку, которую запишет в БД сам вызывающий.
+
+        После записи обязательно вызвать release() — с возвратом суммы, если запись не удалась.
+        В режиме shared ничего не резервируется: запись должна проверить средства сама.
+        """
+        check_amount(amount)
+        balance = await self.balance(user_id)
+        if balance is None or balance < amount:
+            return None
+        if self.shared:
+            return balance - amount
+        self.balances[user_id] = balance - amount
+        self._hold(user_id)
+        return self.balances[user_id]
+
+    def release(self, user_id, refund=0):
+        if self.shared:
+            return
+        self._unhold(user_id)
+        self.adjust(user_id, refund)
+
+    def adjust(self, user_id, delta):
+        """Учесть изменение баланса, уже записанное в БД другим путём"""
+        if user_id in self.balances:
+            self.balances[user_id] += delta
+            return self.balances[user_id]
+        if user_id in self._loading:
+            self._stale.add(user_id)
+        return None
+
+    async def flush(self, timeout=None):
+        """Дождаться записи всего, что уже поставлено в очередь. False — не дождались за timeout"""
+        target = self._enqueued
+        if self._committed >= target or self._task is None:
+            return True
+
+        async def written():
+            async with self._done:
+                await self._done.wait_for(lambda: self._committed >= target)
+
+        try:
+            await asyncio.wait_for(written(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _writer(self):
+        single = 0  # сколько записей писать по одной после отвергнутой пачки
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            # Окно группировки: за эти миллисекунды в очередь успевает набежать пачка
+            await asyncio.sleep(self.flush_interval)
+            while self._queue:
+                batch = self._queue[:1 if single else self.max_batch]
+                try:
+                    await db.append_ledger(batch)
+                except sqlite3.OperationalError as e:
+                    # БД занята или недоступна — повторяем ту же пачку
+                    print(f"⚠️ Ошибка записи журнала ({len(batch)} записей): {e}")
+                    await asyncio.sleep(1)
+                    continue
+                except Exception as e:
+                    if len(batch) > 1:
+                        print(f"⚠️ Журнал отверг пачку ({len(batch)} записей), пишем по одной: {e}")
+                        single = len(batch)
+                        continue
+                    self._reject(batch[0], e)
+                single = max(single - 1, 0)
+                del self._queue[:len(batch)]
+                for user_id, *_ in batch:
+                    self._unhold(user_id)
+                self._committed += len(batch)
+                async with self._done:
+                    self._done.notify_all()
+            self._trim()
+
+    def _reject(self, entry, error):
+        """Запись не попала в БД: отложить её и вернуть баланс в памяти к состоянию БД"""
+        user_id, kind, amount, ref, _ = entry
+        print(f"⚠️ Журнал: запись отвергнута (user {user_id}, {kind}, {amount}): {error}")
+        self.rejected.append((entry, str(error)))
+        if user_id in self.balances:
+            if math.isfinite(amount):
+                self.balances[user_id] -= amount
+            else:
+                # Такой баланс уже не поправить — при следующем обращении перечитаем из БД
+                del self.balances[user_id]
+
+    def _trim(self):
+        """Забыть неактивных игроков без незаписанных изменений"""
+        if len(self.balances) <= self.max_active:
+            return
+        for user_id in list(self.balances):
+            if user_id not in self._pending:
+                del self.balances[user_id]
+                if len(self.balances) <= self.max_active // 2:
+                    break
@@ -0,0 +1,180 @@
+import bisect
+import functools
+import math
+import time
+from contextlib import contextmanager
+
+# Все метрики процесса в порядке создания — так и выводятся в /metrics
+REGISTRY = []
+
+# Секунды: от быстрого чтения из кэша до медленного запроса к внешнему API
+TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        REGISTRY.append(self)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = self.header()
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_labels(self.labels, labels)} {_number(value)}")
+        return lines
+
+
+class Gauge(Metric):
+    """Текущее значение: set() или функция, которая вызывается при каждом чтении /metrics"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help, fn=None):
+        super().__init__(name, help)
+        self.fn = fn
+        self.value = None
+
+    def set(self, value):
+        self.value = value
+
+    def render(self):
+        value = self.fn() if self.fn else self.value
+        lines = self.header()
+        if value is not None:
+            lines.append(f"{self.name} {_number(value)}")
+        return lines
+
+
+class Histogram(Metric):
+    """Гистограмма с фиксированными бакетами.
+
+    observe() — bisect и два сложения; накопительные суммы по бакетам, которые
+    ждёт Prometheus, считаются только при выводе.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=TIME_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # значения меток -> [счётчики бакетов..., +Inf, сумма]
+
+    def observe(self, value, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self):
+        lines = self.header()
+        bounds = self.buckets + (math.inf,)
+        for labels, series in self._series.items():
+            total = 0
+            for bound, count in zip(bounds, series):
+                total += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, labels, le)} {total}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labels, labels)} {total}")
+        return lines
+
+
+def timed(histogram):
+    """Декоратор корутины: время выполнения в histogram, метка — имя функции"""
+    def decorator(fn):
+        name = fn.__name__
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, name)
+        return wrapper
+    return decorator
+
+
+def render():
+    """Все метрики в текстовом формате Prometheus"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_TIME = Histogram(
+    "http_request_duration_seconds", "Время до начала ответа по маршрутам API",
+    labels=("method", "route", "status"),
+)
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: время до http.response.start по шаблону маршрута.
+
+    Шаблон (/api/bets/{user_id}), а не сам путь — иначе число рядов метрики
+    растёт с числом игроков. Для SSE это время до первого байта потока.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                # FastAPI кладёт найденный маршрут в scope при роутинге
+                route = scope.get("route")
+                REQUEST_TIME.observe(
+                    time.perf_counter() - start,
+                    scope["method"], route.path if route is not None else "other", message["status"],
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,103 @@
+import json
+from dataclasses import dataclass, fields
+from json.encoder import encode_basestring
+
+# Быстрый путь JSON: поля известны заранее, поэтому объект собирается из готовых
+# кусков без промежуточного dict. encode_basestring — C-функция из json, та же,
+# что у json.dumps(ensure_ascii=False); repr(float) совпадает с форматом json.
+
+
+def _str(value):
+    return "null" if value is None else encode_basestring(value)
+
+
+def _num(value):
+    return "null" if value is None else repr(value)
+
+
+@dataclass(frozen=True, slots=True)
+class Event:
+    id: str
+    title: str
+    league: str
+    sport_key: str
+    category: str
+    team_a: str
+    team_b: str
+    odds_a: float
+    odds_draw: float
+    odds_b: float
+    commence_time: str
+    status: str = "upcoming"
+
+    def to_json(self):
+        # Все поля события обязательные — без проверок на None
+        s = encode_basestring
+        return (
+            f'{{"id":{s(self.id)},"title":{s(self.title)},"league":{s(self.league)},'
+            f'"sport_key":{s(self.sport_key)},"category":{s(self.category)},'
+            f'"team_a":{s(self.team_a)},"team_b":{s(self.team_b)},'
+            f'"odds_a":{self.odds_a!r},"odds_draw":{self.odds_draw!r},"odds_b":{self.odds_b!r},'
+            f'"commence_time":{s(self.commence_time)},"status":{s(self.status)}}}'
+        )
+
+    def to_dict(self):
+        return {f: getattr(self, f) for f in EVENT_FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        if tuple(data) == EVENT_FIELDS:
+            # Ключи в порядке полей (так пишет to_json) — позиционный вызов дешевле
+            return cls(*data.values())
+        try:
+            return cls(**data)
+        except TypeError:
+            # Лишние ключи (старые записи, другие версии) отбрасываем
+            return cls(**{f: data[f] for f in EVENT_FIELDS if f in data})
+
+    @classmethod
+    def from_json(cls, data):
+        return cls.from_dict(json.loads(data))
+
+
+@dataclass(frozen=True, slots=True)
+class BetItem:
+    """Ставка в истории игрока: только поля, которые показывает приложение"""
+    id: int
+    event_title: str
+    pick: str
+    pick_label: str
+    odds: float
+    amount: float
+    potential_win: float
+    result: str
+    created_at: str
+
+    def to_json(self):
+        return (
+            f'{{"id":{self.id},"event_title":{_str(self.event_title)},"pick":{_str(self.pick)},'
+            f'"pick_label":{_str(self.pick_label)},"odds":{_num(self.odds)},'
+            f'"amount":{_num(self.amount)},"potential_win":{_num(self.potential_win)},'
+            f'"result":{_str(self.result)},"created_at":{_str(self.created_at)}}}'
+        )
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row)
+
+
+EVENT_FIELDS = tuple(f.name for f in fields(Event))
+BET_ITEM_FIELDS = tuple(f.name for f in fields(BetItem))
+
+
+def encode_list(key, items, **extra):
+    """JSON-объект {key: [...], **extra} из моделей с to_json() — байты ответа"""
+    tail = "".join(f",{encode_basestring(k)}:{json.dumps(v)}" for k, v in extra.items())
+    return f'{{{encode_basestring(key)}:[{",".join(i.to_json() for i in items)}]{tail}}}'.encode()
+
+
+def jsonable(obj):
+    """default= для json.dumps: модели -> dict"""
+    if isinstance(obj, Event):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
@@ -0,0 +1,180 @@
+import asyncio
+import html
+import random
+import time
+from collections import deque
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+import database as db
+from config import NOTIFY_RATE, NOTIFY_BURST, NOTIFY_WORKERS, NOTIFY_MAX_ATTEMPTS
+from odds_api import TokenBucket
+
+
+def settlement_message(summary):
+    """Одно сообщение на игрока по всем его рассчитанным ставкам"""
+    lines = ["🏁 <b>Ставки рассчитаны</b>", ""]
+    for d in summary["details"]:
+        title = html.escape(d["event_title"] or "")
+        pick = html.escape(d["pick_label"] or "")
+        if d["result"] == "win":
+            lines.append(f"✅ {title} — {pick}: <b>+{d['payout']:g}</b>🪙")
+        else:
+            lines.append(f"❌ {title} — {pick}: −{d['amount']:g}🪙")
+    profit = summary["profit"]
+    lines.append("")
+    lines.append(f"Итого: <b>{'+' if profit >= 0 else '−'}{abs(profit):g}</b>🪙")
+    if summary.get("user"):
+        lines.append(f"💰 Баланс: <b>{int(summary['user']['balance'])}</b> монет")
+    return "\n".join(lines)
+
+
+class Notifier:
+    """Рассылка итогов расчёта в Telegram.
+
+    Сообщения сначала пишутся в outbox (таблица в БД), потом их забирает пул
+    воркеров. Общий token bucket держит скорость ниже лимита Telegram, а
+    RetryAfter останавливает всю рассылку на указанное время. Из outbox
+    сообщение удаляется только после доставки, так что перезапуск их не теряет.
+    """
+
+    def __init__(self, bot=None, rate=NOTIFY_RATE, burst=NOTIFY_BURST,
+                 workers=NOTIFY_WORKERS, max_attempts=NOTIFY_MAX_ATTEMPTS, backoff=5):
+        self.bot = bot
+        self.limiter = TokenBucket(rate, burst)
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.sent = 0
+        self.failed = 0
+        self.flood_waits = 0
+        self._resume_at = 0
+        self._queue = None
+        self._tasks = []
+
+    async def start(self):
+        """Поднять воркеры и дослать то, что осталось в outbox с прошлого запуска"""
+        if self.bot is None:
+            return
+        self._queue = asyncio.Queue()
+        for item in await db.get_notifications():
+            self._queue.put_nowait(item)
+        if self._queue.qsize():
+            print(f"📨 В очереди уведомлений с прошлого запуска: {self._queue.qsize()}")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def message(self, summary):
+        """Текст уведомления по сводке расчёта; None — рассылка выключена"""
+        if self.bot is None:
+            return None
+        return settlement_message(summary)
+
+    async def notify(self, summaries):
+        """Поставить в очередь итоги settle_outcomes — по сообщению на игрока.
+
+        Сводки, уже записанные в outbox при расчёте (ключ "notification"),
+        только ставятся в очередь; остальные сначала записываются.
+        """
+        if self.bot is None or not summaries:
+            return
+        fresh = [s for s in summaries if "notification" not in s]
+        if fresh:
+            messages = [(s["user_id"], settlement_message(s)) for s in fresh]
+            ids = await db.save_notifications(messages)
+            for s, nid, (_, text) in zip(fresh, ids, messages):
+                s["notification"] = (nid, text)
+        for s in summaries:
+            nid, text = s["notification"]
+            self._queue.put_nowait((nid, s["user_id"], text, 0))
+
+    async def join(self):
+        """Дождаться отправки всего, что в очереди"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def _worker(self):
+        while True:
+            item = await self._queue.get()
+            try:
+                await self._send(item)
+            except Exception as e:
+                print(f"⚠️ Ошибка отправки уведомления: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _send(self, item):
+        nid, user_id, text, attempts = item
+        while True:
+            pause = self._resume_at - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            await self.limiter.acquire()
+            try:
+                await self.bot.send_message(user_id, text, parse_mode="HTML")
+            except TelegramRetryAfter as e:
+                # Flood control действует на весь бот — притормаживаем все воркеры
+                self.flood_waits += 1
+                self._resume_at = max(self._resume_at, time.monotonic() + e.retry_after)
+                self.limiter.drain()
+                continue
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                # Бот заблокирован или чат не найден — повторять бессмысленно
+                print(f"⚠️ Уведомление {user_id} не доставлено: {e}")
+                self.failed += 1
+            except Exception as e:
+                attempts += 1
+                if attempts < self.max_attempts:
+                    await db.retry_notification(nid)
+                    delay = self.backoff * 2 ** (attempts - 1)
+                    asyncio.get_running_loop().call_later(
+                        delay, self._queue.put_nowait, (nid, user_id, text, attempts)
+                    )
+                    return
+                print(f"⚠️ Уведомление {user_id} не доставлено после {attempts} попыток: {e}")
+                self.failed += 1
+            else:
+                self.sent += 1
+            await db.delete_notification(nid)
+            return
+
+    def stats(self):
+        return {
+            "enabled": self.bot is not None,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "sent": self.sent,
+            "failed": self.failed,
+            "flood_waits": self.flood_waits,
+        }
+
+
+class FakeBot:
+    """Заглушка Bot для нагрузочных тестов: задержка сети и flood control как у Telegram"""
+
+    def __init__(self, limit=30, latency=0.03, jitter=0.02, retry_after=1, rng=None):
+        self.limit = limit
+        self.latency = latency
+        self.jitter = jitter
+        self.retry_after = retry_after
+        self.rng = rng or random.Random()
+        self.messages = []
+        self.flood_errors = 0
+        self._window = deque()
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        await asyncio.sleep(self.latency + self.rng.random() * self.jitter)
+        now = time.monotonic()
+        while self._window and now - self._window[0] >= 1:
+            self._window.popleft()
+        if len(self._window) >= self.limit:
+            self.flood_errors += 1
+            method = SendMessage(chat_id=chat_id, text=text, parse_mode=parse_mode)
+            raise TelegramRetryAfter(method, "Too Many Requests", self.retry_after)
+        self._window.append(now)
+        self.messages.append((chat_id, text))
@@ -1,160 +1,376 @@
 import aiohttp
 import asyncio
-from config import ODDS_API_KEY, SPORTS, SPORT_NAMES
+import random
+import time
+from datetime import datetime
+from config import (
+    ODDS_API_KEY, ODDS_BASE_URL, SPORTS, SPORT_NAMES, ODDS_MARKETS,
+    ODDS_CONCURRENCY, ODDS_RATE, ODDS_BURST, ODDS_QUOTA_RESERVE,
+)
+from metrics import Counter, Gauge, Histogram
+from models import Event
+from odds_table import OddsTable, H2H
+from refresh_planner import RefreshPlanner, EVENT_IDS_PER_REQUEST
 
-BASE_URL = "https://api.the-odds-api.com/v4"
+BASE_URL = ODDS_BASE_URL
 
+# Когда квота почти исчерпана — один пробный запрос в минуту, чтобы заметить её сброс
+MIN_RATE = 1 / 60
 
-async def fetch_json(url, params):
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, params=params) as resp:
-            if resp.status == 200:
-                data = await resp.json()
-                remaining = resp.headers.get("x-requests-remaining", "?")
-                print(f"📡 OK. Осталось запросов: {remaining}")
-                return data
-            elif resp.status == 429:
-                print("⚠️ Слишком частые запросы, пропускаем...")
-                return None
-            else:
-                text = await resp.text()
-                print(f"❌ API ошибка {resp.status}: {text}")
-                return None
+FETCH_TIME = Histogram("odds_api_fetch_duration_seconds", "Загрузка из The Odds API с повторами и ожиданием лимита",
+                       labels=("endpoint", "sport"))
+RESPONSES = Counter("odds_api_responses_total", "Ответы The Odds API по HTTP-статусу", labels=("status",))
 
 
-async def get_upcoming_events():
-    all_events = []
+class TokenBucket:
+    """Token bucket, скорость которого подстраивается под остаток квоты API"""
+
+    def __init__(self, rate, capacity, reserve=0):
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.reserve = reserve
+        self.tokens = float(capacity)
+        self.remaining = None
+        self.used = None
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def drain(self):
+        """После 429 — не отдавать токены, пока бакет не наполнится заново"""
+        self._refill()
+        self.tokens = 0
+
+    def update_quota(self, remaining, used=None):
+        """Пересчитать скорость по заголовкам x-requests-remaining / x-requests-used"""
+        self.remaining = remaining
+        self.used = used
+        self._refill()
+        spare = remaining - self.reserve
+        if spare <= 0:
+            self.rate = MIN_RATE
+            self.tokens = min(self.tokens, 0)
+        else:
+            # Не держим в бакете больше токенов, чем осталось в квоте
+            self.rate = self.base_rate
+            self.tokens = min(self.tokens, spare)
+
+
+def _header_int(headers, name):
+    try:
+        return int(float(headers[name]))
+    except (KeyError, ValueError):
+        return None
+
+
+class OddsClient:
+    """Клиент The Odds API: общая сессия, параллельные запросы, лимит по квоте"""
+
+    def __init__(self, api_key=ODDS_API_KEY, base_url=BASE_URL, concurrency=ODDS_CONCURRENCY,
+                 rate=ODDS_RATE, burst=ODDS_BURST, quota_reserve=ODDS_QUOTA_RESERVE,
+                 markets=ODDS_MARKETS, max_retries=3, timeout=15):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.markets = markets
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.limiter = TokenBucket(rate, burst, quota_reserve)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._session = None
+        # Последняя удачная загрузка коэффициентов всех букмекеров
+        self.table = None
+        # Что и когда обновлять; каждый рынок в запросе списывает квоту отдельно
+        self.planner = RefreshPlanner(cost=len(markets))
+        # Ответы /odds по видам спорта {sport_key: {event_id: game}} и время начала матчей
+        self.games = {}
+        self.kickoffs = {}
+        self.events = []
+        self.fetched_at = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.concurrency,
+                ttl_dns_cache=300,
+                keepalive_timeout=60,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
 
-    for sport_key in SPORTS:
+    async def fetch_json(self, url, params):
+        session = self._get_session()
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self.limiter.acquire()
+                async with session.get(url, params=params) as resp:
+                    RESPONSES.inc(resp.status)
+                    remaining = _header_int(resp.headers, "x-requests-remaining")
+                    if remaining is not None:
+                        self.limiter.update_quota(remaining, _header_int(resp.headers, "x-requests-used"))
+
+                    if resp.status == 200:
+                        data = await resp.json()
+                        print(f"📡 OK. Осталось запросов: {remaining if remaining is not None else '?'}")
+                        return data
+                    elif resp.status == 429:
+                        self.limiter.drain()
+                        if attempt == self.max_retries:
+                            print("⚠️ Слишком частые запросы, пропускаем...")
+                            return None
+                        retry_after = _header_int(resp.headers, "retry-after")
+                        delay = retry_after if retry_after is not None else 2 ** attempt
+                        delay += random.uniform(0, 0.5)
+                        print(f"⚠️ 429, повтор через {delay:.1f}с")
+                        await asyncio.sleep(delay)
+                    else:
+                        text = await resp.text()
+                        print(f"❌ API ошибка {resp.status}: {text}")
+                        return None
+
+    async def _fetch_sport_odds(self, sport_key, event_ids=None):
+        """Матчи вида спорта (или только event_ids); None — загрузить не удалось"""
         try:
-            url = f"{BASE_URL}/sports/{sport_key}/odds/"
+            url = f"{self.base_url}/sports/{sport_key}/odds/"
             params = {
-                "apiKey": ODDS_API_KEY,
+                "apiKey": self.api_key,
                 "regions": "eu",
-                "markets": "h2h",
+                "markets": ",".join(self.markets),
                 "oddsFormat": "decimal",
                 "dateFormat": "iso",
             }
-
-            data = await fetch_json(url, params)
-            if data:
-                for game in data:
-                    event = parse_event(game, sport_key)
-                    if event:
-                        all_events.append(event)
-
-            # Пауза между запросами чтобы не получить 429
-            await asyncio.sleep(1.5)
+            if event_ids:
+                params["eventIds"] = ",".join(event_ids)
+            with FETCH_TIME.time("odds", sport_key):
+                return await self.fetch_json(url, params)
 
         except Exception as e:
             print(f"⚠️ Ошибка {sport_key}: {e}")
-            continue
-
-    all_events.sort(key=lambda x: x["commence_time"])
-    print(f"✅ Загружено {len(all_events)} событий")
-    return all_events
-
-
-async def get_live_scores():
-    all_scores = []
+            return None
 
-    for sport_key in SPORTS:
+    async def _fetch_sport_scores(self, sport_key, event_ids=None):
         try:
-            url = f"{BASE_URL}/sports/{sport_key}/scores/"
+            url = f"{self.base_url}/sports/{sport_key}/scores/"
             params = {
-                "apiKey": ODDS_API_KEY,
+                "apiKey": self.api_key,
                 "daysFrom": 3,
                 "dateFormat": "iso",
             }
-
-            data = await fetch_json(url, params)
+            if event_ids:
+                params["eventIds"] = ",".join(event_ids)
+            with FETCH_TIME.time("scores", sport_key):
+                data = await self.fetch_json(url, params)
+            scores = []
             if data:
                 for game in data:
                     if game.get("completed"):
-                        score_info = {
-                            "id": game["id"],
-                            "completed": True,
-                            "home_team": game.get("home_team"),
-                            "away_team": game.get("away_team"),
-                        }
-
-                        scores = game.get("scores")
-                        if scores and len(scores) == 2:
-                            s0 = int(scores[0].get("score", 0))
-                            s1 = int(scores[1].get("score", 0))
-                            if s0 > s1:
-                                score_info["result"] = "team_a" if scores[0]["name"] == game["home_team"] else "team_b"
-                            elif s1 > s0:
-                                score_info["result"] = "team_b" if scores[1]["name"] == game["away_team"] else "team_a"
-                            else:
-                                score_info["result"] = "draw"
-                            score_info["score_text"] = f"{s0}:{s1}"
-
-                        all_scores.append(score_info)
-
-            await asyncio.sleep(1.5)
+                        scores.append(parse_score(game))
+            return scores
 
         except Exception as e:
             print(f"⚠️ Ошибка счёта {sport_key}: {e}")
-            continue
+            return []
+
+    def _merge(self, sport_key, event_ids, games):
+        """Свежий ответ /odds поверх прежнего: весь вид спорта или только запрошенные матчи"""
+        known = self.games.setdefault(sport_key, {})
+        if event_ids is None:
+            known.clear()
+        else:
+            # Матча нет в ответе — API его больше не котирует
+            for eid in event_ids:
+                known.pop(eid, None)
+        for game in games:
+            known[game["id"]] = game
+        self.kickoffs[sport_key] = {eid: parse_time(g.get("commence_time")) for eid, g in known.items()}
+
+    def _drop_started(self, now):
+        """Начавшиеся матчи уходят из ленты — предматчевые коэффициенты для них не годятся"""
+        for sport_key, starts in self.kickoffs.items():
+            started = [eid for eid, start in starts.items() if start is not None and start <= now]
+            for eid in started:
+                del starts[eid]
+                self.games[sport_key].pop(eid, None)
 
-    return all_scores
+    async def get_upcoming_events(self, sports=SPORTS):
+        """События ленты. Загружаем только то, что пора обновить по плану (RefreshPlanner)"""
+        now = time.time()
+        self._drop_started(now)
+        jobs = self.planner.due({s: self.kickoffs.get(s, {}) for s in sports}, now)
+        if jobs:
+            print("📅 Обновляем: " + ", ".join(
+                sport_key if ids is None else f"{sport_key} ({len(ids)})" for sport_key, ids in jobs))
+        results = await asyncio.gather(*(self._fetch_sport_odds(s, ids) for s, ids in jobs))
+        updated = set()
+        for (sport_key, event_ids), games in zip(jobs, results):
+            if games is None:
+                continue
+            self._merge(sport_key, event_ids, games)
+            loaded = [g["id"] for g in games]
+            self.planner.loaded(sport_key, loaded, now, full=event_ids is None)
+            updated.update(loaded)
+        self._drop_started(now)
+        # План с новыми матчами и сроками — его показывает /api/events/schedule
+        self.planner.plan({s: self.kickoffs.get(s, {}) for s in sports}, now)
 
+        if not updated and self.table is not None:
+            # Загружать нечего (или не удалось) — прежние события без начавшихся
+            started = {e.id for e in self.events if e.id not in self.kickoffs.get(e.sport_key, {})}
+            if started:
+                self.events = [e for e in self.events if e.id not in started]
+            return self.events
 
-def parse_event(game, sport_key):
+        table = OddsTable()
+        for sport_key in sports:
+            table.add_games(sport_key, list(self.games.get(sport_key, {}).values()))
+        all_events = table_events(table.compute())
+        all_events.sort(key=lambda x: x.commence_time)
+        self.planner.observe(all_events, updated)
+        if all_events:
+            self.table = table
+            self.events = all_events
+        if updated:
+            self.fetched_at = now
+        print(f"✅ Загружено {len(all_events)} событий")
+        return all_events
+
+    async def get_live_scores(self, sports=SPORTS):
+        results = await asyncio.gather(*(self._fetch_sport_scores(s) for s in sports))
+        return [s for scores in results for s in scores]
+
+    async def get_scores(self, event_ids_by_sport):
+        """Счёт только по нужным матчам: {sport_key: [event_id, ...] или None — весь вид спорта}"""
+        jobs = []
+        for sport_key, event_ids in event_ids_by_sport.items():
+            if not event_ids:
+                jobs.append(self._fetch_sport_scores(sport_key))
+                continue
+            event_ids = list(event_ids)
+            for i in range(0, len(event_ids), EVENT_IDS_PER_REQUEST):
+                jobs.append(self._fetch_sport_scores(sport_key, event_ids[i:i + EVENT_IDS_PER_REQUEST]))
+        results = await asyncio.gather(*jobs)
+        return [s for scores in results for s in scores]
+
+
+# Общий клиент процесса
+client = OddsClient()
+Gauge("odds_api_requests_remaining", "Остаток квоты по заголовку x-requests-remaining",
+      fn=lambda: client.limiter.remaining)
+Gauge("odds_refresh_planned_per_hour", "Кредитов квоты в час по текущему плану обновления",
+      fn=lambda: client.planner.hourly)
+
+
+async def fetch_json(url, params):
+    return await client.fetch_json(url, params)
+
+
+async def get_upcoming_events():
+    return await client.get_upcoming_events()
+
+
+async def get_live_scores():
+    return await client.get_live_scores()
+
+
+async def get_scores(event_ids_by_sport):
+    return await client.get_scores(event_ids_by_sport)
+
+
+async def close():
+    await client.close()
+
+
+def parse_time(value):
+    """ISO-время из The Odds API -> unix timestamp"""
     try:
-        odds_a = 0
-        odds_draw = 0
-        odds_b = 0
-        home_team = game.get("home_team", "")
-        away_team = game.get("away_team", "")
-
-        for bookmaker in game.get("bookmakers", []):
-            for market in bookmaker.get("markets", []):
-                if market["key"] == "h2h":
-                    for outcome in market.get("outcomes", []):
-                        if outcome["name"] == home_team:
-                            odds_a = max(odds_a, outcome["price"])
-                        elif outcome["name"] == away_team:
-                            odds_b = max(odds_b, outcome["price"])
-                        elif outcome["name"] == "Draw":
-                            odds_draw = max(odds_draw, outcome["price"])
-            if odds_a > 0:
-                break
-
-        if odds_a == 0 or odds_b == 0:
-            return None
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+def sport_category(sport_key):
+    if "basketball" in sport_key:
+        return "basketball"
+    elif "tennis" in sport_key:
+        return "tennis"
+    elif "hockey" in sport_key or "ice" in sport_key:
+        return "hockey"
+    elif "mma" in sport_key:
+        return "mma"
+    return "football"
+
 
-        category = "football"
-        if "basketball" in sport_key:
-            category = "basketball"
-        elif "tennis" in sport_key:
-            category = "tennis"
-        elif "hockey" in sport_key or "ice" in sport_key:
-            category = "hockey"
-        elif "mma" in sport_key:
-            category = "mma"
-
-        if category in ["basketball", "tennis", "mma"]:
+def parse_score(game):
+    score_info = {
+        "id": game["id"],
+        "completed": True,
+        "home_team": game.get("home_team"),
+        "away_team": game.get("away_team"),
+    }
+
+    scores = game.get("scores")
+    if scores and len(scores) == 2:
+        s0 = int(scores[0].get("score", 0))
+        s1 = int(scores[1].get("score", 0))
+        if s0 > s1:
+            score_info["result"] = "team_a" if scores[0]["name"] == game["home_team"] else "team_b"
+        elif s1 > s0:
+            score_info["result"] = "team_b" if scores[1]["name"] == game["away_team"] else "team_a"
+        else:
+            score_info["result"] = "draw"
+        score_info["score_text"] = f"{s0}:{s1}"
+
+    return score_info
+
+
+def table_events(table):
+    """События ленты из таблицы коэффициентов: лучшая цена 1X2 среди всех букмекеров"""
+    events = []
+    for (sport_key, game), (odds_a, odds_draw, odds_b) in zip(table.games, table.best_prices(H2H)):
+        # NaN — исход никто не котирует, сравнение с ним ложно
+        if not (odds_a > 0 and odds_b > 0):
+            continue
+
+        category = sport_category(sport_key)
+        if category in ["basketball", "tennis", "mma"] or not odds_draw > 0:
             odds_draw = 0
 
-        league_name = SPORT_NAMES.get(sport_key, sport_key)
-
-        return {
-            "id": game["id"],
-            "title": f"{home_team} vs {away_team}",
-            "league": league_name,
-            "sport_key": sport_key,
-            "category": category,
-            "team_a": home_team,
-            "team_b": away_team,
-            "odds_a": round(odds_a, 2),
-            "odds_draw": round(odds_draw, 2),
-            "odds_b": round(odds_b, 2),
-            "commence_time": game.get("commence_time", ""),
-            "status": "upcoming",
-        }
-
-    except Exception as e:
-        print(f"⚠️ Ошибка парсинга: {e}")
-        return None
+        home_team = game["home_team"]
+        away_team = game["away_team"]
+        events.append(Event(
+            id=game["id"],
+            title=f"{home_team} vs {away_team}",
+            league=SPORT_NAMES.get(sport_key, sport_key),
+            sport_key=sport_key,
+            category=category,
+            team_a=home_team,
+            team_b=away_team,
+            odds_a=round(odds_a, 2),
+            odds_draw=round(odds_draw, 2),
+            odds_b=round(odds_b, 2),
+            commence_time=game.get("commence_time", ""),
+            status="upcoming",
+        ))
+    return events
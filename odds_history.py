@@ -0,0 +1,193 @@
+import time
+
+import database as db
+from config import HISTORY_CHUNK_POINTS, HISTORY_CHUNK_SPAN, HISTORY_RAW_AGE, HISTORY_STEP, HISTORY_RETENTION
+
+# Исход ставки -> поле коэффициента в Event
+OUTCOMES = (("team_a", "odds_a"), ("draw", "odds_draw"), ("team_b", "odds_b"))
+
+
+# --- Кодирование ---
+# Кусок ряда — последовательность точек (время, цена) в BLOB. Время — целые
+# секунды, цена — сотые доли коэффициента. Каждая точка — разность с предыдущей:
+# varint(dt) + zigzag-varint(dprice); первая точка — разность с (start, 0).
+# Обычная точка занимает 3–4 байта вместо ~20 у JSON.
+
+def _varint(value, out):
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def encode_point(dt, dprice):
+    out = bytearray()
+    _varint(dt, out)
+    _varint(dprice << 1 if dprice >= 0 else (-dprice << 1) - 1, out)
+    return bytes(out)
+
+
+def encode_points(points, start):
+    """[(время, цена)] -> BLOB, разности от (start, 0)"""
+    out = bytearray()
+    t0, p0 = start, 0
+    for t, price in points:
+        out += encode_point(t - t0, price - p0)
+        t0, p0 = t, price
+    return bytes(out)
+
+
+def decode_points(start, data):
+    """BLOB -> [(время, цена)]"""
+    points = []
+    t, price = start, 0
+    values = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        values.append(value)
+        value = shift = 0
+        if len(values) == 2:
+            dt, zz = values
+            t += dt
+            price += (zz >> 1) ^ -(zz & 1)
+            points.append((t, price))
+            values = []
+    return points
+
+
+def downsample(points, step):
+    """Последняя цена в каждом интервале step; подряд одинаковые цены — одной точкой"""
+    result = []
+    bucket = None
+    for t, price in points:
+        if t // step == bucket:
+            result[-1] = (t, price)
+        else:
+            bucket = t // step
+            result.append((t, price))
+    deduped = []
+    for point in result:
+        if not deduped or deduped[-1][1] != point[1]:
+            deduped.append(point)
+    return deduped
+
+
+class OddsHistory:
+    """История коэффициентов ленты: только изменения цены по (событие, исход).
+
+    Ряд хранится кусками в odds_history: каждое изменение дописывается в конец
+    открытого куска (до chunk_points точек или chunk_span секунд), неизменившиеся
+    цены не пишутся.
+    Куски старше raw_age прореживаются до шага step, старше retention — удаляются.
+    Открытые куски (начало, последняя точка) держим в памяти, чтобы дописывать
+    без чтения из БД.
+    """
+
+    def __init__(self, chunk_points=HISTORY_CHUNK_POINTS, chunk_span=HISTORY_CHUNK_SPAN,
+                 raw_age=HISTORY_RAW_AGE, step=HISTORY_STEP, retention=HISTORY_RETENTION):
+        self.chunk_points = chunk_points
+        # Кусок прореживается целиком, когда устареет его последняя точка —
+        # длинный кусок активного ряда так и остался бы сырым
+        self.chunk_span = chunk_span
+        self.raw_age = raw_age
+        self.step = step
+        self.retention = retention
+        # (event_id, outcome) -> [начало куска, время и цена последней точки, точек]
+        self.open = None
+        self.compacted_at = 0
+
+    async def load(self):
+        self.open = {}
+        for key, (start, last_time, price, points, step) in (await db.get_open_history()).items():
+            # В прореженный кусок не дописываем — от него нужна только последняя цена
+            self.open[key] = [start, last_time, price, points if step == 0 else self.chunk_points]
+
+    async def record(self, events, now=None):
+        """Дописать изменившиеся цены событий. Возвращает число записанных точек"""
+        if self.open is None:
+            await self.load()
+        now = int(now or time.time())
+        appends, created, state = [], [], {}
+        for e in events:
+            for outcome, field in OUTCOMES:
+                price = round(getattr(e, field) * 100)
+                if price <= 0:
+                    continue
+                key = (e.id, outcome)
+                chunk = self.open.get(key)
+                if chunk is not None and chunk[2] == price:
+                    continue
+                if (chunk is None or chunk[3] >= self.chunk_points or now - chunk[0] >= self.chunk_span
+                        or now < chunk[1]):
+                    state[key] = [now, now, price, 1]
+                    created.append((e.id, outcome, now, now, price, encode_point(0, price)))
+                else:
+                    state[key] = [chunk[0], now, price, chunk[3] + 1]
+                    appends.append((encode_point(now - chunk[1], price - chunk[2]), now, price,
+                                    e.id, outcome, chunk[0]))
+        if appends or created:
+            await db.append_odds_history(appends, created)
+            # Память меняем только после записи — иначе разошлась бы с БД
+            self.open.update(state)
+        if now - self.compacted_at >= self.step:
+            await self.compact(now)
+        return len(appends) + len(created)
+
+    async def compact(self, now=None):
+        """Прорядить куски старше raw_age и удалить старше retention"""
+        now = int(now or time.time())
+        self.compacted_at = now
+        before = now - self.raw_age
+        series = {}
+        for row in await db.get_raw_history(before):
+            series.setdefault((row["event_id"], row["outcome"]), []).append(row)
+        # Прореженное дописываем в последний прореженный кусок ряда, пока в нём есть место
+        tails = await db.get_history_tails(list(series), self.step) if series else {}
+        replaced = []
+        for (event_id, outcome), chunks in series.items():
+            chunks.sort(key=lambda c: c["start"])
+            points = []
+            tail = tails.get((event_id, outcome))
+            if tail is not None and tail["points"] < self.chunk_points:
+                points = decode_points(tail["start"], tail["data"])
+            for c in chunks:
+                points.extend(decode_points(c["start"], c["data"]))
+            points = downsample(points, self.step)
+            start = points[0][0]
+            replaced.append((
+                event_id, outcome, [c["start"] for c in chunks],
+                (event_id, outcome, self.step, start, points[-1][0], points[-1][1], len(points),
+                 encode_points(points, start)),
+            ))
+            chunk = self.open.get((event_id, outcome)) if self.open is not None else None
+            if chunk is not None and chunk[0] in {c["start"] for c in chunks}:
+                # Открытый кусок ушёл в прореженные — следующая точка начнёт новый.
+                # Последнюю цену оставляем: неизменившаяся цена по-прежнему не пишется
+                chunk[3] = self.chunk_points
+        removed = await db.compact_odds_history(replaced, now - self.retention)
+        if replaced or removed:
+            print(f"🗜 История коэффициентов: прорежено рядов {len(replaced)}, удалено кусков {removed}")
+
+    async def series(self, event_id, since=None):
+        """{исход: [[время, коэффициент], ...]} по времени; None — истории нет.
+
+        С since ряд начинается с цены, действовавшей на момент since.
+        """
+        rows = await db.get_odds_history(event_id)
+        if not rows:
+            return None
+        result = {}
+        for row in rows:
+            result.setdefault(row["outcome"], []).extend(decode_points(row["start"], row["data"]))
+        for outcome, points in result.items():
+            # Прореженные и сырые куски одного ряда не пересекаются по времени
+            points.sort(key=lambda p: p[0])
+            if since is not None:
+                first = next((i for i, p in enumerate(points) if p[0] >= since), len(points))
+                points = points[max(first - 1, 0):]
+            result[outcome] = [[t, price / 100] for t, price in points]
+        return result
@@ -0,0 +1,209 @@
+import math
+
+try:
+    import numpy as np
+except ImportError:  # numpy есть в requirements.txt; без него те же расчёты в чистом Python
+    np = None
+
+# Рынки и исходы — индексы в столбцах таблицы
+MARKETS = ("h2h", "totals", "spreads")
+OUTCOMES = {
+    "h2h": ("a", "draw", "b"),
+    "totals": ("over", "under"),
+    "spreads": ("a", "b"),
+}
+H2H, TOTALS, SPREADS = range(len(MARKETS))
+MARKET_INDEX = {name: m for m, name in enumerate(MARKETS)}
+WIDTH = max(len(o) for o in OUTCOMES.values())
+
+NAN = math.nan
+ROW = 6  # событие, букмекер, рынок, исход, коэффициент, линия
+
+
+def _num(value, digits):
+    return None if value != value else round(float(value), digits)
+
+
+class OddsTable:
+    """Коэффициенты всех букмекеров по всем событиям — в столбцах.
+
+    Ответ /odds разбирается одним проходом в плоские строки (событие, букмекер,
+    рынок, исход, коэффициент, линия). Лучшая цена, консенсус, маржа и
+    вероятности без маржи считаются потом сразу по всем событиям: массивами
+    numpy (событие × букмекер × рынок × исход), если он установлен.
+
+    Тоталы и форы сравниваются только на основной линии — той, что выставило
+    большинство букмекеров. Букмекер, который дал не все исходы рынка, в
+    расчёт не идёт: иначе его маржа выглядела бы заниженной.
+    """
+
+    def __init__(self):
+        self.games = []  # (sport_key, game) по индексу события
+        self.bookmakers = []
+        self._book_index = {}
+        self._rows = []  # плоский список: по ROW чисел на котировку
+        self._summaries = None
+
+    def __len__(self):
+        return len(self.games)
+
+    def _book(self, key):
+        b = self._book_index.get(key)
+        if b is None:
+            b = self._book_index[key] = len(self.bookmakers)
+            self.bookmakers.append(key)
+        return b
+
+    def add_games(self, sport_key, games):
+        """Добавить события одного вида спорта из ответа /sports/{sport}/odds"""
+        rows = self._rows
+        for game in games:
+            start = len(rows)
+            e = len(self.games)
+            try:
+                home = game["home_team"]
+                away = game["away_team"]
+                slots = (
+                    {home: 0, "Draw": 1, away: 2},
+                    {"Over": 0, "Under": 1},
+                    {home: 0, away: 1},
+                )
+                for bookmaker in game.get("bookmakers", ()):
+                    b = self._book(bookmaker["key"])
+                    for market in bookmaker.get("markets", ()):
+                        m = MARKET_INDEX.get(market["key"])
+                        if m is None:
+                            continue
+                        slot = slots[m]
+                        for outcome in market.get("outcomes", ()):
+                            o = slot.get(outcome["name"])
+                            price = outcome["price"]
+                            if o is None or not price > 1:
+                                continue
+                            point = outcome.get("point", NAN)
+                            if m == SPREADS and o == 1:
+                                point = -point  # линию форы храним со стороны хозяев
+                            rows.extend((e, b, m, o, price, point))
+            except Exception as err:
+                print(f"⚠️ Ошибка парсинга: {err}")
+                del rows[start:]
+                continue
+            self.games.append((sport_key, game))
+
+    def compute(self):
+        """Посчитать лучшие цены, консенсус и маржу по всем событиям"""
+        if np is not None:
+            self._compute_numpy()
+        else:
+            self._compute_python()
+        self._summaries = None
+        return self
+
+    def _compute_numpy(self):
+        # Хотя бы один столбец букмекеров, чтобы argmax не падал на пустой оси
+        shape = (len(self.games), max(len(self.bookmakers), 1), len(MARKETS))
+        price = np.full(shape + (WIDTH,), np.nan)
+        point = np.full(shape, np.nan)
+        if self._rows:
+            e, b, m, o, prices, points = np.fromiter(self._rows, float, len(self._rows)).reshape(-1, ROW).T
+            e, b, m, o = (c.astype(np.intp) for c in (e, b, m, o))
+            price[e, b, m, o] = prices
+            point[e, b, m] = points
+
+        # Основная линия — та, за которую «голосует» больше всего букмекеров (NaN != NaN)
+        votes = (point[:, :, None, :] == point[:, None, :, :]).sum(2)
+        main = np.take_along_axis(point, votes.argmax(1)[:, None, :], 1)[:, 0, :]
+        quoted = ~np.isnan(price).all(-1)
+        on_line = quoted & ((point == main[:, None, :]) | np.isnan(main)[:, None, :])
+        price = np.where(on_line[..., None], price, np.nan)
+
+        has = ~np.isnan(price)
+        needed = has.any(1)
+        complete = on_line & (has | ~needed[:, None, :, :]).all(-1)
+        price = np.where(complete[..., None], price, np.nan)
+
+        books = complete.sum(1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inv = 1 / price
+            overround = np.where(complete, np.nansum(inv, -1), np.nan)
+            fair = inv / overround[..., None]
+            best = np.fmax.reduce(price, 1)
+            self.best = best
+            self.consensus = np.where(needed, books[..., None] / np.nansum(inv, 1), np.nan)
+            self.probability = np.where(needed, np.nansum(fair, 1) / books[..., None], np.nan)
+            self.margin = np.where(books > 0, np.nansum(overround, 1) / books - 1, np.nan)
+            self.best_margin = np.where(books > 0, np.nansum(1 / best, -1) - 1, np.nan)
+        self.books = books
+        self.line = np.where(books > 0, main, np.nan)
+
+    def _compute_python(self):
+        n = len(self.games)
+        self.best = [[[NAN] * WIDTH for _ in MARKETS] for _ in range(n)]
+        self.consensus = [[[NAN] * WIDTH for _ in MARKETS] for _ in range(n)]
+        self.probability = [[[NAN] * WIDTH for _ in MARKETS] for _ in range(n)]
+        self.margin = [[NAN] * len(MARKETS) for _ in range(n)]
+        self.best_margin = [[NAN] * len(MARKETS) for _ in range(n)]
+        self.books = [[0] * len(MARKETS) for _ in range(n)]
+        self.line = [[NAN] * len(MARKETS) for _ in range(n)]
+
+        quotes = {}  # (событие, рынок) -> {букмекер: [линия, цены]}
+        for e, b, m, o, price, point in zip(*[iter(self._rows)] * ROW):
+            quote = quotes.setdefault((e, m), {}).setdefault(b, [NAN, [NAN] * WIDTH])
+            quote[0] = point
+            quote[1][o] = price
+
+        for (e, m), by_book in quotes.items():
+            ordered = [by_book[b] for b in sorted(by_book)]
+            points = [p for p, _ in ordered if p == p]
+            main = max(points, key=points.count) if points else NAN
+            lines = [prices for p, prices in ordered if main != main or p == main]
+            needed = [o for o in range(WIDTH) if any(pr[o] == pr[o] for pr in lines)]
+            complete = [pr for pr in lines if all(pr[o] == pr[o] for o in needed)]
+            if not complete:
+                continue
+            count = len(complete)
+            overround = [sum(1 / pr[o] for o in needed) for pr in complete]
+            for o in needed:
+                self.best[e][m][o] = max(pr[o] for pr in complete)
+                self.consensus[e][m][o] = count / sum(1 / pr[o] for pr in complete)
+                self.probability[e][m][o] = sum(1 / pr[o] / s for pr, s in zip(complete, overround)) / count
+            self.margin[e][m] = sum(overround) / count - 1
+            self.best_margin[e][m] = sum(1 / self.best[e][m][o] for o in needed) - 1
+            self.books[e][m] = count
+            self.line[e][m] = main
+
+    def best_prices(self, m):
+        """Лучшие цены рынка m по всем событиям — список списков по исходам"""
+        if np is not None:
+            return self.best[:, m].tolist()
+        return [row[m] for row in self.best]
+
+    def summary(self, e):
+        """Рынки события e: линия, число букмекеров, маржа и цены по исходам"""
+        markets = {}
+        for m, name in enumerate(MARKETS):
+            if not self.books[e][m]:
+                continue
+            outcomes = {}
+            for o, outcome in enumerate(OUTCOMES[name]):
+                if self.best[e][m][o] != self.best[e][m][o]:
+                    continue
+                outcomes[outcome] = {
+                    "best": _num(self.best[e][m][o], 2),
+                    "consensus": _num(self.consensus[e][m][o], 2),
+                    "probability": _num(self.probability[e][m][o], 4),
+                }
+            markets[name] = {
+                "line": _num(self.line[e][m], 2),
+                "books": int(self.books[e][m]),
+                "margin": _num(self.margin[e][m], 4),
+                "best_margin": _num(self.best_margin[e][m], 4),
+                "outcomes": outcomes,
+            }
+        return markets
+
+    def summaries(self):
+        """{event_id: рынки} по всем событиям; считается один раз на таблицу"""
+        if self._summaries is None:
+            self._summaries = {game["id"]: self.summary(e) for e, (_, game) in enumerate(self.games)}
+        return self._summaries
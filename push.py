@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+from models import jsonable
+
+
+def sse_frame(event, data):
+    """Кадр text/event-stream: имя события и JSON в одной строке data"""
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=jsonable)
+    return f"event: {event}\ndata: {payload}\n\n".encode()
+
+
+RESYNC = sse_frame("resync", {})
+HEARTBEAT = b": ping\n\n"
+
+
+class Subscriber:
+    def __init__(self, user_id, maxsize):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+
+class Broadcaster:
+    """Рассылка изменений подписчикам SSE.
+
+    Кадр кодируется один раз и кладётся в очередь каждого подписчика. Очереди
+    ограничены: отстающему клиенту вместо потерянных дельт отправляем resync —
+    он перезапросит полный снимок.
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.sent = 0
+        self.resyncs = 0
+
+    def subscribe(self, user_id=None):
+        sub = Subscriber(user_id, self.queue_size)
+        self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        self.subscribers.discard(sub)
+
+    def publish(self, event, data, user_id=None):
+        """Разослать событие всем или только подписчикам user_id"""
+        if not self.subscribers:
+            return
+        frame = sse_frame(event, data)
+        for sub in self.subscribers:
+            if user_id is not None and sub.user_id != user_id:
+                continue
+            try:
+                sub.queue.put_nowait(frame)
+                self.sent += 1
+            except asyncio.QueueFull:
+                # Клиент не успевает читать — дельты бесполезны, нужен полный снимок
+                sub.dropped += sub.queue.qsize()
+                while not sub.queue.empty():
+                    sub.queue.get_nowait()
+                sub.queue.put_nowait(RESYNC)
+                self.resyncs += 1
+
+    def close(self):
+        """Завершить все потоки: иначе сервер при остановке ждёт открытые соединения"""
+        for sub in self.subscribers:
+            while not sub.queue.empty():
+                sub.queue.get_nowait()
+            sub.queue.put_nowait(None)
+
+    async def stream(self, sub, hello, heartbeat=15):
+        """Поток байтов для StreamingResponse; отписка при разрыве соединения"""
+        try:
+            yield sse_frame("hello", hello)
+            while True:
+                try:
+                    frame = await asyncio.wait_for(sub.queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT
+                    continue
+                if frame is None:
+                    return
+                yield frame
+        finally:
+            self.unsubscribe(sub)
+
+    def stats(self):
+        return {
+            "subscribers": len(self.subscribers),
+            "sent": self.sent,
+            "resyncs": self.resyncs,
+        }
@@ -0,0 +1,94 @@
+import random
+
+RED = frozenset({1, 3, 5, 7, 9, 12, 14, 16, 18, 19, 21, 23, 25, 27, 30, 32, 34, 36})
+BLACK = frozenset({2, 4, 6, 8, 10, 11, 13, 15, 17, 20, 22, 24, 26, 28, 29, 31, 33, 35})
+
+# Таблицы выплат: равновероятные исходы и для каждого выбора — {исход: множитель}
+GAMES = {
+    "coinflip": {
+        "outcomes": ["heads", "tails"],
+        "picks": {
+            "heads": {"heads": 1.95},
+            "tails": {"tails": 1.95},
+        },
+    },
+    "dice": {
+        "outcomes": [str(n) for n in range(1, 7)],
+        "picks": {
+            "low": {str(n): 1.95 for n in (1, 2, 3)},
+            "high": {str(n): 1.95 for n in (4, 5, 6)},
+            **{str(n): {str(n): 5.5} for n in range(1, 7)},
+        },
+    },
+    "roulette": {
+        "outcomes": [str(n) for n in range(37)],
+        "picks": {
+            "red": {str(n): 2 for n in RED},
+            "black": {str(n): 2 for n in BLACK},
+            "green": {"0": 35},
+        },
+    },
+}
+
+MAX_ROUNDS = 100
+MAX_PICKS = 10
+
+
+class QuickGameError(ValueError):
+    pass
+
+
+def pick_rtp(game, pick):
+    """Ожидаемый возврат на 1 монету ставки для выбора в игре"""
+    table = GAMES[game]
+    return sum(table["picks"][pick].values()) / len(table["outcomes"])
+
+
+def rtp_report():
+    """RTP по играм: по каждому выбору и диапазон по игре"""
+    report = {}
+    for game, table in GAMES.items():
+        picks = {pick: round(pick_rtp(game, pick), 4) for pick in table["picks"]}
+        report[game] = {
+            "picks": picks,
+            "min": min(picks.values()),
+            "max": max(picks.values()),
+        }
+    return report
+
+
+class QuickGameEngine:
+    """Быстрые игры по таблицам выплат; rng можно подменить на random.Random(seed)"""
+
+    def __init__(self, rng=None):
+        self.rng = rng or random.Random()
+
+    def validate(self, game, picks, rounds=1):
+        table = GAMES.get(game)
+        if table is None:
+            raise QuickGameError("Неизвестная игра")
+        if not picks or len(picks) > MAX_PICKS:
+            raise QuickGameError(f"Выберите от 1 до {MAX_PICKS} исходов")
+        for pick in picks:
+            if pick not in table["picks"]:
+                raise QuickGameError(f"Неизвестный исход: {pick}")
+        if not 1 <= rounds <= MAX_ROUNDS:
+            raise QuickGameError(f"Раундов: от 1 до {MAX_ROUNDS}")
+        return table
+
+    def play(self, game, picks, amount, rounds=1):
+        """Сыграть rounds раундов; amount — ставка на каждый выбор в каждом раунде.
+
+        Возвращает (раунды, общая ставка, общий выигрыш); баланс не трогает.
+        """
+        table = self.validate(game, picks, rounds)
+        payouts = [table["picks"][pick] for pick in picks]
+        outcomes = table["outcomes"]
+        played = []
+        total_winnings = 0
+        for _ in range(rounds):
+            outcome = self.rng.choice(outcomes)
+            winnings = sum(amount * p.get(outcome, 0) for p in payouts)
+            total_winnings += winnings
+            played.append({"result": outcome, "winnings": round(winnings, 2)})
+        return played, amount * len(picks) * rounds, round(total_winnings, 2)
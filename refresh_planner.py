@@ -0,0 +1,150 @@
+import math
+
+from config import ODDS_HOURLY_BUDGET
+
+# (до начала матча меньше, сек; как часто обновлять коэффициенты, сек)
+TIERS = (
+    (3600, 60),
+    (6 * 3600, 300),
+    (24 * 3600, 900),
+)
+TIER_NAMES = ("<1h", "<6h", "<24h")
+# Полная загрузка вида спорта: дальние матчи и новые события
+FULL_INTERVAL = 3600
+# Сдвиг лучшей цены за обновление (доля, сглаженно): выше FAST — обновляем вдвое
+# чаще, ниже SLOW — вдвое реже
+MOVE_FAST = 0.02
+MOVE_SLOW = 0.002
+# Сколько eventIds передавать в одном запросе (ограничение длины URL)
+EVENT_IDS_PER_REQUEST = 40
+
+
+class RefreshPlanner:
+    """Когда обновлять коэффициенты: по виду спорта и по группам матчей.
+
+    Матчи вида спорта делятся по времени до начала (TIERS); каждая группа
+    обновляется своим запросом /odds с eventIds и своим интервалом, который
+    сокращается, если цены в группе двигаются, и растёт, если стоят. Раз в
+    FULL_INTERVAL вид спорта загружается целиком — так появляются новые матчи.
+    Если план не укладывается в budget кредитов квоты в час, все интервалы
+    растягиваются в одно и то же число раз. Последний план — в report().
+    """
+
+    def __init__(self, budget=ODDS_HOURLY_BUDGET, cost=1, tiers=TIERS, full_interval=FULL_INTERVAL):
+        self.budget = budget
+        self.cost = cost  # кредитов квоты за один запрос /odds (по числу рынков)
+        self.tiers = tiers
+        self.full_interval = full_interval
+        self.sport_fetched = {}  # sport_key -> время полной загрузки
+        self.fetched = {}  # event_id -> время последней загрузки
+        self.prices = {}  # event_id -> (odds_a, odds_draw, odds_b)
+        self.moves = {}  # event_id -> сглаженный относительный сдвиг цены
+        self.groups = []
+        self.stretch = 1.0
+        self.hourly = 0.0
+
+    def tier(self, seconds_left):
+        """Номер группы по времени до начала; None — дальний матч или уже начался"""
+        if seconds_left <= 0:
+            return None
+        for i, (limit, _) in enumerate(self.tiers):
+            if seconds_left < limit:
+                return i
+        return None
+
+    def plan(self, kickoffs, now):
+        """Группы обновления. kickoffs — {sport_key: {event_id: время начала}}"""
+        groups = []
+        for sport, starts in kickoffs.items():
+            groups.append({
+                "sport": sport, "tier": "all", "event_ids": None, "events": len(starts),
+                "requests": 1, "move": None, "base": self.full_interval,
+                "last": self.sport_fetched.get(sport, 0),
+            })
+            by_tier = {}
+            for eid, start in starts.items():
+                t = self.tier(start - now) if start is not None else None
+                if t is not None:
+                    by_tier.setdefault(t, []).append(eid)
+            for t, ids in sorted(by_tier.items()):
+                # Сдвиг ещё не известен (матч загружен один раз) — базовый интервал
+                moves = [self.moves[eid] for eid in ids if eid in self.moves]
+                move = max(moves) if moves else None
+                factor = 1 if move is None else 0.5 if move >= MOVE_FAST else 2 if move < MOVE_SLOW else 1
+                groups.append({
+                    "sport": sport, "tier": TIER_NAMES[t], "event_ids": sorted(ids), "events": len(ids),
+                    "requests": math.ceil(len(ids) / EVENT_IDS_PER_REQUEST),
+                    "move": None if move is None else round(move, 4),
+                    "base": self.tiers[t][1] * factor,
+                    # Срок группы — от её последней загрузки: матч, перешедший из дальней
+                    # группы, ждёт её очередного обновления. Иначе каждый такой переход
+                    # вызывал бы внеочередную загрузку всей группы мимо бюджета
+                    "last": max(self.fetched.get(eid, 0) for eid in ids),
+                })
+        self.hourly = sum(3600 / g["base"] * g["requests"] for g in groups) * self.cost
+        self.stretch = max(1.0, self.hourly / self.budget) if self.budget else 1.0
+        for g in groups:
+            g["interval"] = g["base"] * self.stretch
+            g["due"] = g["last"] + g["interval"]
+        self.groups = groups
+        return groups
+
+    def due(self, kickoffs, now):
+        """Что загрузить сейчас: [(sport_key, [event_id, ...] или None — весь вид спорта)]"""
+        jobs = []
+        full = set()
+        for g in self.plan(kickoffs, now):
+            if g["due"] > now:
+                continue
+            if g["event_ids"] is None:
+                full.add(g["sport"])
+                jobs.append((g["sport"], None))
+            elif g["sport"] not in full:
+                ids = g["event_ids"]
+                for i in range(0, len(ids), EVENT_IDS_PER_REQUEST):
+                    jobs.append((g["sport"], ids[i:i + EVENT_IDS_PER_REQUEST]))
+        return jobs
+
+    def loaded(self, sport, event_ids, now, full=False):
+        """Отметить удачную загрузку матчей event_ids; full — загружен весь вид спорта"""
+        if full:
+            self.sport_fetched[sport] = now
+        for eid in event_ids:
+            self.fetched[eid] = now
+
+    def observe(self, events, updated_ids):
+        """Запомнить сдвиг цен у событий, которые только что загрузили; забыть пропавшие"""
+        present = set()
+        for e in events:
+            present.add(e.id)
+            if e.id not in updated_ids:
+                continue
+            prices = (e.odds_a, e.odds_draw, e.odds_b)
+            prev = self.prices.get(e.id)
+            self.prices[e.id] = prices
+            if prev is None:
+                continue
+            change = max((abs(n - o) / o for n, o in zip(prices, prev) if o > 0), default=0)
+            self.moves[e.id] = (self.moves.get(e.id, change) + change) / 2
+        for d in (self.fetched, self.prices, self.moves):
+            for eid in [eid for eid in d if eid not in present]:
+                del d[eid]
+
+    def report(self, now):
+        """План для отладки: бюджет, растяжение и группы со сроком следующего обновления"""
+        return {
+            "budget_per_hour": self.budget,
+            "cost_per_request": self.cost,
+            "planned_per_hour": round(self.hourly, 1),
+            "stretch": round(self.stretch, 2),
+            "groups": [{
+                "sport": g["sport"],
+                "tier": g["tier"],
+                "events": g["events"],
+                "requests": g["requests"],
+                "move": g["move"],
+                "interval": round(g["interval"]),
+                "last_ago": round(now - g["last"]) if g["last"] else None,
+                "due_in": round(max(g["due"] - now, 0)),
+            } for g in self.groups],
+        }
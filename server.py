@@ -1,23 +1,96 @@
+import json
 import time
-import random
-import aiosqlite
 import asyncio
-
-from fastapi import FastAPI, HTTPException
+import base64
+import binascii
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+from aiogram import Bot
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 import database as db
-from odds_api import get_upcoming_events, get_live_scores
-
-app = FastAPI()
+import odds_api
+from config import (BOT_TOKEN, PUSH_QUEUE_SIZE, PUSH_HEARTBEAT, WORKERS, LEASE_TTL,
+                    SNAPSHOT_PATH, SNAPSHOT_POLL, LEADERBOARD_MAX_AGE, ODDS_REFRESH_TICK)
+from odds_api import get_upcoming_events
+from event_cache import EventCache, etag_matches
+from settle_scheduler import SettlementScheduler
+from leaderboard import Leaderboard
+from quick_games import QuickGameEngine, QuickGameError, rtp_report
+from ledger import BalanceLedger
+from push import Broadcaster
+from notifier import Notifier
+from cluster import LeaderLease, SnapshotFile
+from models import Event, encode_list
+from cashout import CashoutPricer, pick_pricing, offered_odds
+from odds_history import OddsHistory
+import metrics
+
+@asynccontextmanager
+async def lifespan(app):
+    """Запуск и остановка всех общих ресурсов: БД, кэши, фоновые задачи"""
+    await db.init_db()
+    # Снимок из БД — база для сравнения при первом обновлении
+    events_cache.seed(await db.get_cached_hashes())
+    await leaderboard_board.load()
+    await balance_ledger.start()
+    # bet_bot передаёт сюда своего бота; при запуске одного API создаём собственного
+    own_bot = bool(BOT_TOKEN) and notifier.bot is None
+    if own_bot:
+        notifier.bot = Bot(token=BOT_TOKEN)
+    stopping.clear()
+    if multi_worker:
+        # Обновлением событий, расчётом и рассылкой занимается только лидер
+        events_cache.loader = load_snapshot
+        refresh = None
+        background = asyncio.create_task(cluster_loop())
+    else:
+        await notifier.start()
+        # Загружаем события при старте и дальше по плану обновления
+        refresh = asyncio.create_task(refresh_events())
+        # Фоновая задача — проверка результатов
+        background = asyncio.create_task(background_settler())
+    try:
+        yield
+    finally:
+        # Расчёт, который уже идёт, доводим до конца — новый не начинаем
+        stopping.set()
+        await background
+        if refresh:
+            # Дожидаемся отмены: обновление может писать в БД, которую закрываем ниже
+            refresh.cancel()
+            try:
+                await refresh
+            except asyncio.CancelledError:
+                pass
+        await events_cache.cancel()
+        push_hub.close()
+        await odds_api.close()
+        await balance_ledger.stop()
+        await notifier.stop()
+        if own_bot:
+            await notifier.bot.session.close()
+            notifier.bot = None
+        await db.close_db()
+
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+app.add_middleware(metrics.MetricsMiddleware)
+
 
-# Кэш в памяти
-events_cache = {"events": [], "updated": 0}
-CACHE_TTL = 300  # Обновлять каждые 5 минут
+@app.exception_handler(RequestValidationError)
+async def validation_error(request: Request, exc: RequestValidationError):
+    """422 без полученного значения: NaN из тела запроса не сериализуется в JSON"""
+    errors = [{k: v for k, v in e.items() if k != "input"} for e in exc.errors()]
+    return JSONResponse(status_code=422, content={"detail": jsonable_encoder(errors)})
 
 
 class BetRequest(BaseModel):
@@ -26,8 +99,9 @@ class BetRequest(BaseModel):
     event_title: str
     pick: str
     pick_label: str
-    odds: float
-    amount: float
+    # NaN и бесконечность прошли бы сравнения с балансом и испортили бы его
+    odds: float = Field(gt=0, allow_inf_nan=False)
+    amount: float = Field(gt=0, allow_inf_nan=False)
 
 
 class CashoutRequest(BaseModel):
@@ -39,62 +113,234 @@ class QuickBetRequest(BaseModel):
     user_id: int
     game: str
     pick: str
-    amount: float
+    amount: float = Field(gt=0, allow_inf_nan=False)
 
 
-@app.on_event("startup")
-async def startup():
-    await db.init_db()
-    # Загружаем события при старте
-    asyncio.create_task(refresh_events())
-    # Фоновая задача — проверка результатов
-    asyncio.create_task(background_settler())
+class QuickBatchRequest(BaseModel):
+    user_id: int
+    game: str
+    picks: list[str]
+    amount: float = Field(gt=0, allow_inf_nan=False)
+    rounds: int = 1
+
+
+async def load_events():
+    """Загрузить свежие события, при неудаче — из кэша БД"""
+    events = await get_upcoming_events()
+    if events:
+        # Возраст ленты — от последней загрузки из API, а не от сверки с планом
+        return events, odds_api.client.fetched_at or time.time()
+    # Пробуем из кэша БД
+    cached, updated = await db.get_cached_events()
+    if cached:
+        print(f"📦 Из кэша: {len(cached)} событий")
+        return cached, updated
+    return None
+
+
+async def persist_events(changes):
+    """Сохранить в БД только изменившиеся события"""
+    counts = await db.save_event_changes(changes)
+    print(f"💾 События: +{counts['added']} ~{counts['changed']} -{counts['removed']}")
+
+
+async def on_events_change(changes):
+    # Воркер-последователь получил события из снимка лидера — в БД их уже записал лидер
+    if not multi_worker or lease.is_leader:
+        await persist_events(changes)
+        try:
+            await odds_history.record(changes["added"] + changes["changed"])
+        except Exception as e:
+            print(f"⚠️ Ошибка записи истории коэффициентов: {e}")
+        # Коэффициенты сдвинулись — оцениваем открытые ставки без действующей котировки
+        try:
+            await quote_cashouts()
+        except Exception as e:
+            print(f"⚠️ Ошибка котировок кэшаута: {e}")
+    push_hub.publish("events", {
+        "version": changes["version"],
+        "added": changes["added"],
+        "changed": changes["changed"],
+        "removed": changes["removed"],
+    })
+
+
+def push_balance(user):
+    """Подписчик db.on_user_change: новый баланс и статистика — только самому игроку"""
+    push_hub.publish("balance", {
+        "balance": user["balance"],
+        "total_bets": user["total_bets"],
+        "total_wins": user["total_wins"],
+        "total_profit": user["total_profit"],
+    }, user_id=user["user_id"])
+
+
+# Несколько воркеров (uvicorn --workers N): лидер выбирается арендой в БД
+multi_worker = WORKERS > 1
+lease = LeaderLease("leader", ttl=LEASE_TTL)
+snapshot_file = SnapshotFile(SNAPSHOT_PATH)
+# Рынки по букмекерам для /api/events/{id}/odds — второй снимок лидера
+odds_file = SnapshotFile(f"{SNAPSHOT_PATH}.odds")
+follower_markets = {"version": None, "markets": {}}
+
+# Кэш в памяти; что именно загружать из API, решает odds_api.client.planner
+events_cache = EventCache(load_events, ttl=ODDS_REFRESH_TICK, retry_interval=ODDS_REFRESH_TICK,
+                          on_change=on_events_change)
+# Уведомления о расчёте пишутся в outbox той же транзакцией, что и расчёт
+settle_scheduler = SettlementScheduler(message=lambda summary: notifier.message(summary))
+leaderboard_board = Leaderboard(size=20, max_age=LEADERBOARD_MAX_AGE if multi_worker else None)
+quick_engine = QuickGameEngine()
+balance_ledger = BalanceLedger(shared=multi_worker)
+push_hub = Broadcaster(queue_size=PUSH_QUEUE_SIZE)
+notifier = Notifier()
+stopping = asyncio.Event()
+cashout_pricer = CashoutPricer(lambda event_id, pick: bet_pricing(event_id, pick))
+odds_history = OddsHistory()
+db.on_user_change(leaderboard_board.update)
+db.on_user_change(push_balance)
+
+# Метрики-состояния: считаются при чтении /metrics
+metrics.Gauge("events_cache_age_seconds", "Возраст событий в кэше", fn=lambda: events_cache.age)
+pending_bets_gauge = metrics.Gauge("bets_pending", "Нерассчитанных ставок")
 
 
 async def refresh_events():
-    """Загрузить свежие события"""
-    global events_cache
-    try:
-        print("🔄 Загружаем события...")
-        events = await get_upcoming_events()
-        if events:
-            events_cache["events"] = events
-            events_cache["updated"] = time.time()
-            await db.cache_events(events)
-            print(f"✅ Загружено {len(events)} событий")
-        else:
-            # Пробуем из кэша БД
-            cached, updated = await db.get_cached_events()
-            if cached:
-                events_cache["events"] = cached
-                events_cache["updated"] = updated
-                print(f"📦 Из кэша: {len(cached)} событий")
-    except Exception as e:
-        print(f"❌ Ошибка загрузки событий: {e}")
+    """Сверяться с планом обновления, даже когда ленту никто не запрашивает"""
+    while not stopping.is_set():
+        await events_cache.refresh()
+        try:
+            await asyncio.wait_for(stopping.wait(), ODDS_REFRESH_TICK)
+        except asyncio.TimeoutError:
+            pass
 
 
 async def background_settler():
-    """Фоновая задача: проверяем результаты матчей каждые 10 минут"""
-    while True:
-        await asyncio.sleep(600)  # 10 минут
+    """Фоновая задача: опрашиваем счёт только по матчам с открытыми ставками"""
+    while not stopping.is_set():
         try:
-            pending = await db.get_pending_bets()
-            if not pending:
-                continue
-
-            scores = await get_live_scores()
-            pending_ids = {b["event_id"] for b in pending}
-
-            for score in scores:
-                if score["id"] in pending_ids and score.get("result"):
-                    settled = await db.settle_bet(score["id"], score["result"])
-                    if settled:
-                        print(f"✅ Рассчитан матч {score['id']}: {len(settled)} ставок")
+            await asyncio.wait_for(stopping.wait(), settle_scheduler.tick)
+            break
+        except asyncio.TimeoutError:
+            pass
+        try:
+            summaries = await settle_scheduler.poll_once()
+            for s in summaries:
+                balance_ledger.adjust(s["user_id"], s["payout"])
+                push_hub.publish("bets", {"settled": s["details"]}, user_id=s["user_id"])
+            await notifier.notify(summaries)
+            if summaries:
+                total = sum(s["bets"] for s in summaries)
+                print(f"✅ Рассчитано ставок: {total}, игроков: {len(summaries)}")
 
         except Exception as e:
             print(f"⚠️ Ошибка расчёта: {e}")
 
 
+async def load_snapshot():
+    """Загрузчик событий для воркера-последователя: снимок, который пишет лидер"""
+    snap = snapshot_file.read()
+    if snap is None:
+        return None
+    _, updated, body = snap
+    return [Event.from_dict(e) for e in json.loads(body)["events"]], updated
+
+
+def event_markets(event_id):
+    """Рынки события: своя таблица коэффициентов или снимок лидера"""
+    if not multi_worker or lease.is_leader:
+        table = odds_api.client.table
+        return table.summaries().get(event_id) if table else None
+    snap = odds_file.read()
+    if snap is None:
+        return None
+    version, _, body = snap
+    if version != follower_markets["version"]:
+        follower_markets.update(version=version, markets=json.loads(body))
+    return follower_markets["markets"].get(event_id)
+
+
+def bet_pricing(event_id, pick):
+    return pick_pricing(event_markets(event_id), events_cache.by_id.get(event_id), pick)
+
+
+async def quote_cashouts(user_id=None):
+    """Действующие котировки кэшаута игрока (или всех): недостающие оцениваются одной пачкой"""
+    bets = await db.get_cashout_bets(user_id)
+    fresh = cashout_pricer.quotes([b for b in bets if b["quote"] is None])
+    if fresh:
+        await db.save_cashout_quotes(fresh)
+        # Параллельный запрос мог успеть выдать свою котировку — отдаём записанную
+        bets = await db.get_cashout_bets(user_id)
+    return [b for b in bets if b["quote"] is not None]
+
+
+async def cluster_loop():
+    """Роль воркера в кластере.
+
+    Лидер обновляет события, считает ставки, рассылает уведомления и публикует
+    снимок событий. Остальные следят за версией снимка и перечитывают его —
+    в The Odds API ходит только лидер.
+    """
+    settler = None
+    published = None
+    seen = None
+    renew_at = 0
+    try:
+        while not stopping.is_set():
+            try:
+                if time.monotonic() >= renew_at:
+                    renew_at = time.monotonic() + lease.ttl / 3
+                    try:
+                        leader = await lease.acquire()
+                    except Exception as e:
+                        print(f"⚠️ Ошибка аренды лидера: {e}")
+                        leader = False
+                    if leader and settler is None:
+                        print(f"👑 Воркер {lease.owner} — лидер")
+                        events_cache.loader = load_events
+                        # Пока писал прошлый лидер, открытые куски истории сменились
+                        odds_history.open = None
+                        await notifier.start()
+                        settler = asyncio.create_task(background_settler())
+                        published = None
+                    elif not leader and settler is not None:
+                        print(f"⚠️ Воркер {lease.owner} потерял лидерство")
+                        settler.cancel()
+                        await asyncio.gather(settler, return_exceptions=True)
+                        settler = None
+                        await notifier.stop()
+                        events_cache.loader = load_snapshot
+
+                if settler is not None:
+                    # Устаревшие события обновятся в фоне
+                    await events_cache.get()
+                    # Новая загрузка из API или начавшиеся матчи ушли из ленты без загрузки
+                    current = (events_cache.updated, events_cache.version)
+                    if events_cache.updated and current != published:
+                        published = current
+                        snapshot_file.write(events_cache.updated, events_cache.response()[0])
+                        table = odds_api.client.table
+                        markets = table.summaries() if table else {}
+                        odds_file.write(events_cache.updated, json.dumps(markets, separators=(",", ":")).encode())
+                else:
+                    version = snapshot_file.version()
+                    if version is not None and version != seen:
+                        seen = version
+                        await events_cache.refresh()
+            except Exception as e:
+                print(f"⚠️ Ошибка воркера: {e}")
+            try:
+                await asyncio.wait_for(stopping.wait(), SNAPSHOT_POLL)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        if settler is not None:
+            if not stopping.is_set():
+                settler.cancel()
+            await asyncio.gather(settler, return_exceptions=True)
+        await lease.release()
+
+
 # --- Страница ---
 
 @app.get("/")
@@ -112,110 +358,254 @@ async def get_user(user_id: int, username: str = "player"):
 
 
 @app.get("/api/events")
-async def get_events(sport: str = "all"):
-    global events_cache
+async def get_events(request: Request, sport: str = "all"):
+    # Устаревшие данные отдаём сразу, обновление идёт в фоне
+    await events_cache.get()
+    body, etag = events_cache.response(sport)
+
+    meta = events_cache.meta()
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+        "X-Events-Updated": str(meta["updated"]),
+        "X-Events-Age": str(meta["age"]),
+        "X-Events-Fresh": str(int(meta["fresh"])),
+        "X-Events-Refreshing": str(int(meta["refreshing"])),
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@app.get("/api/stream")
+async def stream(user_id: int = None):
+    """SSE-поток изменений: коэффициенты, события, расчёт ставок, баланс"""
+    sub = push_hub.subscribe(user_id)
+    hello = {"events_version": events_cache.version}
+    return StreamingResponse(
+        push_hub.stream(sub, hello, heartbeat=PUSH_HEARTBEAT),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-    # Обновляем кэш если устарел
-    if time.time() - events_cache["updated"] > CACHE_TTL:
-        await refresh_events()
 
-    events = events_cache["events"]
+@app.get("/api/events/refresh")
+async def force_refresh():
+    # Присоединяемся к уже идущему обновлению, если оно есть
+    await events_cache.refresh()
+    return {"message": "OK", "total": len(events_cache.events)}
 
-    if sport != "all":
-        events = [e for e in events if e["category"] == sport]
 
+@app.get("/api/events/schedule")
+async def refresh_schedule():
+    """План обновления коэффициентов: группы, интервалы, бюджет (ведёт лидер)"""
     return {
-        "events": events,
-        "updated": events_cache["updated"],
-        "total": len(events)
+        "worker": lease.owner,
+        "leader": lease.is_leader if multi_worker else True,
+        **odds_api.client.planner.report(time.time()),
     }
 
 
-@app.get("/api/events/refresh")
-async def force_refresh():
-    await refresh_events()
-    return {"message": "OK", "total": len(events_cache["events"])}
+@app.get("/api/events/{event_id}/odds")
+async def event_odds(event_id: str):
+    """Рынки события по всем букмекерам: лучшая цена, консенсус, маржа"""
+    markets = event_markets(event_id)
+    if markets is None:
+        raise HTTPException(404, "Нет коэффициентов по событию")
+    return {"event_id": event_id, "markets": markets}
+
+
+@app.get("/api/events/{event_id}/history")
+async def event_history(event_id: str, since: int = None):
+    """Движение коэффициентов события: [[время, коэффициент], ...] по исходам"""
+    series = await odds_history.series(event_id, since)
+    if series is None:
+        raise HTTPException(404, "Нет истории коэффициентов по событию")
+    return {"event_id": event_id, "series": series}
 
 
 @app.post("/api/bet")
 async def place_bet(bet: BetRequest):
     if bet.amount < 10:
         raise HTTPException(400, "Минимальная ставка: 10 монет")
-    balance = await db.get_balance(bet.user_id)
-    if balance < bet.amount:
+
+    # Коэффициент — только из ленты (начавшихся матчей в ней нет): присланный
+    # клиентом лишь сверяем, чтобы игрок не получил не ту цену, которую видел
+    event = events_cache.by_id.get(bet.event_id)
+    odds = offered_odds(event, bet.pick)
+    if odds is None:
+        raise HTTPException(400, "Ставки на этот исход не принимаются")
+    if abs(bet.odds - odds) > 0.005:
+        raise HTTPException(400, f"Коэффициент изменился: {odds}")
+
+    # Средства проверяем и резервируем по балансу в памяти (shared — проверит БД при записи)
+    new_balance = await balance_ledger.reserve(bet.user_id, bet.amount)
+    if new_balance is None:
         raise HTTPException(400, "Недостаточно средств")
 
-    result, msg = await db.place_bet(
-        bet.user_id, bet.event_id, bet.event_title,
-        bet.pick, bet.pick_label, bet.odds, bet.amount
-    )
+    result = None
+    try:
+        result, msg = await db.place_bet(
+            bet.user_id, bet.event_id, event.title,
+            bet.pick, bet.pick_label, odds, bet.amount,
+            sport_key=event.sport_key,
+            commence_time=event.commence_time,
+            check_funds=balance_ledger.shared
+        )
+    finally:
+        balance_ledger.release(bet.user_id, 0 if result else bet.amount)
     if not result:
         raise HTTPException(400, msg)
+    if not balance_ledger.shared:
+        result["new_balance"] = new_balance
+    return result
+
 
-    new_balance = await db.get_balance(bet.user_id)
-    return {"bet": result, "new_balance": new_balance}
+@app.get("/api/cashout/quotes")
+async def cashout_quotes(user_id: int):
+    """Цены кэшаута по открытым ставкам игрока; цена держится до expires_at"""
+    now = time.time()
+    quotes = await quote_cashouts(user_id)
+    return {
+        "quotes": [{
+            "bet_id": q["id"],
+            "amount": q["quote"],
+            "expires_at": q["expires_at"],
+            "expires_in": round(q["expires_at"] - now, 1),
+        } for q in quotes],
+        "margin": cashout_pricer.margin,
+    }
 
 
 @app.post("/api/cashout")
 async def cashout(req: CashoutRequest):
-    result, msg = await db.cashout_bet(req.bet_id, req.user_id)
+    result, msg = await db.cashout_bet(req.bet_id, req.user_id, cashout_pricer.price_one)
     if not result:
         raise HTTPException(400, msg)
-    new_balance = await db.get_balance(req.user_id)
-    return {"cashout": result, "new_balance": new_balance}
+    new_balance = balance_ledger.adjust(req.user_id, result["cashout"]["cashout_amount"])
+    if new_balance is not None:
+        result["new_balance"] = new_balance
+    return result
 
 
 @app.post("/api/quick-bet")
 async def quick_bet(req: QuickBetRequest):
     if req.amount < 10:
         raise HTTPException(400, "Минимальная ставка: 10 монет")
-    balance = await db.get_balance(req.user_id)
-    if balance < req.amount:
+
+    # Баланс меняется в памяти сразу, в БД — групповой записью журнала
+    try:
+        rounds, stake, winnings = quick_engine.play(req.game, [req.pick], req.amount)
+    except QuickGameError as e:
+        raise HTTPException(400, str(e))
+
+    new_balance = await balance_ledger.play(req.user_id, stake, winnings, ref=req.game)
+    if new_balance is None:
         raise HTTPException(400, "Недостаточно средств")
+    return {"game": req.game, "pick": req.pick, "result": rounds[0]["result"],
+            "win": winnings > 0, "winnings": winnings, "new_balance": round(new_balance, 2)}
 
-    await db.update_balance(req.user_id, -req.amount)
-    win = False
-    winnings = 0
-    result_value = ""
-
-    if req.game == "coinflip":
-        result_value = random.choice(["heads", "tails"])
-        win = req.pick == result_value
-        if win: winnings = req.amount * 1.95
-    elif req.game == "dice":
-        result_value = str(random.randint(1, 6))
-        if req.pick in ["low", "high"]:
-            v = int(result_value)
-            if (req.pick == "low" and v <= 3) or (req.pick == "high" and v >= 4):
-                win, winnings = True, req.amount * 1.95
-        elif req.pick == result_value:
-            win, winnings = True, req.amount * 5.5
-    elif req.game == "roulette":
-        result_value = str(random.randint(0, 36))
-        n = int(result_value)
-        red = {1,3,5,7,9,12,14,16,18,19,21,23,25,27,30,32,34,36}
-        black = {2,4,6,8,10,11,13,15,17,20,22,24,26,28,29,31,33,35}
-        if req.pick == "red" and n in red: win, winnings = True, req.amount * 2
-        elif req.pick == "black" and n in black: win, winnings = True, req.amount * 2
-        elif req.pick == "green" and n == 0: win, winnings = True, req.amount * 35
-
-    if win:
-        await db.update_balance(req.user_id, winnings)
-    new_balance = await db.get_balance(req.user_id)
-    return {"game": req.game, "pick": req.pick, "result": result_value,
-            "win": win, "winnings": round(winnings, 2), "new_balance": round(new_balance, 2)}
+
+@app.post("/api/quick-bet/batch")
+async def quick_bet_batch(req: QuickBatchRequest):
+    """Несколько раундов и/или исходов за один запрос"""
+    if req.amount < 10:
+        raise HTTPException(400, "Минимальная ставка: 10 монет")
+    try:
+        rounds, stake, winnings = quick_engine.play(req.game, req.picks, req.amount, req.rounds)
+    except QuickGameError as e:
+        raise HTTPException(400, str(e))
+
+    new_balance = await balance_ledger.play(req.user_id, stake, winnings, ref=req.game)
+    if new_balance is None:
+        raise HTTPException(400, "Недостаточно средств")
+    return {"game": req.game, "picks": req.picks, "rounds": rounds,
+            "stake": stake, "winnings": winnings, "net": round(winnings - stake, 2),
+            "new_balance": round(new_balance, 2)}
+
+
+@app.get("/api/quick-games")
+async def quick_games():
+    return {"rtp": rtp_report()}
+
+
+def encode_cursor(key):
+    created_at, bet_id = key
+    return base64.urlsafe_b64encode(f"{created_at}|{bet_id}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Курсор страницы -> ключ (created_at, id)"""
+    try:
+        created_at, bet_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return created_at, int(bet_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(400, "Неверный курсор")
+
+
+def bets_time(value):
+    """Дата или время ISO из запроса -> формат created_at в bets (UTC)"""
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(400, f"Неверная дата: {value}")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
 
 
 @app.get("/api/bets/{user_id}")
-async def get_user_bets(user_id: int):
-    return {"bets": await db.get_user_bets(user_id)}
+async def get_user_bets(user_id: int, limit: int = 30, cursor: str = None, result: str = None,
+                        since: str = None, until: str = None):
+    """История ставок страницами: next_cursor передаётся в cursor за следующей.
+
+    Фильтры: result (pending/win/lose/cashout), since и until — created_at в [since, until).
+    """
+    if result is not None and result not in db.BET_RESULTS:
+        raise HTTPException(400, f"Неизвестный результат: {result}")
+    bets, next_key = await db.get_user_bets(
+        user_id, limit=max(1, min(limit, 100)), result=result,
+        since=bets_time(since) if since else None,
+        until=bets_time(until) if until else None,
+        after=decode_cursor(cursor) if cursor else None,
+    )
+    next_cursor = encode_cursor(next_key) if next_key else None
+    return Response(encode_list("bets", bets, next_cursor=next_cursor), media_type="application/json")
+
+
+@app.get("/api/bets/{user_id}/summary")
+async def bets_summary(user_id: int):
+    """Открытые ставки: сколько, сумма в игре и возможный выигрыш"""
+    return await db.get_bets_summary(user_id)
 
 
 @app.get("/api/leaderboard")
 async def leaderboard():
-    async with aiosqlite.connect(db.DB_PATH) as conn:
-        conn.row_factory = aiosqlite.Row
-        cursor = await conn.execute(
-            "SELECT user_id, username, balance, total_bets, total_wins FROM users ORDER BY balance DESC LIMIT 20"
-        )
-        return {"leaderboard": [dict(r) for r in await cursor.fetchall()]}
+    return Response(await leaderboard_board.response(), media_type="application/json")
+
+
+@app.get("/api/leaderboard/rank/{user_id}")
+async def leaderboard_rank(user_id: int):
+    return await leaderboard_board.rank(user_id)
+
+
+@app.get("/api/stats")
+async def stats():
+    return {
+        "user_cache": db.user_cache.stats(),
+        "push": push_hub.stats(),
+        "notifier": notifier.stats(),
+        "cluster": {
+            "workers": WORKERS,
+            "worker": lease.owner,
+            "leader": lease.is_leader if multi_worker else True,
+            "snapshot_version": snapshot_file.version() if multi_worker else None,
+        },
+    }
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Метрики процесса в формате Prometheus; при нескольких воркерах — у каждого свои"""
+    pending_bets_gauge.set(await db.count_pending_bets())
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,114 @@
+import time
+
+import database as db
+from config import SPORTS, SETTLE_TICK, SETTLE_GRACE, SETTLE_BACKOFF, SETTLE_MAX_BACKOFF
+from odds_api import get_scores, sport_category, parse_time
+from settlement import settle_outcomes
+from metrics import Histogram
+
+# Примерная длительность матча от начала до финала, сек
+MATCH_DURATION = {
+    "football": 2 * 3600,
+    "basketball": 2.5 * 3600,
+    "tennis": 3 * 3600,
+    "hockey": 2.5 * 3600,
+    "mma": 4 * 3600,
+}
+
+SETTLE_TIME = Histogram("settle_batch_duration_seconds", "Расчёт пачки завершённых матчей одной транзакцией")
+SETTLE_BETS = Histogram("settle_batch_bets", "Ставок в пачке расчёта",
+                        buckets=(1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 50000))
+
+
+class SettlementScheduler:
+    """Опрос счёта только по матчам с открытыми ставками, после их ожидаемого окончания"""
+
+    def __init__(self, tick=SETTLE_TICK, grace=SETTLE_GRACE,
+                 backoff=SETTLE_BACKOFF, max_backoff=SETTLE_MAX_BACKOFF, message=None):
+        self.tick = tick
+        self.message = message  # текст уведомления по сводке — для settle_outcomes
+        self.grace = grace
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        # event_id -> время следующего опроса и число неудачных попыток
+        self._next_poll = {}
+        self._attempts = {}
+
+    def expected_finish(self, event):
+        start = parse_time(event.get("commence_time"))
+        if start is None:
+            return None
+        category = sport_category(event["sport_key"]) if event.get("sport_key") else "football"
+        return start + MATCH_DURATION.get(category, 3 * 3600)
+
+    def next_poll(self, event):
+        eid = event["event_id"]
+        if eid not in self._next_poll:
+            finish = self.expected_finish(event)
+            # Без времени начала — опрашиваем сразу и дальше по backoff
+            self._next_poll[eid] = finish + self.grace if finish is not None else 0
+        return self._next_poll[eid]
+
+    def _postpone(self, eid, now):
+        attempts = self._attempts.get(eid, 0) + 1
+        self._attempts[eid] = attempts
+        self._next_poll[eid] = now + min(self.backoff * 2 ** (attempts - 1), self.max_backoff)
+
+    def _forget(self, eid):
+        self._next_poll.pop(eid, None)
+        self._attempts.pop(eid, None)
+
+    async def poll_once(self, now=None):
+        """Опросить матчи, чьё время подошло, и рассчитать завершённые"""
+        now = now or time.time()
+        pending = await db.get_pending_events()
+        pending_ids = {e["event_id"] for e in pending}
+        for eid in list(self._next_poll):
+            if eid not in pending_ids:
+                self._forget(eid)
+
+        due = [e for e in pending if self.next_poll(e) <= now]
+        if not due:
+            return []
+
+        request = {}
+        if any(not e.get("sport_key") for e in due):
+            # Старые ставки без вида спорта — как раньше, по всем видам без фильтра
+            request = {sport_key: None for sport_key in SPORTS}
+        for e in due:
+            if e.get("sport_key") and request.get(e["sport_key"], ()) is not None:
+                request.setdefault(e["sport_key"], []).append(e["event_id"])
+
+        due_ids = {e["event_id"] for e in due}
+        scores = await get_scores(request)
+        outcomes = [
+            (s["id"], s["result"])
+            for s in scores
+            if s["id"] in due_ids and s.get("result")
+        ]
+        if outcomes:
+            with SETTLE_TIME.time():
+                summaries = await settle_outcomes(outcomes, self.message)
+            SETTLE_BETS.observe(sum(s["bets"] for s in summaries))
+        else:
+            summaries = []
+
+        settled_ids = {eid for eid, _ in outcomes}
+        for eid in due_ids:
+            if eid in settled_ids:
+                self._forget(eid)
+            else:
+                self._postpone(eid, now)
+        return summaries
+
+    def status(self):
+        """Состояние планировщика для отладки"""
+        now = time.time()
+        return [
+            {
+                "event_id": eid,
+                "next_poll_in": round(ts - now),
+                "attempts": self._attempts.get(eid, 0),
+            }
+            for eid, ts in sorted(self._next_poll.items(), key=lambda x: x[1])
+        ]
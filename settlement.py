@@ -0,0 +1,136 @@
+import time
+
+import database as db
+
+
+async def settle_outcomes(outcomes, message=None):
+    """Рассчитать ставки сразу по нескольким завершённым матчам одной транзакцией.
+
+    outcomes — [(event_id, result), ...]. Повторный вызов ничего не меняет:
+    берутся только ставки со статусом 'pending'.
+    Возвращает сводки по пользователям: сколько ставок, побед, выплата, профит,
+    детали по ставкам и обновлённая строка users.
+
+    message(сводка) — текст уведомления игроку или None. Уведомления пишутся в
+    outbox той же транзакцией, что и расчёт: рассчитанная ставка не останется
+    без уведомления, если процесс упадёт сразу после COMMIT. (id, текст) — в
+    сводке под ключом "notification".
+    """
+    outcomes = list(outcomes)
+    if not outcomes:
+        return []
+
+    async with db.get_pool().write() as conn:
+        await conn.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS settle_outcomes (event_id TEXT PRIMARY KEY, result TEXT)"
+        )
+        await conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS settle_bets (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER,
+                result TEXT,
+                amount REAL,
+                payout REAL
+            )
+        """)
+        await conn.execute("DELETE FROM settle_outcomes")
+        await conn.execute("DELETE FROM settle_bets")
+        await conn.executemany(
+            "INSERT OR REPLACE INTO settle_outcomes (event_id, result) VALUES (?, ?)",
+            outcomes
+        )
+
+        # Все ставки по матчам партии — одним запросом
+        await conn.execute("""
+            INSERT INTO settle_bets (id, user_id, result, amount, payout)
+            SELECT b.id, b.user_id,
+                   CASE WHEN b.pick = o.result THEN 'win' ELSE 'lose' END,
+                   b.amount,
+                   CASE WHEN b.pick = o.result THEN b.potential_win ELSE 0 END
+            FROM bets b
+            JOIN settle_outcomes o ON o.event_id = b.event_id
+            WHERE b.result = 'pending'
+        """)
+
+        await conn.execute("""
+            INSERT INTO ledger (user_id, kind, amount, ref, created_at)
+            SELECT user_id, 'win', payout, id, ? FROM settle_bets WHERE payout > 0
+        """, (time.time(),))
+
+        await conn.execute("""
+            UPDATE bets SET result = s.result
+            FROM settle_bets s
+            WHERE bets.id = s.id
+        """)
+
+        # Изменения баланса и статистики — одной агрегацией на пользователя
+        cursor = await conn.execute("""
+            UPDATE users SET
+                balance = balance + d.payout,
+                total_wins = total_wins + d.wins,
+                total_profit = total_profit + d.profit
+            FROM (
+                SELECT user_id,
+                       SUM(payout) AS payout,
+                       SUM(result = 'win') AS wins,
+                       SUM(payout - amount) AS profit
+                FROM settle_bets
+                GROUP BY user_id
+            ) AS d
+            WHERE users.user_id = d.user_id
+            RETURNING *
+        """)
+        users = {u["user_id"]: dict(u) for u in await cursor.fetchall()}
+
+        cursor = await conn.execute("""
+            SELECT s.id, s.user_id, s.result, s.amount, s.payout,
+                   b.event_id, b.event_title, b.pick_label
+            FROM settle_bets s
+            JOIN bets b ON b.id = s.id
+            ORDER BY s.user_id, s.id
+        """)
+        rows = await cursor.fetchall()
+        await conn.execute("DELETE FROM settle_outcomes")
+        await conn.execute("DELETE FROM settle_bets")
+
+        summaries = summarize(rows, users)
+        if message:
+            messages = [(s, message(s)) for s in summaries]
+            messages = [(s, text) for s, text in messages if text]
+            ids = await db.insert_notifications(conn, [(s["user_id"], text) for s, text in messages])
+            for nid, (s, text) in zip(ids, messages):
+                s["notification"] = (nid, text)
+
+    db.notify_user_change(users.values())
+    return summaries
+
+
+def summarize(rows, users):
+    """Сводки по пользователям из рассчитанных ставок"""
+    summaries = {}
+    for r in rows:
+        s = summaries.get(r["user_id"])
+        if s is None:
+            s = summaries[r["user_id"]] = {
+                "user_id": r["user_id"], "bets": 0, "wins": 0,
+                "payout": 0.0, "profit": 0.0, "details": [],
+                "user": users.get(r["user_id"]),
+            }
+        s["bets"] += 1
+        s["wins"] += r["result"] == "win"
+        s["payout"] += r["payout"]
+        s["profit"] += r["payout"] - r["amount"]
+        s["details"].append({
+            "bet_id": r["id"],
+            "event_id": r["event_id"],
+            "event_title": r["event_title"],
+            "pick_label": r["pick_label"],
+            "result": r["result"],
+            "amount": r["amount"],
+            "payout": r["payout"],
+        })
+
+    for s in summaries.values():
+        s["payout"] = round(s["payout"], 2)
+        s["profit"] = round(s["profit"], 2)
+    return list(summaries.values())
@@ -0,0 +1,77 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import database  # noqa: E402
+import odds_api  # noqa: E402
+from config import SPORTS  # noqa: E402
+
+
+def make_game(event_id, home, away, prices, start_in=86400):
+    """Матч в формате ответа /odds: один букмекер, prices — (П1, Ничья, П2)"""
+    home_price, draw_price, away_price = prices
+    return {
+        "id": event_id,
+        "sport_key": SPORTS[0],
+        "commence_time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + start_in)),
+        "home_team": home,
+        "away_team": away,
+        "bookmakers": [{"key": "book", "markets": [{"key": "h2h", "outcomes": [
+            {"name": home, "price": home_price},
+            {"name": "Draw", "price": draw_price},
+            {"name": away, "price": away_price},
+        ]}]}],
+    }
+
+
+@pytest.fixture
+def games():
+    """Лента заглушки The Odds API; тест может менять список до первой загрузки"""
+    return [make_game("g1", "Arsenal", "Chelsea", (2.0, 3.5, 4.0))]
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Своя БД на тест; кэш профилей — общий на процесс, его чистим"""
+    path = str(tmp_path / "test.db")
+    monkeypatch.setattr(database, "DB_PATH", path)
+    database.user_cache.clear()
+    return path
+
+
+@pytest.fixture
+def client(db_path, monkeypatch, games):
+    """TestClient сервера на своей БД и заглушке The Odds API — без сети"""
+    import server
+    from fastapi.testclient import TestClient
+    from event_cache import EventCache
+    from ledger import BalanceLedger
+    from odds_history import OddsHistory
+
+    monkeypatch.chdir(ROOT)
+
+    async def fetch(sport_key, event_ids=None):
+        if sport_key != SPORTS[0]:
+            return []
+        return [g for g in games if not event_ids or g["id"] in event_ids]
+
+    odds_client = odds_api.OddsClient()
+    odds_client._fetch_sport_odds = fetch
+    monkeypatch.setattr(odds_api, "client", odds_client)
+    # Состояние модуля server не должно переходить из теста в тест
+    cache = server.events_cache
+    monkeypatch.setattr(server, "events_cache", EventCache(
+        server.load_events, ttl=cache.ttl, retry_interval=cache.retry_interval, on_change=server.on_events_change))
+    monkeypatch.setattr(server, "balance_ledger", BalanceLedger())
+    monkeypatch.setattr(server, "odds_history", OddsHistory())
+    # asyncio.Event привязывается к первому циклу, а у каждого TestClient он свой
+    monkeypatch.setattr(server, "stopping", asyncio.Event())
+    with TestClient(server.app) as c:
+        c.get("/api/events")
+        yield c
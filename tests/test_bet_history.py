@@ -0,0 +1,100 @@
+import base64
+import random
+
+import pytest
+
+import database
+
+USER = 7
+RESULTS = ("pending", "win", "lose", "cashout")
+
+
+@pytest.fixture
+def bets(client):
+    """60 ставок игрока: по 4 на каждую секунду (равные created_at) и ставки другого игрока"""
+    rng = random.Random(1)
+    rows = []
+    for i in range(60):
+        created_at = f"2026-03-{1 + i // 20:02d} 12:00:{i // 4:02d}"
+        amount = float(rng.choice((10, 20, 50)))
+        rows.append((USER, f"e{i}", f"Match {i}", "team_a", "П1", 2.0, amount, amount * 2,
+                     rng.choice(RESULTS), created_at))
+    rows.append((USER + 1, "x", "Other", "team_a", "П1", 2.0, 10, 20, "pending", "2026-03-01 12:00:00"))
+
+    async def insert():
+        async with database.get_pool().write() as conn:
+            await conn.executemany(
+                """INSERT INTO bets (user_id, event_id, event_title, pick, pick_label, odds, amount,
+                potential_win, result, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", rows)
+            cursor = await conn.execute(
+                "SELECT id, result, created_at, amount, potential_win FROM bets WHERE user_id = ?", (USER,))
+            return [dict(r) for r in await cursor.fetchall()]
+    stored = client.portal.call(insert)
+    # Порядок выдачи: новые сверху, при равном времени — больший id выше
+    return sorted(stored, key=lambda b: (b["created_at"], b["id"]), reverse=True)
+
+
+def walk(client, limit, **params):
+    """Все страницы подряд: id ставок в порядке выдачи"""
+    ids, cursor, pages = [], None, 0
+    while True:
+        query = dict(params, limit=limit)
+        if cursor:
+            query["cursor"] = cursor
+        r = client.get(f"/api/bets/{USER}", params=query)
+        assert r.status_code == 200
+        page = r.json()
+        assert len(page["bets"]) <= limit
+        ids.extend(b["id"] for b in page["bets"])
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids, pages
+
+
+@pytest.mark.parametrize("limit", [1, 3, 4, 7, 60, 100])
+def test_pages_have_no_gaps_or_duplicates(client, bets, limit):
+    ids, pages = walk(client, limit)
+    assert ids == [b["id"] for b in bets]
+    assert pages == max(1, -(-len(bets) // limit))
+
+
+@pytest.mark.parametrize("result", RESULTS)
+def test_result_filter_with_cursor(client, bets, result):
+    ids, _ = walk(client, 3, result=result)
+    assert ids == [b["id"] for b in bets if b["result"] == result]
+
+
+def test_time_filters_with_cursor(client, bets):
+    ids, _ = walk(client, 4, since="2026-03-02", until="2026-03-03")
+    assert ids == [b["id"] for b in bets if "2026-03-02" <= b["created_at"] < "2026-03-03"]
+    assert ids
+    # Время с часовым поясом переводится в UTC
+    ids, _ = walk(client, 5, since="2026-03-01T15:00:10+03:00", result="win")
+    assert ids == [b["id"] for b in bets if b["created_at"] >= "2026-03-01 12:00:10" and b["result"] == "win"]
+
+
+@pytest.mark.parametrize("cursor", [
+    "###",
+    "not-base64!",
+    base64.urlsafe_b64encode(b"no separator").decode(),
+    base64.urlsafe_b64encode(b"2026-03-01 12:00:00|abc").decode(),
+    base64.urlsafe_b64encode(b"\xff\xfe|1").decode(),
+])
+def test_malformed_cursor(client, bets, cursor):
+    assert client.get(f"/api/bets/{USER}", params={"cursor": cursor}).status_code == 400
+
+
+def test_bad_filters(client, bets):
+    assert client.get(f"/api/bets/{USER}", params={"result": "maybe"}).status_code == 400
+    assert client.get(f"/api/bets/{USER}", params={"since": "yesterday"}).status_code == 400
+
+
+def test_summary(client, bets):
+    pending = [b for b in bets if b["result"] == "pending"]
+    assert client.get(f"/api/bets/{USER}/summary").json() == {
+        "pending": len(pending),
+        "exposure": round(sum(b["amount"] for b in pending), 2),
+        "potential_win": round(sum(b["potential_win"] for b in pending), 2),
+    }
+    assert client.get("/api/bets/999/summary").json() == {"pending": 0, "exposure": 0, "potential_win": 0}
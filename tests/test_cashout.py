@@ -0,0 +1,49 @@
+import database
+from cashout import CashoutPricer
+
+
+def test_pricer_caps_bet_odds_at_offered():
+    pricer = CashoutPricer(lambda event_id, pick: (0.45, 2.0), margin=0.05)
+    bet = {"event_id": "g1", "pick": "team_a", "amount": 100, "odds": 1000}
+    fair = 100 * 2.0 * 0.45 * 0.95
+    assert pricer.price_one(bet) <= fair
+    # Ставка ниже рынка оценивается по своему коэффициенту
+    assert pricer.price_one(dict(bet, odds=1.5)) <= 100 * 1.5 * 0.45 * 0.95
+
+
+def test_bet_odds_come_from_feed(client):
+    bet = {"user_id": 1, "event_id": "g1", "event_title": "x", "pick": "team_a",
+           "pick_label": "П1", "amount": 100}
+    client.get("/api/user/1")
+    assert client.post("/api/bet", json=dict(bet, odds=1000)).status_code == 400
+    assert client.post("/api/bet", json=dict(bet, event_id="nope", odds=2.0)).status_code == 400
+    r = client.post("/api/bet", json=dict(bet, odds=2.0))
+    assert r.status_code == 200
+    assert r.json()["bet"]["odds"] == 2.0
+
+
+def test_inflated_bet_cannot_cash_out_above_fair_value(client):
+    client.get("/api/user/2")
+    r = client.post("/api/bet", json={"user_id": 2, "event_id": "g1", "event_title": "x", "pick": "team_a",
+                                      "pick_label": "П1", "odds": 2.0, "amount": 100})
+    assert r.status_code == 200
+
+    # Ставка, попавшая в базу с завышенным коэффициентом (например, до проверки на сервере)
+    async def inflate():
+        async with database.get_pool().write() as conn:
+            await conn.execute("UPDATE bets SET odds = 1000, potential_win = 100000 WHERE user_id = 2")
+    client.portal.call(inflate)
+
+    quotes = client.get("/api/cashout/quotes", params={"user_id": 2}).json()["quotes"]
+    assert len(quotes) == 1
+    # Справедливая стоимость: сумма × коэффициент ленты × вероятность (не выше 1/коэффициент)
+    assert quotes[0]["amount"] <= 100
+    r = client.post("/api/cashout", json={"user_id": 2, "bet_id": quotes[0]["bet_id"]})
+    assert r.status_code == 200
+    assert r.json()["cashout"]["cashout_amount"] <= 100
+    assert client.get("/api/user/2").json()["balance"] <= 1000
+
+
+def test_pricer_skips_unpriceable_bets():
+    pricer = CashoutPricer(lambda event_id, pick: None)
+    assert pricer.quotes([{"id": 1, "user_id": 1, "event_id": "g1", "pick": "draw", "amount": 10, "odds": 3}]) == []
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import database
+
+
+async def tamper(user_id, balance):
+    """Баланс, разошедшийся с журналом, как после сбоя посреди записи"""
+    async with database.get_pool().write() as conn:
+        await conn.execute("UPDATE users SET balance = ? WHERE user_id = ?", (balance, user_id))
+
+
+async def balance(user_id):
+    async with database.get_pool().read() as conn:
+        cursor = await conn.execute("SELECT balance FROM users WHERE user_id = ?", (user_id,))
+        return (await cursor.fetchone())[0]
+
+
+async def register(pid):
+    async with database.get_pool().write() as conn:
+        await conn.execute("INSERT INTO meta (key, value) VALUES (?, '0')", (database._running_key(pid),))
+
+
+async def running():
+    async with database.get_pool().read() as conn:
+        cursor = await conn.execute("SELECT key FROM meta WHERE key LIKE 'running:%' ORDER BY key")
+        return [r[0] for r in await cursor.fetchall()]
+
+
+def test_peer_crash_after_clean_shutdown_is_recovered(db_path):
+    peer = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+
+    async def run():
+        await database.init_db()
+        await database.get_or_create_user(1)
+        await register(peer.pid)
+        await database.close_db()
+        # Мы закрылись чисто, соседний воркер ещё работает
+        await database.init_db()
+        await tamper(1, 5.0)
+        await database.close_db()
+        await database.init_db()
+        assert await balance(1) == 5.0
+        assert set(await running()) == {database._running_key(peer.pid), database._running_key(os.getpid())}
+        await database.close_db()
+
+        # Сосед падает, не закрыв базу: следующий запуск сверяет балансы
+        peer.kill()
+        peer.wait()
+        await database.init_db()
+        try:
+            assert await balance(1) == database.START_BALANCE
+            assert await running() == [database._running_key(os.getpid())]
+        finally:
+            await database.close_db()
+
+    try:
+        asyncio.run(run())
+    finally:
+        peer.kill()
+        peer.wait()
+
+
+def test_own_crash_is_recovered(db_path):
+    async def run():
+        await database.init_db()
+        await database.get_or_create_user(1)
+        await tamper(1, 5.0)
+        # Процесс упал: close_db не вызван, строка running осталась
+        pool, database._pool = database._pool, None
+        await pool.close()
+
+        await database.init_db()
+        try:
+            assert await balance(1) == database.START_BALANCE
+        finally:
+            await database.close_db()
+        await database.init_db()
+        try:
+            assert await running() == [database._running_key(os.getpid())]
+        finally:
+            await database.close_db()
+
+    asyncio.run(run())
+
+
+def test_legacy_flag_triggers_recovery(db_path):
+    async def run():
+        await database.init_db()
+        await database.get_or_create_user(1)
+        await tamper(1, 5.0)
+        async with database.get_pool().write() as conn:
+            await conn.execute("INSERT INTO meta (key, value) VALUES ('clean_shutdown', '0')")
+        await database.close_db()
+
+        await database.init_db()
+        try:
+            assert await balance(1) == database.START_BALANCE
+            async with database.get_pool().read() as conn:
+                cursor = await conn.execute("SELECT 1 FROM meta WHERE key = 'clean_shutdown'")
+                assert await cursor.fetchone() is None
+        finally:
+            await database.close_db()
+
+    asyncio.run(run())
@@ -0,0 +1,218 @@
+import asyncio
+import time
+
+from event_cache import EventCache
+from models import Event
+
+
+def event(event_id, category="football", odds_a=2.0):
+    return Event(id=event_id, title=f"{event_id} home vs away", league="League", sport_key="soccer_epl",
+                 category=category, team_a="Home", team_b="Away", odds_a=odds_a, odds_draw=3.4, odds_b=3.0,
+                 commence_time="2030-01-01T00:00:00Z")
+
+
+class FakeLoader:
+    """Загрузчик для EventCache: считает вызовы и держит их до release()"""
+
+    def __init__(self, events, blocked=False):
+        self.events = events
+        self.calls = 0
+        self.fail = False
+        self.gate = asyncio.Event()
+        if not blocked:
+            self.gate.set()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.gate.wait()
+        if self.fail:
+            return None
+        return list(self.events), time.time()
+
+    def release(self):
+        self.gate.set()
+
+
+def test_single_flight_first_load():
+    async def run():
+        loader = FakeLoader([event("a"), event("b")], blocked=True)
+        cache = EventCache(loader, ttl=60, retry_interval=0)
+        waiting = [asyncio.create_task(cache.get()) for _ in range(20)]
+        await asyncio.sleep(0)
+        loader.release()
+        results = await asyncio.gather(*waiting)
+        assert loader.calls == 1
+        assert all([e.id for e in r] == ["a", "b"] for r in results)
+        # Свежий кэш не ходит в загрузчик
+        await cache.get()
+        assert loader.calls == 1
+
+    asyncio.run(run())
+
+
+def test_stale_while_revalidate():
+    async def run():
+        loader = FakeLoader([event("a")])
+        cache = EventCache(loader, ttl=60, retry_interval=0)
+        await cache.get()
+        # Данные устарели: отдаём старые сразу, обновляет одна фоновая задача
+        cache.updated -= 120
+        loader.gate.clear()
+        loader.events = [event("a", odds_a=2.5)]
+        results = await asyncio.gather(*(cache.get() for _ in range(10)))
+        assert all(r[0].odds_a == 2.0 for r in results)
+        assert cache.is_refreshing and loader.calls == 2
+        loader.release()
+        await cache.refresh()
+        assert loader.calls == 2
+        assert (await cache.get())[0].odds_a == 2.5
+        assert cache.is_fresh
+
+    asyncio.run(run())
+
+
+def test_failed_refresh_keeps_data_and_waits_retry_interval():
+    async def run():
+        loader = FakeLoader([event("a")])
+        cache = EventCache(loader, ttl=60, retry_interval=30)
+        await cache.get()
+        cache.updated -= 120
+        cache.last_attempt = 0
+        loader.fail = True
+        await cache.get()
+        await cache.refresh()
+        assert loader.calls == 2
+        assert [e.id for e in cache.events] == ["a"]
+        # Неудачная попытка была только что — следующая не раньше retry_interval
+        for _ in range(5):
+            await cache.get()
+        assert loader.calls == 2
+        assert not cache.is_fresh
+
+    asyncio.run(run())
+
+
+def test_concurrent_refresh_shares_one_load():
+    async def run():
+        loader = FakeLoader([event("a")], blocked=True)
+        cache = EventCache(loader, ttl=60, retry_interval=0)
+        waiting = asyncio.gather(*(cache.refresh() for _ in range(5)))
+        await asyncio.sleep(0)
+        loader.release()
+        await waiting
+        assert loader.calls == 1
+
+    asyncio.run(run())
+
+
+def test_etag_per_category():
+    async def run():
+        loader = FakeLoader([event("f1"), event("f2"), event("b1", "basketball")])
+        cache = EventCache(loader, ttl=60, retry_interval=0)
+        await cache.refresh()
+        tags = {cat: cache.response(cat)[1] for cat in ("all", "football", "basketball")}
+        assert len(set(tags.values())) == 3
+        body, _ = cache.response("football")
+        assert body.count(b'"id"') == 2
+
+        # Без изменений ответы и теги те же
+        await cache.refresh()
+        assert {cat: cache.response(cat)[1] for cat in tags} == tags
+
+        # Изменилось баскетбольное событие — футбольный тег прежний
+        loader.events = [event("f1"), event("f2"), event("b1", "basketball", odds_a=1.8)]
+        await cache.refresh()
+        assert cache.response("football")[1] == tags["football"]
+        assert cache.response("basketball")[1] != tags["basketball"]
+        assert cache.response("all")[1] != tags["all"]
+        # Неизвестная категория — пустой список
+        assert cache.response("cricket")[0] == b'{"events":[],"total":0}'
+
+    asyncio.run(run())
+
+
+def test_etag_matches():
+    from event_cache import etag_matches
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc"', '"abc"')
+    assert etag_matches('"x", W/"abc"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abcd"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+    assert not etag_matches("", '"abc"')
+
+
+def test_not_modified_over_http(client):
+    r = client.get("/api/events")
+    category = r.json()["events"][0]["category"]
+    for sport in ("all", category):
+        r = client.get("/api/events", params={"sport": sport})
+        assert r.status_code == 200
+        etag = r.headers["etag"]
+        r = client.get("/api/events", params={"sport": sport}, headers={"If-None-Match": etag})
+        assert r.status_code == 304
+        assert r.content == b""
+        assert r.headers["etag"] == etag
+        r = client.get("/api/events", params={"sport": sport}, headers={"If-None-Match": f'W/{etag}'})
+        assert r.status_code == 304
+        r = client.get("/api/events", params={"sport": sport}, headers={"If-None-Match": '"stale"'})
+        assert r.status_code == 200
+        assert r.json()["events"]
+
+
+def test_diff_events():
+    from event_cache import diff_events, has_changes
+    changes, hashes = diff_events({}, [event("a"), event("b")])
+    assert [e.id for e in changes["added"]] == ["a", "b"]
+    assert [r[0] for r in changes["rows"]] == ["a", "b"]
+
+    same, same_hashes = diff_events(hashes, [event("b"), event("a")])
+    assert not has_changes(same) and not same["rows"]
+    assert same_hashes == hashes
+
+    changes, _ = diff_events(hashes, [event("a", odds_a=2.2), event("c")])
+    assert [e.id for e in changes["added"]] == ["c"]
+    assert [e.id for e in changes["changed"]] == ["a"]
+    assert changes["removed"] == ["b"]
+    assert sorted(r[0] for r in changes["rows"]) == ["a", "c"]
+
+
+def test_changes_persisted_to_cached_events(db_path):
+    import database
+
+    async def persist(changes):
+        persisted.append(await database.save_event_changes(changes))
+
+    async def snapshot():
+        events, _ = await database.get_cached_events()
+        return {e.id: e.odds_a for e in events or []}
+
+    async def run():
+        await database.init_db()
+        try:
+            loader = FakeLoader([event("a"), event("b"), event("c")])
+            cache = EventCache(loader, ttl=60, retry_interval=0, on_change=persist)
+            cache.seed(await database.get_cached_hashes())
+            await cache.refresh()
+            assert persisted[-1] == {"added": 3, "changed": 0, "removed": 0}
+
+            loader.events = [event("a", odds_a=1.9), event("c"), event("d")]
+            await cache.refresh()
+            assert persisted[-1] == {"added": 1, "changed": 1, "removed": 1}
+            assert await snapshot() == {"a": 1.9, "c": 2.0, "d": 2.0}
+
+            # Ничего не изменилось — в БД не пишем
+            await cache.refresh()
+            assert len(persisted) == 2
+
+            # После перезапуска базовый снимок — хэши из cached_events
+            restarted = EventCache(loader, ttl=60, retry_interval=0, on_change=persist)
+            restarted.seed(await database.get_cached_hashes())
+            await restarted.refresh()
+            assert len(persisted) == 2
+            assert [e.id for e in restarted.events] == ["a", "c", "d"]
+        finally:
+            await database.close_db()
+
+    persisted = []
+    asyncio.run(run())
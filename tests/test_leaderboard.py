@@ -0,0 +1,61 @@
+import asyncio
+import json
+import random
+
+import pytest
+
+import database
+from leaderboard import Leaderboard
+
+USERS = 200
+
+
+async def expected_top(limit):
+    async with database.get_pool().read() as conn:
+        cursor = await conn.execute(
+            "SELECT user_id, username, balance, total_bets, total_wins FROM users "
+            "ORDER BY balance DESC, user_id LIMIT ?", (limit,))
+        return [dict(r) for r in await cursor.fetchall()]
+
+
+async def set_balance(board, user_id, balance):
+    async with database.get_pool().write() as conn:
+        cursor = await conn.execute("UPDATE users SET balance = ? WHERE user_id = ? RETURNING *", (balance, user_id))
+        row = dict(await cursor.fetchone())
+    board.update(row)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_top_and_rank_match_database(db_path, seed):
+    rng = random.Random(seed)
+    # Узкий диапазон балансов — много равенств, в том числе на границе таблицы
+    balance = lambda: float(rng.randint(0, 40) * 25)  # noqa: E731
+
+    async def run():
+        await database.init_db()
+        try:
+            async with database.get_pool().write() as conn:
+                await conn.executemany("INSERT INTO users (user_id, username, balance) VALUES (?, ?, ?)",
+                                       [(uid, f"u{uid}", balance()) for uid in range(1, USERS + 1)])
+            board = Leaderboard(size=5, spare=10)
+            await board.load()
+            for step in range(400):
+                if rng.random() < 0.3:
+                    # Игрок из топа уходит вниз — таблицу придётся добирать из БД
+                    top = board.top()
+                    uid = rng.choice(top)["user_id"] if top else rng.randint(1, USERS)
+                    await set_balance(board, uid, 0.0)
+                else:
+                    await set_balance(board, rng.randint(1, USERS), balance())
+                if step % 10 == 0:
+                    got = json.loads(await board.response())["leaderboard"]
+                    assert got == await expected_top(board.size)
+                    assert board.top(len(board.rows)) == (await expected_top(len(board.rows)))
+                    uid = rng.randint(1, USERS)
+                    everyone = await expected_top(USERS)
+                    rank = next(i for i, r in enumerate(everyone, start=1) if r["user_id"] == uid)
+                    assert (await board.rank(uid))["rank"] == rank
+        finally:
+            await database.close_db()
+
+    asyncio.run(run())
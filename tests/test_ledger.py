@@ -0,0 +1,63 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+import database
+from ledger import BalanceLedger
+
+
+async def ledger_rows(user_id):
+    async with database.get_pool().read() as conn:
+        cursor = await conn.execute("SELECT kind, amount FROM ledger WHERE user_id = ? AND kind != 'opening'", (user_id,))
+        return [tuple(row) for row in await cursor.fetchall()]
+
+
+def test_poisoned_entry_does_not_block_queue(db_path):
+    async def run():
+        await database.init_db()
+        await database.get_or_create_user(1)
+        start = await database.get_balance(1)
+        ledger = BalanceLedger()
+        await ledger.start()
+        try:
+            await ledger.play(1, 10, 0, ref="dice")
+            # NaN в SQLite пишется как NULL — NOT NULL на ledger.amount отвергает всю пачку
+            ledger._enqueue(1, "quick_win", float("nan"), "dice")
+            await ledger.play(1, 10, 30, ref="dice")
+            assert await ledger.flush(5)
+            assert await ledger_rows(1) == [("quick_bet", -10), ("quick_bet", -10), ("quick_win", 30)]
+            assert len(ledger.rejected) == 1
+            assert await database.get_balance(1, cached=False) == start + 10
+            assert await ledger.balance(1) == start + 10
+        finally:
+            await ledger.stop()
+            await database.close_db()
+
+    asyncio.run(run())
+
+
+def test_flush_is_bounded(db_path, monkeypatch):
+    async def run():
+        await database.init_db()
+        await database.get_or_create_user(1)
+        ledger = BalanceLedger(stop_timeout=0.2)
+        await ledger.start()
+
+        async def locked(entries):
+            raise sqlite3.OperationalError("database is locked")
+        monkeypatch.setattr(database, "append_ledger", locked)
+        try:
+            await ledger.play(1, 10, 0)
+            assert not await ledger.flush(0.2)
+        finally:
+            await ledger.stop()
+            await database.close_db()
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("stake", [float("nan"), float("inf"), -10])
+def test_play_rejects_bad_stake(stake):
+    with pytest.raises(ValueError):
+        asyncio.run(BalanceLedger().play(1, stake, 0))
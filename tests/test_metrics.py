@@ -0,0 +1,37 @@
+import asyncio
+
+import database
+import metrics
+
+
+def db_calls():
+    """{function: число наблюдений} из db_query_duration_seconds"""
+    counts = {}
+    for line in metrics.render().splitlines():
+        if line.startswith("db_query_duration_seconds_count{"):
+            labels, value = line.rsplit(" ", 1)
+            counts[labels.split('function="')[1].split('"')[0]] = float(value)
+    return counts
+
+
+def test_cache_hits_not_timed_as_queries(db_path):
+    async def run():
+        await database.init_db()
+        try:
+            await database.get_or_create_user(1)
+            before = db_calls()
+            for _ in range(50):
+                assert await database.get_balance(1) == database.START_BALANCE
+                await database.get_or_create_user(1)
+            after = db_calls()
+            # Всё из user_cache — SQLite не трогали, наблюдений не прибавилось
+            assert after == before
+            assert "get_balance" not in after and "get_or_create_user" not in after
+
+            # Мимо кэша — одно наблюдение на запрос
+            await database.get_balance(1, cached=False)
+            assert db_calls()["fetch_user"] == after.get("fetch_user", 0) + 1
+        finally:
+            await database.close_db()
+
+    asyncio.run(run())
@@ -0,0 +1,100 @@
+import asyncio
+import sqlite3
+
+import database
+
+# Схема до миграций — как её создавал init_db первой версии
+BASELINE = """
+CREATE TABLE users (
+    user_id INTEGER PRIMARY KEY,
+    username TEXT,
+    balance REAL DEFAULT 1000,
+    total_bets INTEGER DEFAULT 0,
+    total_wins INTEGER DEFAULT 0,
+    total_profit REAL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE bets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    event_id TEXT,
+    event_title TEXT,
+    pick TEXT,
+    pick_label TEXT,
+    odds REAL,
+    amount REAL,
+    potential_win REAL,
+    result TEXT DEFAULT 'pending',
+    cashout_available INTEGER DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE cached_events (
+    id TEXT PRIMARY KEY,
+    data TEXT,
+    updated_at REAL
+);
+"""
+
+USERS = [(1, "alice", 1250.0, 3, 1, 250.0), (2, "bob", 400.0, 2, 0, -600.0)]
+BETS = [
+    (1, "e1", "A vs B", "team_a", "П1", 2.5, 100, 250, "win", "2024-05-01 10:00:00"),
+    (1, "e2", "C vs D", "draw", "Ничья", 3.0, 50, 150, "pending", "2024-05-02 10:00:00"),
+    (2, "e1", "A vs B", "team_b", "П2", 2.8, 600, 1680, "lose", "2024-05-01 11:00:00"),
+]
+
+
+def make_baseline(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE)
+    conn.executemany("""INSERT INTO users (user_id, username, balance, total_bets, total_wins, total_profit)
+        VALUES (?, ?, ?, ?, ?, ?)""", USERS)
+    conn.executemany("""INSERT INTO bets (user_id, event_id, event_title, pick, pick_label, odds, amount,
+        potential_win, result, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", BETS)
+    conn.execute("INSERT INTO cached_events (id, data, updated_at) VALUES ('e2', '{}', 1)")
+    conn.commit()
+    conn.close()
+
+
+def test_baseline_database_upgrades(db_path):
+    make_baseline(db_path)
+
+    async def run():
+        await database.init_db()
+        try:
+            async with database.get_pool().read() as conn:
+                cursor = await conn.execute("PRAGMA user_version")
+                assert (await cursor.fetchone())[0] == len(database.MIGRATIONS)
+                cursor = await conn.execute(
+                    "SELECT user_id, username, balance, total_bets, total_wins, total_profit FROM users ORDER BY user_id")
+                assert [tuple(r) for r in await cursor.fetchall()] == USERS
+                cursor = await conn.execute(
+                    """SELECT user_id, event_id, event_title, pick, pick_label, odds, amount, potential_win, result,
+                    created_at, sport_key, commence_time FROM bets ORDER BY id""")
+                assert [tuple(r) for r in await cursor.fetchall()] == [b + (None, None) for b in BETS]
+                # Журнал начинается с входящих остатков — его сумма равна балансу
+                cursor = await conn.execute("SELECT user_id, SUM(amount) FROM ledger GROUP BY user_id ORDER BY user_id")
+                assert [tuple(r) for r in await cursor.fetchall()] == [(u[0], u[2]) for u in USERS]
+                cursor = await conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'")
+                indexes = {r[0] for r in await cursor.fetchall()}
+            assert {"idx_bets_user_created", "idx_bets_pending_event", "idx_users_balance", "idx_ledger_user",
+                    "idx_odds_history_last", "idx_bets_user_result_created"} <= indexes
+            plans = await database.check_query_plans()
+            assert all(uses_index for _, uses_index in plans.values()), plans
+
+            # Старые ставки видны в истории и в сводке
+            bets, _ = await database.get_user_bets(1)
+            assert [b.result for b in bets] == ["pending", "win"]
+            assert (await database.get_bets_summary(1))["pending"] == 1
+        finally:
+            await database.close_db()
+
+        # Повторный запуск ничего не мигрирует и не дублирует журнал
+        await database.init_db()
+        try:
+            async with database.get_pool().read() as conn:
+                cursor = await conn.execute("SELECT COUNT(*) FROM ledger")
+                assert (await cursor.fetchone())[0] == len(USERS)
+        finally:
+            await database.close_db()
+
+    asyncio.run(run())
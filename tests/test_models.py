@@ -0,0 +1,20 @@
+import json
+
+from models import Event, EVENT_FIELDS
+
+EVENT = Event("g1", "Arsenal vs Chelsea", "🏴 Премьер-Лига", "soccer_epl", "football",
+              "Arsenal", "Chelsea", 2.0, 3.5, 4.0, "2030-01-01T12:00:00Z")
+
+
+def test_json_round_trip():
+    assert json.loads(EVENT.to_json()) == EVENT.to_dict()
+    assert Event.from_json(EVENT.to_json()) == EVENT
+
+
+def test_from_dict_any_key_order_and_extra_keys():
+    data = EVENT.to_dict()
+    assert Event.from_dict(dict(reversed(data.items()))) == EVENT
+    assert Event.from_dict({**data, "bookmaker": "x"}) == EVENT
+    # status по умолчанию, если его нет в старой записи
+    old = {f: data[f] for f in EVENT_FIELDS if f != "status"}
+    assert Event.from_dict(old) == EVENT
@@ -0,0 +1,73 @@
+import asyncio
+import random
+
+import database
+from models import Event
+from odds_history import OddsHistory, encode_points, decode_points, downsample
+
+T0 = 1700000000
+
+
+def event(odds_a=2.0, odds_draw=3.4, odds_b=3.0):
+    return Event(id="g1", title="Arsenal vs Chelsea", league="EPL", sport_key="soccer_epl", category="football",
+                 team_a="Arsenal", team_b="Chelsea", odds_a=odds_a, odds_draw=odds_draw, odds_b=odds_b,
+                 commence_time="2030-01-01T00:00:00Z")
+
+
+def test_encode_decode_round_trip():
+    rng = random.Random(3)
+    for _ in range(50):
+        t, points = T0, []
+        for _ in range(rng.randint(1, 200)):
+            # Большие скачки времени и цены в обе стороны — многобайтные varint
+            t += rng.choice((0, 1, 127, 128, 300, 20000, 10 ** 6))
+            points.append((t, rng.choice((101, 150, 199, 200, 5000, 100000))))
+        assert decode_points(T0, encode_points(points, T0)) == points
+    assert decode_points(T0, b"") == []
+
+
+def test_downsample_keeps_last_price_per_step():
+    points = [(0, 200), (10, 210), (59, 205), (60, 205), (70, 220), (200, 220), (250, 230)]
+    # Последняя цена в каждом интервале; подряд одинаковые — одной точкой
+    assert downsample(points, 60) == [(59, 205), (70, 220), (250, 230)]
+
+
+def run(coro):
+    async def wrapper():
+        await database.init_db()
+        try:
+            return await coro()
+        finally:
+            await database.close_db()
+    return asyncio.run(wrapper())
+
+
+async def stored_points():
+    async with database.get_pool().read() as conn:
+        cursor = await conn.execute("SELECT SUM(points) FROM odds_history")
+        return (await cursor.fetchone())[0]
+
+
+def test_unchanged_prices_not_written_after_compaction(db_path):
+    async def scenario():
+        history = OddsHistory(raw_age=100, step=60, chunk_span=10 ** 6)
+        assert await history.record([event()], now=T0) == 3
+        assert await history.record([event(odds_a=2.1)], now=T0 + 30) == 1
+        # Всё сырое старше raw_age прорежено, в том числе открытые куски
+        await history.compact(now=T0 + 500)
+        assert await history.record([event(odds_a=2.1)], now=T0 + 600) == 0
+        points = await stored_points()
+
+        # После перезапуска последняя цена берётся из прореженного куска
+        restarted = OddsHistory(raw_age=100, step=60, chunk_span=10 ** 6)
+        assert await restarted.record([event(odds_a=2.1)], now=T0 + 700) == 0
+        assert await stored_points() == points
+
+        # Изменение пишется новым сырым куском и продолжает ряд
+        assert await restarted.record([event(odds_a=2.1, odds_b=2.9)], now=T0 + 800) == 1
+        series = await restarted.series("g1")
+        assert series["team_b"] == [[T0, 3.0], [T0 + 800, 2.9]]
+        assert series["team_a"] == [[T0 + 30, 2.1]]
+        assert series["draw"] == [[T0, 3.4]]
+
+    run(scenario)
@@ -0,0 +1,61 @@
+import pytest
+
+import odds_table
+from odds_table import OddsTable
+
+
+def book(key, h2h, total=None, spread=None):
+    markets = [{"key": "h2h", "outcomes": [
+        {"name": name, "price": price} for name, price in zip(("Arsenal", "Draw", "Chelsea"), h2h)
+    ]}]
+    if total:
+        markets.append({"key": "totals", "outcomes": [
+            {"name": "Over", "price": total[1], "point": total[0]},
+            {"name": "Under", "price": total[2], "point": total[0]},
+        ]})
+    if spread:
+        markets.append({"key": "spreads", "outcomes": [
+            {"name": "Arsenal", "price": spread[1], "point": spread[0]},
+            {"name": "Chelsea", "price": spread[2], "point": -spread[0]},
+        ]})
+    return {"key": key, "markets": markets}
+
+
+GAMES = [
+    {"id": "g1", "home_team": "Arsenal", "away_team": "Chelsea", "commence_time": "2030-01-01T00:00:00Z",
+     "bookmakers": [
+         book("a", (2.0, 3.4, 4.0), (2.5, 1.9, 1.9), (-0.5, 1.95, 1.85)),
+         book("b", (2.1, 3.3, 3.8), (2.5, 1.95, 1.85)),
+         # Другая линия тотала — в расчёт тотала не идёт
+         book("c", (1.9, 3.5, 4.2), (3.5, 2.4, 1.55)),
+         # Не все исходы h2h — букмекер в h2h не учитывается
+         book("d", (5.0, 3.0)),
+     ]},
+    {"id": "g2", "home_team": "Arsenal", "away_team": "Chelsea", "commence_time": "2030-01-02T00:00:00Z",
+     "bookmakers": [book("a", (1.5, 4.0, 6.0))]},
+]
+
+
+def compute():
+    table = OddsTable()
+    table.add_games("soccer_epl", GAMES)
+    return table.compute().summaries()
+
+
+def test_python_backend(monkeypatch):
+    monkeypatch.setattr(odds_table, "np", None)
+    h2h = compute()["g1"]["h2h"]
+    assert h2h["books"] == 3
+    assert h2h["outcomes"]["a"]["best"] == 2.1
+    assert h2h["outcomes"]["b"]["best"] == 4.2
+    totals = compute()["g1"]["totals"]
+    assert totals["line"] == 2.5
+    assert totals["books"] == 2
+
+
+def test_backends_match(monkeypatch):
+    numpy = pytest.importorskip("numpy")
+    monkeypatch.setattr(odds_table, "np", numpy)
+    with_numpy = compute()
+    monkeypatch.setattr(odds_table, "np", None)
+    assert with_numpy == compute()
@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from quick_games import GAMES, MAX_PICKS, MAX_ROUNDS, QuickGameEngine, QuickGameError, rtp_report
+
+
+def test_reported_rtp_matches_payout_tables():
+    report = rtp_report()
+    for game, table in GAMES.items():
+        for pick, payouts in table["picks"].items():
+            # Перебор исходов: каждый равновероятен
+            expected = sum(payouts.get(o, 0) for o in table["outcomes"]) / len(table["outcomes"])
+            assert report[game]["picks"][pick] == round(expected, 4)
+        assert report[game]["min"] == min(report[game]["picks"].values())
+        assert report[game]["max"] == max(report[game]["picks"].values())
+        assert report[game]["max"] < 1
+
+
+@pytest.mark.parametrize("game,pick", [("coinflip", "heads"), ("dice", "low"), ("dice", "6"), ("roulette", "red")])
+def test_played_rtp_close_to_reported(game, pick):
+    engine = QuickGameEngine(random.Random(42))
+    _, stake, winnings = engine.play(game, [pick], 1, rounds=MAX_ROUNDS)
+    total_stake, total_win = stake, winnings
+    for _ in range(599):
+        _, stake, winnings = engine.play(game, [pick], 1, rounds=MAX_ROUNDS)
+        total_stake += stake
+        total_win += winnings
+    assert total_win / total_stake == pytest.approx(rtp_report()[game]["picks"][pick], abs=0.03)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_batch_equals_single_plays(seed):
+    picks = ["red", "black", "green"]
+    batch = QuickGameEngine(random.Random(seed))
+    rounds, stake, winnings = batch.play("roulette", picks, 10, rounds=50)
+
+    single = QuickGameEngine(random.Random(seed))
+    plays = [single.play("roulette", picks, 10) for _ in range(50)]
+    assert [r["result"] for r in rounds] == [p[0][0]["result"] for p in plays]
+    assert stake == sum(p[1] for p in plays) == 10 * len(picks) * 50
+    assert winnings == pytest.approx(sum(p[2] for p in plays))
+
+
+def test_same_seed_same_results():
+    a = QuickGameEngine(random.Random(7)).play("dice", ["1", "high"], 25, rounds=20)
+    b = QuickGameEngine(random.Random(7)).play("dice", ["1", "high"], 25, rounds=20)
+    assert a == b
+
+
+@pytest.mark.parametrize("game,picks,rounds", [
+    ("poker", ["heads"], 1),
+    ("coinflip", [], 1),
+    ("coinflip", ["heads"] * (MAX_PICKS + 1), 1),
+    ("coinflip", ["edge"], 1),
+    ("coinflip", ["heads"], 0),
+    ("coinflip", ["heads"], MAX_ROUNDS + 1),
+])
+def test_limits(game, picks, rounds):
+    with pytest.raises(QuickGameError):
+        QuickGameEngine(random.Random(1)).play(game, picks, 10, rounds)
+
+
+def test_limits_inclusive():
+    rounds, stake, _ = QuickGameEngine(random.Random(1)).play("coinflip", ["heads"] * MAX_PICKS, 10, MAX_ROUNDS)
+    assert len(rounds) == MAX_ROUNDS
+    assert stake == 10 * MAX_PICKS * MAX_ROUNDS
+
+
+def test_batch_limits_over_api(client):
+    client.get("/api/user/1")
+    payload = {"user_id": 1, "game": "coinflip", "picks": ["heads"], "amount": 10}
+    assert client.post("/api/quick-bet/batch", json=dict(payload, rounds=MAX_ROUNDS + 1)).status_code == 400
+    assert client.post("/api/quick-bet/batch", json=dict(payload, picks=[])).status_code == 400
+    assert client.post("/api/quick-bet/batch", json=dict(payload, rounds=3)).status_code == 200
@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+
+from refresh_planner import EVENT_IDS_PER_REQUEST, FULL_INTERVAL, RefreshPlanner
+
+NOW = 1800000000
+
+
+def kickoffs(**offsets):
+    """{"soccer": {event_id: время начала}}; offsets — секунды до начала от NOW"""
+    return {"soccer": {eid: NOW + offset for eid, offset in offsets.items()}}
+
+
+def game(eid, odds_a):
+    return SimpleNamespace(id=eid, odds_a=odds_a, odds_draw=3.0, odds_b=3.0)
+
+
+def intervals(planner, plan):
+    return {tuple(g["event_ids"] or ()): g["interval"] for g in planner.plan(plan, NOW)}
+
+
+def test_tiers_by_time_to_kickoff():
+    planner = RefreshPlanner(budget=10 ** 6)
+    plan = kickoffs(soon=1800, today=3 * 3600, tomorrow=20 * 3600, later=3 * 86400, started=-60)
+    # Ничего не загружено: полная загрузка вида спорта покрывает все группы
+    assert planner.due(plan, NOW) == [("soccer", None)]
+    planner.loaded("soccer", list(plan["soccer"]), NOW, full=True)
+    assert planner.due(plan, NOW) == []
+    # <1ч — раз в минуту, <6ч — раз в 5 минут, <24ч — раз в 15; дальние и начавшиеся — только полной загрузкой
+    assert planner.due(plan, NOW + 60) == [("soccer", ["soon"])]
+    planner.loaded("soccer", ["soon"], NOW + 60)
+    assert planner.due(plan, NOW + 300) == [("soccer", ["soon"]), ("soccer", ["today"])]
+    planner.loaded("soccer", ["soon", "today"], NOW + 300)
+    assert planner.due(plan, NOW + 900) == [("soccer", ["soon"]), ("soccer", ["today"]), ("soccer", ["tomorrow"])]
+    assert ("soccer", None) in planner.due(plan, NOW + FULL_INTERVAL)
+
+
+def test_large_group_split_into_requests():
+    planner = RefreshPlanner(budget=10 ** 6)
+    plan = kickoffs(**{f"e{i:03}": 600 + i for i in range(EVENT_IDS_PER_REQUEST * 2 + 1)})
+    planner.loaded("soccer", [], NOW, full=True)
+    jobs = planner.due(plan, NOW)
+    assert [len(ids) for _, ids in jobs] == [EVENT_IDS_PER_REQUEST, EVENT_IDS_PER_REQUEST, 1]
+    assert sorted(eid for _, ids in jobs for eid in ids) == sorted(plan["soccer"])
+
+
+def test_price_movement_changes_interval():
+    plan = kickoffs(e=3 * 3600)
+    moving = RefreshPlanner(budget=10 ** 6)
+    moving.observe([game("e", 2.0)], {"e"})
+    moving.observe([game("e", 2.2)], {"e"})
+    assert intervals(moving, plan)[("e",)] == 150
+
+    still = RefreshPlanner(budget=10 ** 6)
+    still.observe([game("e", 2.0)], {"e"})
+    still.observe([game("e", 2.0)], {"e"})
+    assert intervals(still, plan)[("e",)] == 600
+
+    # Сдвиг ещё не известен — базовый интервал
+    assert intervals(RefreshPlanner(budget=10 ** 6), plan)[("e",)] == 300
+
+    # В группе интервал задаёт самый подвижный матч
+    moving.observe([game("e", 2.2), game("x", 2.0)], {"e", "x"})
+    assert intervals(moving, kickoffs(e=3 * 3600, x=3 * 3600 + 1))[("e", "x")] == 150
+
+
+def test_hourly_budget_never_exceeded():
+    soccer = {f"e{i}": NOW + (i * 137) % 86000 + 60 for i in range(500)}
+    plan = {"soccer": soccer, "tennis": {f"t{i}": NOW + 600 + i for i in range(30)}}
+    for budget in (30, 120, 500):
+        planner = RefreshPlanner(budget=budget)
+        for sport, starts in plan.items():
+            planner.loaded(sport, list(starts), NOW, full=True)
+        planner.plan(plan, NOW)
+        assert planner.hourly / planner.stretch <= budget + 1e-6
+
+        # Час работы с тиком 30 с: матчи переходят в ближние группы, но запросов не больше бюджета
+        requests = 0
+        for now in range(NOW, NOW + 3600, 30):
+            for sport, ids in planner.due(plan, now):
+                requests += 1
+                planner.loaded(sport, ids or list(plan[sport]), now, full=ids is None)
+        assert requests <= budget
@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+BET = {"user_id": 1, "event_id": "g1", "event_title": "x", "pick": "team_a", "pick_label": "П1",
+       "odds": 2.0, "amount": 100}
+BAD = ["NaN", "Infinity", "-Infinity", -100, 0]
+
+
+def post(client, url, payload):
+    # json= не пропустит NaN, а клиент может прислать его как есть
+    return client.post(url, content=json.dumps(payload), headers={"Content-Type": "application/json"})
+
+
+@pytest.mark.parametrize("amount", BAD)
+def test_bet_rejects_bad_amount(client, amount):
+    assert post(client, "/api/bet", dict(BET, amount=float(amount))).status_code == 422
+
+
+@pytest.mark.parametrize("odds", BAD)
+def test_bet_rejects_bad_odds(client, odds):
+    assert post(client, "/api/bet", dict(BET, odds=float(odds))).status_code == 422
+
+
+@pytest.mark.parametrize("amount", BAD)
+def test_quick_bet_rejects_bad_amount(client, amount):
+    payload = {"user_id": 1, "game": "dice", "pick": "even", "amount": float(amount)}
+    assert post(client, "/api/quick-bet", payload).status_code == 422
+    payload = {"user_id": 1, "game": "dice", "picks": ["even"], "amount": float(amount)}
+    assert post(client, "/api/quick-bet/batch", payload).status_code == 422
+
+
+def test_minimum_stake_still_checked(client):
+    assert post(client, "/api/bet", dict(BET, amount=5)).status_code == 400
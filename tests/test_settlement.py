@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+import database
+from settlement import settle_outcomes
+
+
+async def setup():
+    await database.init_db()
+    for user_id, pick in ((1, "team_a"), (2, "team_b")):
+        await database.get_or_create_user(user_id)
+        result, msg = await database.place_bet(user_id, "g1", "Arsenal vs Chelsea", pick, "П", 2.0, 100)
+        assert result, msg
+
+
+async def ledger_state():
+    """Балансы из users и суммы журнала по игрокам, число записей журнала"""
+    async with database.get_pool().read() as conn:
+        cursor = await conn.execute("SELECT user_id, balance FROM users ORDER BY user_id")
+        balances = {r[0]: r[1] for r in await cursor.fetchall()}
+        cursor = await conn.execute("SELECT user_id, SUM(amount), COUNT(*) FROM ledger GROUP BY user_id ORDER BY user_id")
+        rows = await cursor.fetchall()
+    return balances, {r[0]: r[1] for r in rows}, sum(r[2] for r in rows)
+
+
+async def state():
+    async with database.get_pool().read() as conn:
+        cursor = await conn.execute("SELECT user_id, text FROM outbox ORDER BY user_id")
+        outbox = [tuple(row) for row in await cursor.fetchall()]
+        cursor = await conn.execute("SELECT result FROM bets ORDER BY user_id")
+        results = [row[0] for row in await cursor.fetchall()]
+    return outbox, results
+
+
+def test_outbox_written_with_settlement(db_path):
+    async def run():
+        await setup()
+        try:
+            summaries = await settle_outcomes([("g1", "team_a")], message=lambda s: f"profit {s['profit']:g}")
+            outbox, results = await state()
+            assert results == ["win", "lose"]
+            assert outbox == [(1, "profit 100"), (2, "profit -100")]
+            assert [s["notification"][1] for s in summaries] == ["profit 100", "profit -100"]
+        finally:
+            await database.close_db()
+
+    asyncio.run(run())
+
+
+def test_settlement_rolled_back_with_outbox(db_path):
+    async def run():
+        await setup()
+        try:
+            def broken(summary):
+                raise RuntimeError("no template")
+
+            with pytest.raises(RuntimeError):
+                await settle_outcomes([("g1", "team_a")], message=broken)
+            # Ни расчёта без уведомлений, ни уведомлений без расчёта
+            assert await state() == ([], ["pending", "pending"])
+        finally:
+            await database.close_db()
+
+    asyncio.run(run())
+
+
+def test_mixed_batch_matches_ledger_and_is_idempotent(db_path):
+    # Возвратов (отменённый матч) в расчёте нет; рядом с выигрышами и проигрышами —
+    # проданная досрочно ставка, которую расчёт трогать не должен
+    bets = [
+        (1, "e1", "team_a", 2.0, 100),   # выигрыш
+        (1, "e2", "team_b", 3.0, 50),    # проигрыш
+        (2, "e1", "team_b", 4.0, 100),   # проигрыш
+        (2, "e2", "draw", 3.2, 30),      # выигрыш
+        (3, "e1", "team_a", 2.0, 200),   # кэшаут до расчёта
+        (3, "e3", "team_a", 1.5, 40),    # матч не завершён
+    ]
+
+    async def scenario():
+        await database.init_db()
+        for user_id in (1, 2, 3):
+            await database.get_or_create_user(user_id)
+        for user_id, event_id, pick, odds, amount in bets:
+            result, msg = await database.place_bet(user_id, event_id, event_id, pick, pick, odds, amount)
+            assert result, msg
+        async with database.get_pool().read() as conn:
+            cursor = await conn.execute("SELECT id FROM bets WHERE user_id = 3 AND event_id = 'e1'")
+            cashout_id = (await cursor.fetchone())[0]
+        cashed, msg = await database.cashout_bet(cashout_id, 3, lambda bet: 150.0)
+        assert cashed, msg
+
+        summaries = await settle_outcomes([("e1", "team_a"), ("e2", "draw")])
+        by_user = {s["user_id"]: s for s in summaries}
+        assert set(by_user) == {1, 2}
+        assert (by_user[1]["bets"], by_user[1]["wins"], by_user[1]["payout"], by_user[1]["profit"]) == (2, 1, 200, 50)
+        assert (by_user[2]["bets"], by_user[2]["wins"], by_user[2]["payout"], by_user[2]["profit"]) == (2, 1, 96, -34)
+
+        balances, ledger, entries = await ledger_state()
+        assert balances == ledger
+        start = database.START_BALANCE
+        assert balances == {1: start - 150 + 200, 2: start - 130 + 96, 3: start - 240 + 150}
+
+        async with database.get_pool().read() as conn:
+            cursor = await conn.execute("SELECT id, result FROM bets ORDER BY id")
+            results = [r[1] for r in await cursor.fetchall()]
+        assert results == ["win", "lose", "lose", "win", "cashout", "pending"]
+
+        # Повторный расчёт, в том числе с другим результатом, ничего не меняет
+        assert await settle_outcomes([("e1", "team_a"), ("e2", "draw")]) == []
+        assert await settle_outcomes([("e1", "team_b")]) == []
+        assert await ledger_state() == (balances, ledger, entries)
+
+    async def run():
+        try:
+            await scenario()
+        finally:
+            await database.close_db()
+
+    asyncio.run(run())
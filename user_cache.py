@@ -0,0 +1,63 @@
+import time
+from collections import OrderedDict
+
+
+class UserCache:
+    """LRU-кэш строк users с ограничением размера и TTL.
+
+    Заполняется write-through: database.py передаёт сюда каждую изменённую строку
+    после COMMIT, поэтому чтение профиля горячих игроков не ходит в SQLite.
+    """
+
+    def __init__(self, maxsize=10000, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # user_id -> (expires, row)
+
+    def get(self, user_id):
+        item = self._data.get(user_id)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._data[user_id]
+            self.misses += 1
+            return None
+        self._data.move_to_end(user_id)
+        self.hits += 1
+        return dict(item[1])
+
+    def _store(self, user):
+        self._data[user["user_id"]] = (time.monotonic() + self.ttl, dict(user))
+        self._data.move_to_end(user["user_id"])
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def put(self, user):
+        """Подписчик db.on_user_change: свежая строка после COMMIT"""
+        self._store(user)
+
+    def fill(self, user):
+        """Положить строку, прочитанную из БД при промахе.
+
+        Если за время чтения пришла запись через put(), она свежее — не затираем.
+        """
+        if user["user_id"] not in self._data:
+            self._store(user)
+
+    def invalidate(self, user_id):
+        self._data.pop(user_id, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else None,
+        }
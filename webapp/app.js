@@ -1,10 +1,11 @@
-let tg=window.Telegram?.WebApp,userId=null,currentBalance=0,currentBet={},picks={coinflip:null,dice:null,roulette:null},allEvents=[];
+let tg=window.Telegram?.WebApp,userId=null,currentBalance=0,currentBet={},picks={coinflip:null,dice:null,roulette:null},allEvents=[],eventsById={},currentCat='all';
 
 document.addEventListener('DOMContentLoaded',async()=>{
     if(tg){tg.ready();tg.expand();if(tg.initDataUnsafe?.user)userId=tg.initDataUnsafe.user.id}
     if(!userId)userId=12345678;
     await loadUser();
     await loadEvents();
+    connectStream();
 });
 
 async function api(url,method='GET',data=null){
@@ -32,12 +33,17 @@ async function loadEvents(){
     try{
         const d=await api('/api/events');
         allEvents=d.events;
-        renderEvents(allEvents);
+        eventsById=Object.fromEntries(allEvents.map(e=>[e.id,e]));
+        showEvents();
     }catch(e){
         document.getElementById('events-list').innerHTML='<div class="empty">❌ Ошибка загрузки</div>';
     }
 }
 
+function showEvents(){
+    renderEvents(currentCat==='all'?allEvents:allEvents.filter(e=>e.category===currentCat));
+}
+
 function renderEvents(events){
     const el=document.getElementById('events-list');
     if(!events.length){el.innerHTML='<div class="empty">Нет предстоящих матчей</div>';return}
@@ -58,15 +64,15 @@ function renderEvents(events){
             const now=new Date();
             const isLive=dt<=now;
             const timeStr=isLive?'<span class="live-dot">🔴 LIVE</span>':formatDate(dt);
-            const drawBtn=e.odds_draw>0?`<button class="odds-btn" onclick="openModal('${e.id}',\`${esc(e.title)}\`,'draw','Ничья',${e.odds_draw})"><span class="ol">X</span><span class="ov">${e.odds_draw.toFixed(2)}</span></button>`:'';
+            const drawBtn=e.odds_draw>0?`<button class="odds-btn" data-pick="draw" onclick="openPick('${e.id}','draw')"><span class="ol">X</span><span class="ov">${e.odds_draw.toFixed(2)}</span></button>`:'';
 
-            html+=`<div class="event-card" data-cat="${e.category}">
+            html+=`<div class="event-card" data-cat="${e.category}" data-id="${e.id}">
                 <div class="event-time">${timeStr}</div>
                 <div class="event-teams"><span>${e.team_a}</span><span class="vs">VS</span><span>${e.team_b}</span></div>
                 <div class="odds-row">
-                    <button class="odds-btn" onclick="openModal('${e.id}',\`${esc(e.title)}\`,'team_a','${esc(e.team_a)}',${e.odds_a})"><span class="ol">1</span><span class="ov">${e.odds_a.toFixed(2)}</span></button>
+                    <button class="odds-btn" data-pick="team_a" onclick="openPick('${e.id}','team_a')"><span class="ol">1</span><span class="ov">${e.odds_a.toFixed(2)}</span></button>
                     ${drawBtn}
-                    <button class="odds-btn" onclick="openModal('${e.id}',\`${esc(e.title)}\`,'team_b','${esc(e.team_b)}',${e.odds_b})"><span class="ol">2</span><span class="ov">${e.odds_b.toFixed(2)}</span></button>
+                    <button class="odds-btn" data-pick="team_b" onclick="openPick('${e.id}','team_b')"><span class="ol">2</span><span class="ov">${e.odds_b.toFixed(2)}</span></button>
                 </div>
             </div>`;
         });
@@ -87,13 +93,11 @@ function formatDate(d){
     return`📅 ${prefix} ${d.toLocaleTimeString('ru',{hour:'2-digit',minute:'2-digit'})}`;
 }
 
-function esc(s){return s.replace(/'/g,"\\'").replace(/`/g,"\\`")}
-
 function filterSport(cat,btn){
-    document.querySelectorAll('.filter-btn').forEach(b=>b.classList.remove('active'));
+    btn.parentNode.querySelectorAll('.filter-btn').forEach(b=>b.classList.remove('active'));
     btn.classList.add('active');
-    if(cat==='all')renderEvents(allEvents);
-    else renderEvents(allEvents.filter(e=>e.category===cat));
+    currentCat=cat;
+    showEvents();
 }
 
 function switchTab(n,btn){
@@ -106,6 +110,16 @@ function switchTab(n,btn){
 }
 
 // --- Модалка ---
+const PICKS={team_a:['team_a','odds_a'],draw:[null,'odds_draw'],team_b:['team_b','odds_b']};
+
+function openPick(eid,pick){
+    // Коэффициент берём из актуального состояния, а не из разметки карточки
+    const e=eventsById[eid];
+    if(!e){toast('Матч уже недоступен','error');return}
+    const[team,key]=PICKS[pick];
+    openModal(e.id,e.title,pick,team?e[team]:'Ничья',e[key]);
+}
+
 function openModal(eid,title,pick,label,odds){
     currentBet={eid,title,pick,label,odds};
     document.getElementById('s-event').textContent=title;
@@ -142,20 +156,63 @@ async function confirmBet(){
 }
 
 // --- Ставки ---
-async function loadBets(){
+const BET_LABELS={pending:'⏳ Ожидание',win:'✅ Выигрыш',lose:'❌ Проигрыш',cashout:'💰 Кэшаут'};
+
+// История ставок страницами: вкладка грузит первую, «Показать ещё» — следующую по курсору
+const BETS_PAGE=20;
+let betsFilter='',betsCursor=null;
+
+function betCard(b){
+    const coBtn=b.result==='pending'?`<button class="cashout-btn" data-bet="${b.id}" onclick="doCashout(${b.id})">💰 Кэшаут</button>`:'';
+    return`<div class="bet-card ${b.result}" id="bet-${b.id}">
+        <div class="bet-hdr"><span class="bet-ev">${b.event_title}</span><span class="bet-st ${b.result}">${BET_LABELS[b.result]||b.result}</span></div>
+        <div class="bet-pick">Исход: ${b.pick_label||b.pick}</div>
+        <div class="bet-det">Ставка: ${b.amount}🪙 · Коэф: ${b.odds} · Выигрыш: ${b.potential_win}🪙</div>
+        ${coBtn}
+    </div>`;
+}
+
+async function loadBets(more=false){
     try{
-        const d=await api(`/api/bets/${userId}`);
+        const q=new URLSearchParams({limit:BETS_PAGE});
+        if(betsFilter)q.set('result',betsFilter);
+        if(more)q.set('cursor',betsCursor);
+        const[d,s]=await Promise.all([
+            api(`/api/bets/${userId}?${q}`),
+            more?null:api(`/api/bets/${userId}/summary`),
+        ]);
+        if(s)document.getElementById('bets-summary').textContent=s.pending
+            ?`Открыто: ${s.pending} · В игре: ${s.exposure}🪙 · Возможный выигрыш: ${s.potential_win}🪙`:'';
         const el=document.getElementById('bets-list');
-        if(!d.bets.length){el.innerHTML='<div class="empty">Ставок пока нет 🎰</div>';return}
-        const lab={pending:'⏳ Ожидание',win:'✅ Выигрыш',lose:'❌ Проигрыш',cashout:'💰 Кэшаут'};
-        el.innerHTML=d.bets.map(b=>{
-            const coBtn=b.result==='pending'?`<button class="cashout-btn" onclick="doCashout(${b.id})">💰 Кэшаут</button>`:'';
-            return`<div class="bet-card ${b.result}">
-                <div class="bet-hdr"><span class="bet-ev">${b.event_title}</span><span class="bet-st ${b.result}">${lab[b.result]||b.result}</span></div>
-                <div class="bet-pick">Исход: ${b.pick_label||b.pick}</div>
-                <div class="bet-det">Ставка: ${b.amount}🪙 · Коэф: ${b.odds} · Выигрыш: ${b.potential_win}🪙</div>
-                ${coBtn}
-            </div>`}).join('');
+        betsCursor=d.next_cursor;
+        el.querySelector('.more-btn')?.remove();
+        if(!more&&!d.bets.length){el.innerHTML='<div class="empty">Ставок пока нет 🎰</div>';return}
+        const html=d.bets.map(betCard).join('')+(betsCursor?'<button class="filter-btn more-btn" onclick="loadBets(true)">Показать ещё</button>':'');
+        if(more)el.insertAdjacentHTML('beforeend',html);else el.innerHTML=html;
+        if(d.bets.some(b=>b.result==='pending'))loadQuotes();
+    }catch(e){console.error(e)}
+}
+
+function filterBets(result,btn){
+    btn.parentNode.querySelectorAll('.filter-btn').forEach(b=>b.classList.remove('active'));
+    btn.classList.add('active');
+    betsFilter=result;
+    loadBets();
+}
+
+// Цена кэшаута держится до истечения котировки, потом запрашиваем новую
+let quoteTimer=null;
+async function loadQuotes(){
+    clearTimeout(quoteTimer);
+    try{
+        const d=await api(`/api/cashout/quotes?user_id=${userId}`);
+        const byId=Object.fromEntries(d.quotes.map(q=>[q.bet_id,q]));
+        document.querySelectorAll('.cashout-btn').forEach(btn=>{
+            const q=byId[btn.dataset.bet];
+            btn.disabled=!q;
+            btn.textContent=q?`💰 Кэшаут ${q.amount}🪙`:'💰 Кэшаут недоступен';
+        });
+        if(d.quotes.length)quoteTimer=setTimeout(loadQuotes,Math.max(1,Math.min(...d.quotes.map(q=>q.expires_in)))*1000);
     }catch(e){console.error(e)}
 }
 
@@ -172,11 +229,18 @@ async function doCashout(betId){
 async function loadLB(){
     try{
         const d=await api('/api/leaderboard');
-        document.getElementById('leaderboard').innerHTML=d.leaderboard.map((u,i)=>{
+        let html=d.leaderboard.map((u,i)=>{
             const rc=i===0?'g':i===1?'s':i===2?'b':'';
             const re=i===0?'🥇':i===1?'🥈':i===2?'🥉':i+1;
-            return`<div class="lb-row"><div class="lb-r ${rc}">${re}</div><div class="lb-n">${u.username||'Аноним'}</div><div class="lb-b">${Math.floor(u.balance)}🪙</div></div>`
+            const me=u.user_id===userId?' me':'';
+            return`<div class="lb-row${me}"><div class="lb-r ${rc}">${re}</div><div class="lb-n">${u.username||'Аноним'}</div><div class="lb-b">${Math.floor(u.balance)}🪙</div></div>`
         }).join('');
+        // Своё место показываем отдельно, если не попали в топ
+        if(!d.leaderboard.some(u=>u.user_id===userId)){
+            const r=await api(`/api/leaderboard/rank/${userId}`);
+            if(r.rank)html+=`<div class="lb-row me"><div class="lb-r">${r.rank}</div><div class="lb-n">Вы</div><div class="lb-b">${Math.floor(r.balance)}🪙</div></div>`;
+        }
+        document.getElementById('leaderboard').innerHTML=html;
     }catch(e){}
 }
 
@@ -200,5 +264,73 @@ async function playGame(g){
     }catch(e){toast(e.message,'error')}
 }
 
+// --- Push-обновления (SSE) ---
+function connectStream(){
+    if(!window.EventSource)return;
+    let first=true;
+    const es=new EventSource(`/api/stream?user_id=${userId}`);
+    // hello приходит и после переподключения — пропущенное за разрыв забираем целиком
+    es.addEventListener('hello',()=>{if(!first)resync();first=false});
+    es.addEventListener('resync',resync);
+    es.addEventListener('events',m=>applyEvents(JSON.parse(m.data)));
+    es.addEventListener('balance',m=>applyBalance(JSON.parse(m.data)));
+    es.addEventListener('bets',m=>applySettled(JSON.parse(m.data).settled));
+}
+
+function resync(){loadUser();loadEvents()}
+
+function cardEl(id){return document.querySelector(`.event-card[data-id="${CSS.escape(id)}"]`)}
+
+function applyEvents(d){
+    d.removed.forEach(id=>{delete eventsById[id];const c=cardEl(id);if(c)c.remove()});
+    document.querySelectorAll('.league-group').forEach(g=>{if(!g.querySelector('.event-card'))g.remove()});
+    d.changed.forEach(e=>{const old=eventsById[e.id];eventsById[e.id]=e;updateCard(e,old)});
+    d.added.forEach(e=>{eventsById[e.id]=e});
+    allEvents=allEvents.filter(e=>e.id in eventsById).map(e=>eventsById[e.id]).concat(d.added);
+    if(d.added.length){
+        // Новым карточкам нужно место в своей лиге — перерисовываем из памяти, без запроса
+        allEvents.sort((a,b)=>a.commence_time.localeCompare(b.commence_time));
+        showEvents();
+    }else if(!allEvents.length)showEvents();
+}
+
+function updateCard(e,old){
+    const c=cardEl(e.id);
+    if(c)for(const[pick,[,key]]of Object.entries(PICKS)){
+        const b=c.querySelector(`[data-pick="${pick}"]`);
+        if(!b||!e[key])continue;
+        b.querySelector('.ov').textContent=e[key].toFixed(2);
+        if(old&&old[key]!==e[key]){
+            b.classList.remove('up','down');void b.offsetWidth;
+            b.classList.add(e[key]>old[key]?'up':'down');
+        }
+    }
+    // Открыта модалка по этому матчу — показываем новый коэффициент
+    if(currentBet.eid===e.id&&!document.getElementById('bet-modal').classList.contains('hidden')){
+        currentBet.odds=e[PICKS[currentBet.pick][1]];
+        document.getElementById('s-odds').textContent='Коэффициент: '+currentBet.odds.toFixed(2);
+        calcWin();
+    }
+}
+
+function applyBalance(u){
+    currentBalance=u.balance;upBal();
+    const sbe=document.getElementById('st-bets');if(sbe)sbe.textContent=u.total_bets;
+    const sw=document.getElementById('st-wins');if(sw)sw.textContent=u.total_wins;
+}
+
+function applySettled(bets){
+    bets.forEach(b=>{
+        const c=document.getElementById('bet-'+b.bet_id);
+        if(!c)return;
+        c.className='bet-card '+b.result;
+        const st=c.querySelector('.bet-st');st.className='bet-st '+b.result;st.textContent=BET_LABELS[b.result]||b.result;
+        const co=c.querySelector('.cashout-btn');if(co)co.remove();
+    });
+    const won=bets.filter(b=>b.result==='win').reduce((s,b)=>s+b.payout,0);
+    if(won)toast(`🏆 Ставка сыграла: +${Math.floor(won)}🪙`,'success');
+    else toast(`Ставки рассчитаны: ${bets.length}`,'info');
+}
+
 function upBal(){document.getElementById('balance').textContent=Math.floor(currentBalance);const s=document.getElementById('st-bal');if(s)s.textContent=Math.floor(currentBalance)}
 function toast(m,t){const el=document.getElementById('toast');el.textContent=m;el.className='toast '+t;setTimeout(()=>el.classList.add('hidden'),3000)}